@@ -2,13 +2,3314 @@ import os
 import sqlite3
 import time
 import shutil
-from tkinter import Tk, Button, Entry, filedialog, StringVar, ttk, messagebox, Frame, Menu, Toplevel, Label
+import stat
+from collections import deque, namedtuple
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
+from array import array
+from bisect import bisect_left
+from itertools import groupby
+import argparse
+import contextlib
+import ctypes
+import ctypes.util
+import errno
+import hashlib
+import json
+import logging
+import logging.handlers
+import multiprocessing
+import queue
+import re
+import struct
+import sys
+import threading
+import zlib
+try:
+    import fcntl
+except ImportError:  # Windows : pas de clonage par ioctl
+    fcntl = None
+try:
+    from tkinter import (Tk, Button, Entry, filedialog, StringVar, BooleanVar, ttk, messagebox, Frame, Menu, Toplevel, Label,
+                         Checkbutton)
+except ImportError:  # Serveur sans Tkinter : seul le mode ligne de commande est disponible
+    Tk = None
 from datetime import datetime
 
 ANALYSE_DB = 'syncer_analyse.db'
 CONFIG_DB = 'syncer.db'
+FILTER_DB = 'syncer_filter.db'
+PROFILES_DIR = 'profiles'  # Un sous-répertoire par profil, avec ses trois bases
+# Types de la table filters : noms et extensions exacts, globs et expressions régulières (exclusion ou inclusion)
+FILTER_TYPES = ('filename', 'extension', 'glob', 'regex', 'include_glob', 'include_regex')
 DELTA = 15  # Delta en secondes pour la comparaison des dates
-WAIT = 1 # Temps en seconde entre deux fichiers
+WORKERS = 4  # Actions exécutées en parallèle (sync_config 'workers')
+HASH_CHUNK = 1024 * 1024  # Taille des blocs lus pour le calcul des empreintes
+HASH_WORKERS = os.cpu_count() or 4  # Fichiers hachés en parallèle
+HASH_WINDOW = 256  # Lignes du plan en attente d'empreinte avant de bloquer l'analyse
+DELTA_MIN_SIZE = 64 * 1024 * 1024  # Taille minimale pour la copie différentielle (sync_config 'delta_min_size')
+DELTA_BLOCK = 128 * 1024  # Taille des blocs de la copie différentielle
+DELTA_ROLL_LIMIT = 16 * 1024 * 1024  # Octets parcourus au plus par la somme glissante, par fichier
+COPY_BUFFER = 8 * 1024 * 1024  # Tampon de la copie par lecture et écriture (sync_config 'copy_buffer')
+COPY_METHODS = ('reflink', 'copy_file_range', 'sendfile', 'buffer')  # Méthodes de copie, dans l'ordre d'essai
+FICLONE = 0x40049409  # ioctl de clonage de <linux/fs.h>
+COPY_CHUNK = 64 * 1024 * 1024  # Bloc des copies reprenables : position enregistrée après chaque bloc
+COPY_RESUME_MIN_SIZE = 256 * 1024 * 1024  # Taille minimale d'une copie reprenable
+COPY_TEMP_SUFFIX = '.syncer-tmp'  # Fichier temporaire d'une copie, renommé sur la cible à la fin
+SMALL_FILE_MAX = 16 * 1024  # Fichiers copiés par lots (SmallFileBatch), sans fsync individuel
+SMALL_FILE_BATCH = 512  # Petits fichiers par lot : renommés et synchronisés ensemble
+TEMP_SUFFIXES = (COPY_TEMP_SUFFIX, '.syncer-delta')  # Fichiers de travail ignorés par le parcours
+# Erreurs signifiant qu'une méthode de copie n'est pas disponible (et non une erreur d'entrée-sortie)
+COPY_UNSUPPORTED = (errno.EXDEV, errno.ENOTSUP, errno.EOPNOTSUPP, errno.ENOSYS, errno.EINVAL, errno.ENOTTY)
+PLAN_BATCH = 1000  # Lignes du plan écrites ou lues par lot dans sync_plan
+STATE_GROUP_SIZE = 500  # Actions par transaction de sync_state pendant l'exécution
+STATE_GROUP_MS = 1000  # Délai maximum avant de valider les actions en attente
+THROTTLE_KEYS = ('max_bytes_per_sec', 'max_ops_per_sec', 'target_latency_ms')  # Limites de débit dans sync_config
+THROTTLE_MIN_FACTOR = 0.05  # Part minimale du débit configuré en mode adaptatif
+THROTTLE_RELOAD = 5  # Secondes entre deux relectures des limites pendant une exécution
+SNAPSHOT_MAX_ROWS = 2000000  # Au-delà, l'index d'analyse reste sur disque
+WATCH_DEBOUNCE = 2  # Secondes sans nouvel événement avant de synchroniser, en mode surveillance
+WATCH_MAX_DELAY = 30  # Délai maximum entre le premier événement et la synchronisation
+WATCH_POLL = 60  # Secondes entre deux relectures des montages sans événements inotify
+WATCH_TICK = 0.2  # Intervalle de lecture des événements
+LOG_BUFFER = 1000  # Messages du journal gardés en mémoire avant écriture
+LOG_FLUSH_INTERVAL = 1  # Secondes maximum avant l'écriture des messages en mémoire
+METRICS_REPORT = 'syncer_report.json'  # Rapport JSON des mesures
+METRICS_COUNTERS = ('stat_calls', 'db_queries', 'db_commits', 'bytes_read', 'bytes_written', 'files_copied')
+METRICS_PHASES = ('scan', 'db', 'copy', 'render')  # Durées mesurées, cumulées sur les threads
+METRICS_STATUS_MS = 500  # Rafraîchissement de la barre d'état des mesures
+PROFILE_IO_LIMIT = 8  # Opérations sur les fichiers en cours au plus, tous profils confondus
+PROFILE_STATUS_INTERVAL = 0.5  # Secondes entre deux progressions envoyées par un profil
+SCAN_NETWORK_WORKERS = 16  # Répertoires lus en parallèle sur un montage réseau (sync_config 'scan_workers_org' / '_dst')
+SCAN_PREFETCH = 4096  # Lectures de répertoires anticipées au plus, par racine
+NETWORK_FS = ('nfs', 'nfs4', 'cifs', 'smb3', 'smbfs', 'fuse.sshfs', '9p', 'afs', 'ceph', 'glusterfs')  # Relus périodiquement
+
+# Entrée d'un parcours : le stat est fait une seule fois, à la lecture du répertoire
+ScanEntry = namedtuple('ScanEntry', ['path', 'name', 'is_dir', 'is_link', 'stat'])
+
+log = logging.getLogger("syncer")
+
+
+class PhaseTimer:
+    """Mesure la durée d'un bloc et l'ajoute à une phase de Metrics"""
+
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.add_time(self.phase, time.perf_counter() - self.started)
+
+
+class Metrics:
+    """Compteurs d'entrées-sorties et durées par phase d'une analyse ou d'une exécution.
+
+    Activées ou non à tout moment (enabled) ; désactivées, chaque point de
+    mesure se réduit à un test de ce booléen. Les durées des phases sont
+    cumulées sur tous les threads et peuvent donc dépasser la durée totale.
+    Les requêtes SQLite sont comptées sur les connexions ouvertes par
+    open_db pendant que les mesures sont actives.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Remet les compteurs à zéro, au début d'une analyse ou d'une exécution"""
+        with self.lock:
+            self.counters = dict.fromkeys(METRICS_COUNTERS, 0)
+            self.times = dict.fromkeys(METRICS_PHASES, 0.0)
+            self.started = time.monotonic()
+
+    def add(self, counter, value=1):
+        with self.lock:
+            self.counters[counter] += value
+
+    def add_time(self, phase, seconds):
+        with self.lock:
+            self.times[phase] += seconds
+
+    def timer(self, phase):
+        """Contexte mesurant la durée d'un bloc pour la phase, sans effet si les mesures sont désactivées"""
+        return PhaseTimer(self, phase) if self.enabled else NULL_CONTEXT
+
+    def db_statement(self, statement):
+        """Rappel de trace SQLite : une requête exécutée"""
+        with self.lock:
+            self.counters['db_queries'] += 1
+            if statement.startswith("COMMIT"):
+                self.counters['db_commits'] += 1
+
+    def snapshot(self):
+        """Copie des mesures courantes"""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {'elapsed_s': round(elapsed, 3),
+                    'files_per_s': round(self.counters['files_copied'] / elapsed, 1) if elapsed > 0 else 0.0,
+                    'counters': dict(self.counters),
+                    'phases_s': {phase: round(seconds, 3) for phase, seconds in self.times.items()}}
+
+    def summary(self):
+        """Résumé sur une ligne pour la barre d'état"""
+        data = self.snapshot()
+        counters, times = data['counters'], data['phases_s']
+        return (f"{counters['stat_calls']} stat, {counters['db_queries']} requêtes ({counters['db_commits']} commits), "
+                f"{counters['bytes_read'] / 1048576:.1f} Mo lus, {counters['bytes_written'] / 1048576:.1f} Mo écrits, "
+                f"{counters['files_copied']} fichiers copiés ({data['files_per_s']:.0f}/s) - "
+                + ", ".join(f"{phase} {seconds:.2f} s" for phase, seconds in times.items())
+                + f" / {data['elapsed_s']:.1f} s")
+
+    def write_report(self, path=METRICS_REPORT, **context):
+        """Écrit les mesures dans un rapport JSON, avec les informations de context (commande, répertoires...)"""
+        report = dict(context, date=datetime.now().isoformat(timespec='seconds'), **self.snapshot())
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        log.info("Rapport de mesures écrit dans %s", path)
+
+
+NULL_CONTEXT = contextlib.nullcontext()
+METRICS = Metrics()  # Mesures du processus, partagées par le moteur et l'interface
+
+
+def open_db(path, **kwargs):
+    """sqlite3.connect, avec le comptage des requêtes si les mesures sont actives"""
+    conn = sqlite3.connect(path, **kwargs)
+    if METRICS.enabled:
+        conn.set_trace_callback(METRICS.db_statement)
+    return conn
+
+
+class BufferedLogHandler(logging.handlers.MemoryHandler):
+    """Journal écrit par lots : au plus tard LOG_FLUSH_INTERVAL secondes après, immédiatement à partir de WARNING.
+
+    Un minuteur écrit les messages en attente même si aucun autre n'arrive
+    (interface ou surveillance au repos) ; le reste est écrit à la fermeture
+    du journal, à la sortie du programme.
+    """
+
+    def __init__(self, target):
+        super().__init__(LOG_BUFFER, logging.WARNING, target)
+        self.last_flush = time.monotonic()
+        self.timer = None
+
+    def shouldFlush(self, record):
+        return super().shouldFlush(record) or time.monotonic() - self.last_flush >= LOG_FLUSH_INTERVAL
+
+    def emit(self, record):
+        super().emit(record)
+        with self.lock:
+            if self.buffer and self.timer is None:
+                self.timer = threading.Timer(LOG_FLUSH_INTERVAL, self.flush)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            super().flush()
+            self.last_flush = time.monotonic()
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+
+
+def setup_logging(level="info"):
+    """Configure le journal de syncer sur la sortie d'erreur, au niveau demandé (debug, info, warning, error)"""
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(message)s", "%H:%M:%S"))
+    log.handlers[:] = [BufferedLogHandler(stream)]
+    log.setLevel(level.upper())
+    log.propagate = False
+
+
+def stat_path(path, follow_symlinks=True):
+    """os.stat, compté dans les mesures (stat_calls)"""
+    if METRICS.enabled:
+        METRICS.add('stat_calls')
+    return os.stat(path, follow_symlinks=follow_symlinks)
+
+
+def is_dir_path(path):
+    """os.path.isdir, compté dans les mesures"""
+    try:
+        return stat.S_ISDIR(stat_path(path).st_mode)
+    except OSError:
+        return False
+
+
+def path_exists(path):
+    """os.path.lexists, compté dans les mesures"""
+    try:
+        stat_path(path, follow_symlinks=False)
+        return True
+    except OSError:
+        return False
+
+
+def copy_metadata(src_path, dst_path):
+    """shutil.copystat (un stat de la source), compté dans les mesures"""
+    if METRICS.enabled:
+        METRICS.add('stat_calls')
+    shutil.copystat(src_path, dst_path)
+
+
+def list_directory(path, stat_files=True):
+    """Liste un répertoire avec os.scandir.
+
+    Args:
+        path (str): Chemin du répertoire à lire.
+        stat_files (bool): False pour ne faire le stat que des répertoires
+            (type lu dans le répertoire) ; les autres entrées ont alors un stat None.
+
+    Returns:
+        dict: {nom: ScanEntry}, vide si le répertoire n'est pas lisible.
+    """
+    entries = {}
+    started = time.perf_counter() if METRICS.enabled else None
+    stats = 0
+    try:
+        with os.scandir(path) as it:
+            for entry in it:
+                if entry.name.endswith(TEMP_SUFFIXES):
+                    continue  # Copie en cours ou interrompue
+                if not stat_files and not entry.is_dir():
+                    entries[entry.name] = ScanEntry(entry.path, entry.name, False, entry.is_symlink(), None)
+                    continue
+                try:
+                    # Un seul stat par entrée, mis en cache par le DirEntry
+                    stats += 1
+                    st = entry.stat()
+                except OSError:
+                    continue  # Lien cassé ou fichier disparu entre temps
+                entries[entry.name] = ScanEntry(entry.path, entry.name, stat.S_ISDIR(st.st_mode),
+                                                entry.is_symlink(), st)
+    except OSError:
+        pass
+    if started is not None:
+        METRICS.add('stat_calls', stats)
+        METRICS.add_time('scan', time.perf_counter() - started)
+    return entries
+
+
+class ShardedLister:
+    """Lecture anticipée des répertoires d'une racine par un pool de threads à vol de tâches.
+
+    Pour les montages réseau, où chaque lecture de répertoire et chaque stat
+    coûtent un aller-retour : plusieurs répertoires sont lus en même temps
+    (os.scandir et stat libèrent le GIL). Chaque thread a sa propre file :
+    il y prend la dernière tâche ajoutée (parcours en profondeur de sa
+    branche) et, quand elle est vide, vole la plus ancienne d'un autre thread
+    (la moins profonde, donc la plus grosse sous-arborescence restante).
+    Avec discover, un thread met dans sa file les sous-répertoires de chaque
+    répertoire lu, sans attendre le parcours.
+
+    Les lectures sont identifiées par (répertoire relatif, stat_files) et
+    consommées une seule fois par get ; au plus limit lectures sont en
+    attente ou gardées en mémoire, au-delà get lit le répertoire lui-même.
+    """
+
+    PENDING = object()
+
+    def __init__(self, root, workers, discover=False, prune=None, limit=SCAN_PREFETCH):
+        self.root = root
+        self.discover = discover
+        self.prune = prune
+        self.limit = limit
+        self.queues = [deque() for _ in range(workers)]
+        self.results = {}  # (répertoire relatif, stat_files) -> entrées, ou PENDING
+        self.next_queue = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        for index in range(workers):
+            threading.Thread(target=self.run, args=(index,), daemon=True).start()
+
+    def request(self, rel_dir, stat_files=True):
+        """Demande la lecture anticipée d'un répertoire, sans attendre"""
+        key = (rel_dir, stat_files)
+        with self.cond:
+            if key in self.results or len(self.results) >= self.limit:
+                return
+            self.results[key] = self.PENDING
+            self.queues[self.next_queue].append(key)
+            self.next_queue = (self.next_queue + 1) % len(self.queues)
+            self.cond.notify()
+
+    def get(self, rel_dir, stat_files=True):
+        """Entrées du répertoire (voir list_directory), lues d'avance si possible"""
+        key = (rel_dir, stat_files)
+        with self.cond:
+            if self.results.get(key) is self.PENDING:
+                # Pas encore commencée : lue ici plutôt que d'attendre son tour
+                for tasks in self.queues:
+                    if key in tasks:
+                        tasks.remove(key)
+                        del self.results[key]
+                        break
+            while self.results.get(key) is self.PENDING:
+                self.cond.wait()
+            entries = self.results.pop(key, None)
+        if entries is None:
+            entries = list_directory(os.path.join(self.root, rel_dir), stat_files)
+        return entries
+
+    def take(self, index):
+        """Tâche suivante du thread index : la plus récente de sa file, sinon la plus ancienne d'une autre"""
+        if self.queues[index]:
+            return self.queues[index].pop()
+        for offset in range(1, len(self.queues)):
+            tasks = self.queues[(index + offset) % len(self.queues)]
+            if tasks:
+                return tasks.popleft()
+        return None
+
+    def run(self, index):
+        while True:
+            with self.cond:
+                key = self.take(index)
+                while key is None and not self.closed:
+                    self.cond.wait()
+                    key = self.take(index)
+                if self.closed:
+                    return
+            rel_dir, stat_files = key
+            entries = list_directory(os.path.join(self.root, rel_dir), stat_files)
+            with self.cond:
+                self.results[key] = entries
+                if self.discover:
+                    for name, entry in sorted(entries.items(), reverse=True):
+                        rel_path = os.path.join(rel_dir, name)
+                        if (entry.is_dir and not entry.is_link and (rel_path, True) not in self.results
+                                and len(self.results) < self.limit and not (self.prune and self.prune(rel_path, True))):
+                            self.results[(rel_path, True)] = self.PENDING
+                            self.queues[index].append((rel_path, True))
+                self.cond.notify_all()
+
+    def close(self):
+        """Arrête les threads ; les lectures en cours se terminent sans être gardées"""
+        with self.cond:
+            self.closed = True
+            self.results.clear()
+            self.cond.notify_all()
+
+
+def scan_trees(org_dir, dst_dir, progress=None, snapshots=None, starts=None, prune=None, workers=(1, 1)):
+    """Parcourt simultanément les arborescences source et destination, en ordre trié.
+
+    Chaque chemin relatif n'est produit qu'une seule fois, un répertoire avant son contenu.
+    Les liens symboliques vers des répertoires ne sont pas suivis (comme os.walk).
+
+    Avec snapshots, un répertoire présent des deux côtés dont les dates et les
+    nombres d'entrées n'ont pas changé depuis la dernière analyse est lu sans
+    stat de ses fichiers, qui ne sont pas produits ; ses sous-répertoires sont
+    parcourus normalement.
+
+    Avec starts, seuls ces répertoires sont lus, sans descendre dans les
+    sous-répertoires présents des deux côtés (qui ont leur propre entrée dans
+    starts s'ils ont changé) ; un sous-répertoire présent d'un seul côté est
+    parcouru entièrement.
+
+    Avec plus d'un worker pour une racine, ses répertoires sont lus d'avance
+    par un ShardedLister ; l'ordre du résultat ne change pas.
+
+    Args:
+        org_dir (str): Chemin du répertoire source.
+        dst_dir (str): Chemin du répertoire de destination.
+        progress (dict): Compteurs 'dirs', 'entries' et 'skipped' mis à jour pendant le parcours.
+        snapshots (DirSnapshots): États des répertoires de la dernière analyse, mis à jour au passage.
+        starts (iterable): Répertoires relatifs à lire, None pour toute l'arborescence.
+        prune (callable): prune(chemin relatif, True) vrai pour un répertoire exclu, produit sans son contenu.
+        workers (tuple): Répertoires lus en parallèle du côté source et du côté destination.
+
+    Yields:
+        tuple: (chemin relatif, ScanEntry source ou None, ScanEntry destination ou None)
+    """
+    org_dir = os.path.normpath(org_dir)
+    dst_dir = os.path.normpath(dst_dir)
+    # Parcours complet sans lecture rapide possible : les threads lisent aussi les sous-répertoires qu'ils trouvent
+    discover = starts is None and (snapshots is None or not snapshots.enabled)
+    listers = [ShardedLister(root, count, discover, prune) if count > 1 else None
+               for root, count in zip((org_dir, dst_dir), workers)]
+    try:
+        yield from _scan_trees(org_dir, dst_dir, progress, snapshots, starts, prune, listers)
+    finally:
+        for lister in listers:
+            if lister:
+                lister.close()
+
+
+def _scan_trees(org_dir, dst_dir, progress, snapshots, starts, prune, listers):
+    """Parcours de scan_trees, les lectures passant par listers quand il y en a"""
+    def read(side, rel_dir, stat_files=True):
+        if listers[side]:
+            return listers[side].get(rel_dir, stat_files)
+        return list_directory(os.path.join((org_dir, dst_dir)[side], rel_dir), stat_files)
+
+    def quick_dir(rel_dir, org_st, dst_st):
+        stored = snapshots.get(rel_dir) if snapshots is not None and org_st and dst_st else None
+        return stored is not None and stored[:2] == (org_st.st_mtime_ns, dst_st.st_mtime_ns)
+
+    def root_stat(path):
+        try:
+            return stat_path(path)
+        except OSError:
+            return None
+
+    # Pile des répertoires relatifs à lire, avec le stat du répertoire de chaque côté (None s'il est absent)
+    if starts is None:
+        stack = [("", root_stat(org_dir), root_stat(dst_dir))]
+    else:
+        # Un répertoire présent d'un seul côté est lu depuis le premier parent présent des deux côtés
+        rel_dirs = set()
+        for rel_dir in starts:
+            while rel_dir and not (is_dir_path(os.path.join(org_dir, rel_dir)) and is_dir_path(os.path.join(dst_dir, rel_dir))):
+                rel_dir = os.path.dirname(rel_dir)
+            rel_dirs.add(rel_dir)
+        stack = [(rel_dir, root_stat(os.path.join(org_dir, rel_dir)), root_stat(os.path.join(dst_dir, rel_dir)))
+                 for rel_dir in sorted(rel_dirs, reverse=True)]
+    while stack:
+        rel_dir, org_st, dst_st = stack.pop()
+        org_path = os.path.join(org_dir, rel_dir)
+        dst_path = os.path.join(dst_dir, rel_dir)
+
+        # Répertoire inchangé depuis la dernière analyse : ses fichiers sont toujours à jour
+        quick = quick_dir(rel_dir, org_st, dst_st)
+        org_entries = read(0, rel_dir, stat_files=not quick) if org_st else {}
+        dst_entries = read(1, rel_dir, stat_files=not quick) if dst_st else {}
+        if quick and (len(org_entries), len(dst_entries)) != snapshots.get(rel_dir)[2:]:
+            quick = False  # Même date mais contenu différent : lecture complète
+            org_entries = list_directory(org_path)
+            dst_entries = list_directory(dst_path)
+        if snapshots is not None and org_st and dst_st:
+            snapshots.add(rel_dir, org_st, dst_st, len(org_entries), len(dst_entries))
+        if progress is not None:
+            progress['dirs'] += 1
+
+        subdirs = []
+        for name in sorted(org_entries.keys() | dst_entries.keys()):
+            org_entry = org_entries.get(name)
+            dst_entry = dst_entries.get(name)
+            if quick and ((org_entry and org_entry.stat is None) or (dst_entry and dst_entry.stat is None)):
+                if progress is not None:
+                    progress['skipped'] += 1
+                continue
+            rel_path = os.path.join(rel_dir, name)
+            if progress is not None:
+                progress['entries'] += 1
+            yield rel_path, org_entry, dst_entry
+
+            org_walk = org_entry is not None and org_entry.is_dir and not org_entry.is_link
+            dst_walk = dst_entry is not None and dst_entry.is_dir and not dst_entry.is_link
+            if ((org_walk or dst_walk) and (starts is None or org_walk != dst_walk)
+                    and not (prune and prune(rel_path, True))):
+                subdirs.append((rel_path, org_entry.stat if org_walk else None, dst_entry.stat if dst_walk else None))
+
+        # Ordre inverse pour dépiler les sous-répertoires dans l'ordre alphabétique
+        stack.extend(reversed(subdirs))
+        # Lecture anticipée des sous-répertoires, le premier à lire en dernier (pris en premier par les threads)
+        for sub_dir, org_sub, dst_sub in reversed(subdirs):
+            stat_files = not quick_dir(sub_dir, org_sub, dst_sub)
+            for side, sub_st in ((0, org_sub), (1, dst_sub)):
+                if listers[side] and sub_st:
+                    listers[side].request(sub_dir, stat_files)
+
+
+def is_under(path, root):
+    """Vérifie si path est sous le répertoire root (qui peut être une racine comme / ou C:\\)"""
+    return path.startswith(root.rstrip(os.sep) + os.sep)
+
+
+def root_pair(conn, org_dir, dst_dir, create=True):
+    """Identifiant du couple de répertoires dans sync_roots, créé au besoin (None si create est False)"""
+    if create:
+        conn.execute("INSERT OR IGNORE INTO sync_roots (org_dir, dst_dir) VALUES (?, ?)", (org_dir, dst_dir))
+    row = conn.execute("SELECT id FROM sync_roots WHERE org_dir = ? AND dst_dir = ?", (org_dir, dst_dir)).fetchone()
+    return row[0] if row else None
+
+
+class SnapshotIndex:
+    """Index en mémoire de la table sync_state, chargé une fois par analyse.
+
+    Les états du couple de répertoires sont lus en une seule requête dans un
+    dictionnaire. Si la base dépasse max_rows entrées, l'index reste sur
+    disque : une seule connexion est gardée ouverte et chaque recherche
+    utilise la clé primaire.
+    """
+
+    def __init__(self, db_path, org_dir, dst_dir, max_rows=SNAPSHOT_MAX_ROWS):
+        self.conn = open_db(db_path)
+        self.states = None
+        try:
+            with METRICS.timer('db'):
+                self.pair = root_pair(self.conn, org_dir, dst_dir, create=False)
+                count = self.conn.execute("SELECT COUNT(*) FROM sync_state WHERE pair = ?", (self.pair,)).fetchone()[0]
+                if count <= max_rows:
+                    self.states = {path: state for path, *state in self.conn.execute(
+                        "SELECT path, org_mtime_ns, org_size, dst_mtime_ns, dst_size FROM sync_state WHERE pair = ?",
+                        (self.pair,))}
+        except sqlite3.Error:
+            self.states = {}  # Table absente ou illisible : aucun historique
+
+        if self.states is not None:
+            self.conn.close()
+            self.conn = None
+
+    def get(self, rel_path):
+        """[org_mtime_ns, org_size, dst_mtime_ns, dst_size] enregistrés pour un chemin relatif, ou None"""
+        if self.states is not None:
+            return self.states.get(rel_path)
+        with METRICS.timer('db'):
+            row = self.conn.execute("""SELECT org_mtime_ns, org_size, dst_mtime_ns, dst_size FROM sync_state
+                                       WHERE pair = ? AND path = ?""", (self.pair, rel_path)).fetchone()
+        return list(row) if row else None
+
+    def close(self):
+        """Libère la connexion du mode sur disque"""
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+
+class DirSnapshots:
+    """États des répertoires à jour lors de la dernière synchronisation, dans la table dir_snapshot.
+
+    Pour chaque répertoire présent des deux côtés, on garde la date (mtime_ns)
+    et le nombre d'entrées de chaque côté, si tous ses fichiers étaient
+    identiques ("===") à la fin de l'analyse. Ces états attendent dans
+    dir_snapshot_pending que l'exécution du plan ait enregistré toutes les
+    lignes du répertoire (promote). La date d'un répertoire change
+    quand une entrée est ajoutée, supprimée ou renommée, mais pas quand un
+    fichier est modifié sur place : l'analyse incrémentale suppose que les
+    fichiers sont remplacés plutôt que réécrits, ce qui est le cas des
+    archives, et une analyse complète reste nécessaire de temps en temps.
+    """
+
+    def __init__(self, db_path, org_dir, dst_dir, incremental=True):
+        self.db_path = db_path
+        self.roots = (org_dir, dst_dir)
+        self.stored = {}
+        self.seen = {}
+        self.dirty = set()
+        self.enabled = False  # Lectures rapides possibles : analyse incrémentale avec des états enregistrés
+        with open_db(db_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS dir_snapshot (
+                            org_dir TEXT,
+                            dst_dir TEXT,
+                            path TEXT,
+                            org_mtime_ns INTEGER,
+                            dst_mtime_ns INTEGER,
+                            org_entries INTEGER,
+                            dst_entries INTEGER,
+                            PRIMARY KEY (org_dir, dst_dir, path))''')
+            conn.execute('''CREATE TABLE IF NOT EXISTS dir_snapshot_pending (
+                            org_dir TEXT,
+                            dst_dir TEXT,
+                            path TEXT,
+                            org_mtime_ns INTEGER,
+                            dst_mtime_ns INTEGER,
+                            org_entries INTEGER,
+                            dst_entries INTEGER,
+                            PRIMARY KEY (org_dir, dst_dir, path))''')
+            if incremental:
+                rows = conn.execute("""SELECT path, org_mtime_ns, dst_mtime_ns, org_entries, dst_entries
+                                       FROM dir_snapshot WHERE org_dir = ? AND dst_dir = ?""", self.roots)
+                self.stored = {path: tuple(values) for path, *values in rows}
+                self.enabled = bool(self.stored)
+
+    def get(self, rel_dir):
+        """(org_mtime_ns, dst_mtime_ns, org_entries, dst_entries) de la dernière analyse, ou None"""
+        return self.stored.get(rel_dir)
+
+    def add(self, rel_dir, org_st, dst_st, org_entries, dst_entries):
+        """Note l'état d'un répertoire lu des deux côtés pendant l'analyse"""
+        self.seen[rel_dir] = (org_st.st_mtime_ns, dst_st.st_mtime_ns, org_entries, dst_entries)
+
+    def mark_dirty(self, rel_dir):
+        """Le répertoire contient une entrée qui n'est pas à jour"""
+        self.dirty.add(rel_dir)
+
+    def save(self, replace=True):
+        """Prépare les états des répertoires à jour de cette analyse, enregistrés par promote après l'exécution.
+
+        Les états précédents des répertoires lus sont effacés tout de suite : tant
+        que le plan n'est pas exécuté, ces répertoires sont relus entièrement.
+
+        Args:
+            replace (bool): True après un parcours complet, les états des autres répertoires sont
+                effacés ; False après un parcours partiel, seuls les répertoires lus sont mis à jour.
+        """
+        with METRICS.timer('db'), open_db(self.db_path) as conn:
+            if replace:
+                conn.execute("DELETE FROM dir_snapshot WHERE org_dir = ? AND dst_dir = ?", self.roots)
+            else:
+                conn.executemany("DELETE FROM dir_snapshot WHERE org_dir = ? AND dst_dir = ? AND path = ?",
+                                 (self.roots + (path,) for path in self.seen.keys() | self.dirty))
+            conn.execute("DELETE FROM dir_snapshot_pending WHERE org_dir = ? AND dst_dir = ?", self.roots)
+            conn.executemany("""INSERT INTO dir_snapshot_pending (org_dir, dst_dir, path, org_mtime_ns, dst_mtime_ns,
+                                                                  org_entries, dst_entries)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                             (self.roots + (path,) + values for path, values in self.seen.items()
+                              if path not in self.dirty))
+
+    @staticmethod
+    def promote(db_path, org_dir, dst_dir):
+        """Enregistre les états préparés des répertoires dont toutes les lignes du plan sont exécutées ('done').
+
+        Les autres restent en attente, pour une reprise de l'exécution.
+        """
+        roots = (org_dir, dst_dir)
+        with METRICS.timer('db'), open_db(db_path) as conn:
+            blocked = set()
+            for (org_path,) in conn.execute("SELECT org_path FROM sync_plan WHERE status != 'done'"):
+                rel_dir = os.path.relpath(os.path.dirname(os.path.normpath(org_path)), org_dir)
+                blocked.add("" if rel_dir == os.curdir else rel_dir)
+            rows = [row for row in conn.execute("""SELECT path, org_mtime_ns, dst_mtime_ns, org_entries, dst_entries
+                                                    FROM dir_snapshot_pending WHERE org_dir = ? AND dst_dir = ?""", roots)
+                    if row[0] not in blocked]
+            conn.executemany("""INSERT OR REPLACE INTO dir_snapshot (org_dir, dst_dir, path, org_mtime_ns, dst_mtime_ns,
+                                                                     org_entries, dst_entries)
+                                VALUES (?, ?, ?, ?, ?, ?, ?)""", (roots + tuple(row) for row in rows))
+            conn.executemany("DELETE FROM dir_snapshot_pending WHERE org_dir = ? AND dst_dir = ? AND path = ?",
+                             (roots + (row[0],) for row in rows))
+
+
+# Ligne du plan de synchronisation (dates en mtime_ns, None si le côté est absent)
+# id : numéro de la ligne dans sync_plan, None tant que le plan n'est pas enregistré
+# move_from : pour un déplacement ("~~>" ou "<~~"), chemin actuel de l'entrée à déplacer
+# subtree : pour un répertoire créé ou supprimé avec tout son contenu en une action, nombre d'entrées du contenu
+PlanRow = namedtuple('PlanRow', ['org_path', 'org_name', 'org_mtime', 'action', 'dst_path', 'dst_name', 'dst_mtime', 'id',
+                                 'move_from', 'subtree'],
+                     defaults=(None, None, None))
+
+# Actions d'une ligne du plan, codées par leur indice dans PlanStore
+PLAN_ACTIONS = ("===", ">>>", "<<<", "==>", "<==", "--X", "X--", "~~>", "<~~", "/!\\", "-!-")
+PLAN_NO_VALUE = -2 ** 63  # Date, identifiant ou regroupement absent (None) dans PlanStore
+PLAN_SCAN_CHUNK = 65536  # Lignes comptées d'un bloc pour sauter les lignes retirées d'un PlanStore
+
+# Actions regroupées par arborescence entière
+SUBTREE_ACTIONS = (">>>", "<<<", "--X", "X--")
+
+# Action de création -> (action de suppression appariée, action de déplacement)
+MOVE_ACTIONS = {">>>": ("--X", "~~>"), "<<<": ("X--", "<~~")}
+
+
+def format_mtime(mtime_ns):
+    """Formate une date de modification (mtime_ns) pour l'affichage"""
+    return datetime.fromtimestamp(mtime_ns / 1e9).strftime('%y/%m/%d %H:%M:%S') if mtime_ns is not None else ""
+
+
+def init_databases(analyse_db=ANALYSE_DB, config_db=CONFIG_DB):
+    """Initialise les bases de données si elles n'existent pas, et convertit celles des versions précédentes"""
+    with open_db(config_db) as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS sync_config (
+                        key TEXT PRIMARY KEY,
+                        value TEXT)''')
+
+    with open_db(analyse_db) as conn:
+        tables = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+        # Couples de répertoires synchronisés, et état de chaque chemin relatif après la dernière synchronisation
+        conn.execute('''CREATE TABLE IF NOT EXISTS sync_roots (
+                        id INTEGER PRIMARY KEY,
+                        org_dir TEXT,
+                        dst_dir TEXT,
+                        UNIQUE (org_dir, dst_dir))''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS sync_state (
+                        pair INTEGER,
+                        path TEXT,
+                        org_mtime_ns INTEGER,
+                        org_size INTEGER,
+                        dst_mtime_ns INTEGER,
+                        dst_size INTEGER,
+                        PRIMARY KEY (pair, path)) WITHOUT ROWID''')
+
+        # Plan des versions précédentes (dates en secondes) : il suffit de relancer l'analyse
+        if 'sync_plan' in tables and 'org_time' in [column[1] for column in conn.execute("PRAGMA table_info(sync_plan)")]:
+            conn.execute("DROP TABLE sync_plan")
+            log.warning("Plan enregistré par une version précédente effacé, relancez l'analyse")
+        # Plan de la dernière analyse, avec l'état d'avancement de son exécution
+        conn.execute('''CREATE TABLE IF NOT EXISTS sync_plan (
+                        id INTEGER PRIMARY KEY,
+                        org_path TEXT,
+                        org_name TEXT,
+                        org_mtime_ns INTEGER,
+                        action TEXT,
+                        dst_path TEXT,
+                        dst_name TEXT,
+                        dst_mtime_ns INTEGER,
+                        status TEXT DEFAULT 'pending',
+                        move_from TEXT,
+                        subtree INTEGER)''')
+        if 'subtree' not in [column[1] for column in conn.execute("PRAGMA table_info(sync_plan)")]:
+            conn.execute("ALTER TABLE sync_plan ADD COLUMN subtree INTEGER")
+        conn.execute('''CREATE INDEX IF NOT EXISTS sync_plan_status ON sync_plan (status, id)''')
+        conn.execute('''CREATE TABLE IF NOT EXISTS sync_plan_info (
+                        key TEXT PRIMARY KEY,
+                        value TEXT)''')
+
+        migrated = 'sync_analysis' in tables and migrate_sync_analysis(conn, config_db)
+
+    if migrated:
+        conn = open_db(analyse_db)
+        conn.execute("VACUUM")  # Rendre la place de l'ancienne table
+        conn.close()
+
+
+def migrate_sync_analysis(conn, config_db=CONFIG_DB):
+    """Convertit l'ancienne table sync_analysis (chemins absolus, dates formatées) en sync_state.
+
+    Seuls les chemins sous la source et la destination enregistrées dans
+    sync_config (ou à défaut celles du dernier plan) sont repris, puis la
+    table est supprimée. Les dates converties sont à la seconde et sans
+    taille : elles sont comparées à la seconde jusqu'à la prochaine
+    synchronisation du chemin.
+
+    Returns:
+        bool: True si la table a été convertie et supprimée.
+    """
+    roots = load_config("source", config_db), load_config("destination", config_db)
+    if not all(roots):
+        info = dict(conn.execute("SELECT key, value FROM sync_plan_info"))
+        roots = info.get("source"), info.get("destination")
+    if not all(roots):
+        log.warning("sync_analysis non convertie : source et destination inconnues")
+        return False
+
+    org_dir, dst_dir = (os.path.normpath(root) for root in roots)
+    states = {}
+    for path, mtime in conn.execute("SELECT path, time FROM sync_analysis"):
+        try:
+            mtime_ns = int(datetime.strptime(mtime, '%y/%m/%d %H:%M:%S').timestamp()) * 1000000000
+        except (TypeError, ValueError):
+            continue
+        for side, root in ((0, org_dir), (2, dst_dir)):
+            if is_under(path, root):
+                states.setdefault(os.path.relpath(path, root), [None] * 4)[side] = mtime_ns
+
+    pair = root_pair(conn, org_dir, dst_dir)
+    conn.executemany("""INSERT OR REPLACE INTO sync_state (pair, path, org_mtime_ns, org_size, dst_mtime_ns, dst_size)
+                        VALUES (?, ?, ?, ?, ?, ?)""", ((pair, path, *state) for path, state in states.items()))
+    conn.execute("DROP TABLE sync_analysis")
+    log.info("sync_analysis convertie : %d chemins de %s / %s", len(states), org_dir, dst_dir)
+    return True
+
+
+def init_filter_database(filter_db=FILTER_DB):
+    """Initialise la base de données de filtres avec la table nécessaire."""
+    with open_db(filter_db) as conn:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS filters (
+                type TEXT,
+                value TEXT,
+                UNIQUE(type, value)
+            )
+        """)
+        conn.commit()
+
+
+def load_filters(filter_db=FILTER_DB):
+    """Charge les filtres depuis la base de données dans un dictionnaire."""
+    filters = {filter_type: set() for filter_type in FILTER_TYPES}
+    with open_db(filter_db) as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT type, value FROM filters")
+        for filter_type, value in cursor.fetchall():
+            if filter_type in filters:
+                filters[filter_type].add(value)
+    return filters
+
+
+def glob_to_regex(pattern):
+    """Traduit un motif glob en expression régulière sur le chemin relatif (séparateur /).
+
+    Comme dans un .gitignore : '**' couvre plusieurs niveaux, '*' et '?' un
+    seul ; un motif qui commence par '/' ou contient un '/' est ancré à la
+    racine, sinon il s'applique au nom à toute profondeur ; un motif terminé
+    par '/' ne concerne que les répertoires.
+
+    Returns:
+        tuple: (expression régulière, True si le motif ne concerne que les répertoires)
+    """
+    dir_only = pattern.endswith("/")
+    anchored = "/" in pattern.rstrip("/")
+    pattern = pattern.strip("/")
+    parts = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?")
+            i += 3
+            continue
+        char = pattern[i]
+        if pattern.startswith("**", i):
+            parts.append(".*")
+            i += 1
+        elif char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            chars = pattern[i + 1:end]
+            if chars.startswith("!"):
+                chars = "^" + chars[1:]
+            parts.append("[" + chars.replace("\\", "\\\\") + "]")
+            i = end
+        else:
+            parts.append(re.escape(char))
+        i += 1
+    return ("^" if anchored else "(?:^|/)") + "".join(parts) + "$", dir_only
+
+
+class FilterMatcher:
+    """Règles d'exclusion de syncer_filter.db, compilées une fois par analyse.
+
+    Les noms et extensions exacts restent des recherches dans des ensembles ;
+    tous les globs et expressions régulières sont réunis en une seule
+    expression (une pour les règles sur tous les chemins, une pour celles sur
+    les répertoires seulement). Une entrée est exclue si elle correspond à
+    une règle d'exclusion et à aucune règle 'include_*'. Le parcours ne
+    descend pas dans un répertoire exclu : son contenu ne peut pas être
+    réinclus.
+    """
+
+    def __init__(self, filters):
+        self.filenames = set(filters.get('filename', ()))
+        self.extensions = set(filters.get('extension', ()))
+        self.exclude = self.compile(filters.get('glob', ()), filters.get('regex', ()))
+        self.include = self.compile(filters.get('include_glob', ()), filters.get('include_regex', ()))
+
+    @staticmethod
+    def compile(globs, regexes):
+        """(expression pour tous les chemins, expression pour les répertoires), None si aucune règle"""
+        any_path, dirs_only = [], []
+        for pattern in sorted(globs):
+            regex, dir_only = glob_to_regex(pattern)
+            (dirs_only if dir_only else any_path).append(regex)
+        for regex in sorted(regexes):
+            try:
+                re.compile(regex)
+            except re.error as e:
+                log.warning("Filtre ignoré, expression invalide %s : %s", regex, e)
+                continue
+            any_path.append(regex)
+        return tuple(re.compile("|".join(f"(?:{regex})" for regex in regexes)) if regexes else None
+                     for regexes in (any_path, dirs_only))
+
+    @staticmethod
+    def matches(compiled, path, is_dir):
+        any_path, dirs_only = compiled
+        return bool((any_path and any_path.search(path)) or (is_dir and dirs_only and dirs_only.search(path)))
+
+    def excluded(self, rel_path, is_dir=False):
+        """Vérifie si un chemin relatif doit être exclu"""
+        name = os.path.basename(rel_path)
+        path = rel_path.replace(os.sep, "/")
+        if not (name in self.filenames or os.path.splitext(name)[1] in self.extensions
+                or self.matches(self.exclude, path, is_dir)):
+            return False
+        return not self.matches(self.include, path, is_dir)
+
+
+def load_config(key, config_db=CONFIG_DB):
+    """Lit une valeur de sync_config, None si elle n'est pas définie"""
+    with open_db(config_db) as conn:
+        row = conn.execute("SELECT value FROM sync_config WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+
+def load_hash_mode(config_db=CONFIG_DB):
+    """Mode empreinte activé dans sync_config (clé 'hash_mode' à 1)"""
+    return load_config("hash_mode", config_db) in ("1", "true", "yes")
+
+
+def load_incremental(config_db=CONFIG_DB):
+    """Analyse incrémentale activée dans sync_config (clé 'incremental' à 1)"""
+    return load_config("incremental", config_db) in ("1", "true", "yes")
+
+
+def load_delta_min_size(config_db=CONFIG_DB):
+    """Taille minimale de la copie différentielle dans sync_config, 0 si elle est désactivée"""
+    try:
+        return max(0, int(load_config("delta_min_size", config_db) or 0))
+    except ValueError:
+        return 0
+
+
+def load_delta_in_place(config_db=CONFIG_DB):
+    """Copie différentielle sur place autorisée dans sync_config (clé 'delta_in_place' à 1)"""
+    return load_config("delta_in_place", config_db) in ("1", "true", "yes")
+
+
+def load_copy_buffer(config_db=CONFIG_DB):
+    """Taille du tampon de copie dans sync_config, ou COPY_BUFFER"""
+    try:
+        return max(64 * 1024, int(load_config("copy_buffer", config_db) or COPY_BUFFER))
+    except ValueError:
+        return COPY_BUFFER
+
+
+def load_scan_workers(config_db=CONFIG_DB):
+    """Répertoires lus en parallèle (source, destination), depuis sync_config ; None pour le choix automatique"""
+    counts = []
+    for key in ("scan_workers_org", "scan_workers_dst"):
+        value = load_config(key, config_db)
+        try:
+            counts.append(max(1, int(value)) if value else None)
+        except ValueError:
+            counts.append(None)
+    return tuple(counts)
+
+
+def load_workers(config_db=CONFIG_DB):
+    """Nombre d'actions exécutées en parallèle, depuis sync_config ou WORKERS"""
+    value = load_config("workers", config_db)
+    try:
+        return max(1, int(value)) if value else WORKERS
+    except ValueError:
+        return WORKERS
+
+
+class Throttle:
+    """Limiteur de débit par seau à jetons, partagé par les threads d'exécution.
+
+    Deux seaux limitent les octets copiés et les opérations par seconde (0 :
+    pas de limite). Chaque seau peut contenir une seconde de débit ; une copie
+    plus grosse que le seau le met en dette et le thread attend d'autant.
+
+    Avec une latence cible, le débit autorisé baisse de moitié quand une
+    opération dépasse la cible (par Mo copié pour les gros fichiers) et
+    remonte progressivement sinon. Elle n'agit que sur les limites configurées.
+    """
+
+    def __init__(self, bytes_per_sec=0, ops_per_sec=0, target_latency_ms=0):
+        self.lock = threading.Lock()
+        self.factor = 1.0  # Part du débit configuré actuellement autorisée
+        self.bytes_tokens = 0.0
+        self.ops_tokens = 0.0
+        self.last = time.monotonic()
+        self.set_limits(bytes_per_sec, ops_per_sec, target_latency_ms)
+
+    @classmethod
+    def from_config(cls, config_db=CONFIG_DB):
+        """Crée un limiteur depuis les clés de débit de sync_config"""
+        throttle = cls()
+        throttle.load(config_db)
+        return throttle
+
+    def load(self, config_db=CONFIG_DB):
+        """Relit les limites dans sync_config ; peut être appelé pendant une exécution"""
+        limits = []
+        for key in THROTTLE_KEYS:
+            try:
+                limits.append(float(load_config(key, config_db) or 0))
+            except ValueError:
+                limits.append(0.0)
+        self.set_limits(*limits)
+
+    def set_limits(self, bytes_per_sec, ops_per_sec, target_latency_ms=0):
+        """Change les limites, y compris pendant une exécution"""
+        with self.lock:
+            self.bytes_per_sec = max(0.0, bytes_per_sec)
+            self.ops_per_sec = max(0.0, ops_per_sec)
+            self.target_latency = max(0.0, target_latency_ms) / 1000
+            if not self.target_latency:
+                self.factor = 1.0
+
+    def acquire(self, nbytes=0):
+        """Attend que le débit permette une opération de nbytes octets"""
+        with self.lock:
+            now = time.monotonic()
+            elapsed = now - self.last
+            self.last = now
+            wait_time = 0.0
+
+            bytes_rate = self.bytes_per_sec * self.factor
+            if bytes_rate:
+                self.bytes_tokens = min(bytes_rate, self.bytes_tokens + elapsed * bytes_rate) - nbytes
+                if self.bytes_tokens < 0:
+                    wait_time = -self.bytes_tokens / bytes_rate
+
+            ops_rate = self.ops_per_sec * self.factor
+            if ops_rate:
+                self.ops_tokens = min(ops_rate, self.ops_tokens + elapsed * ops_rate) - 1
+                if self.ops_tokens < 0:
+                    wait_time = max(wait_time, -self.ops_tokens / ops_rate)
+
+        if wait_time:
+            time.sleep(wait_time)
+
+    def observe(self, duration, nbytes=0):
+        """Ajuste le débit selon la durée observée d'une opération"""
+        if not self.target_latency:
+            return
+        # Latence ramenée à 1 Mo pour ne pas pénaliser les gros fichiers
+        latency = duration / max(1.0, nbytes / (1024 * 1024))
+        with self.lock:
+            if latency > self.target_latency:
+                self.factor = max(THROTTLE_MIN_FACTOR, self.factor / 2)
+            else:
+                self.factor = min(1.0, self.factor + 0.05)
+
+
+def plan_row_from_db(record):
+    """Reconstruit une ligne du plan depuis une ligne de sync_plan"""
+    plan_id, org_path, org_name, org_mtime, action, dst_path, dst_name, dst_mtime, move_from, subtree = record
+    return PlanRow(org_path, org_name, org_mtime, action, dst_path, dst_name, dst_mtime, plan_id, move_from, subtree)
+
+
+def iter_plan(analyse_db=ANALYSE_DB, status="pending"):
+    """Parcourt le plan enregistré dans l'ordre, sans le charger entièrement en mémoire.
+
+    Yields:
+        PlanRow: lignes de sync_plan ayant le statut demandé.
+    """
+    conn = open_db(analyse_db)
+    try:
+        cursor = conn.execute("""SELECT id, org_path, org_name, org_mtime_ns, action, dst_path, dst_name, dst_mtime_ns, move_from,
+                                        subtree
+                                 FROM sync_plan WHERE status = ? ORDER BY id""", (status,))
+        while True:
+            records = cursor.fetchmany(PLAN_BATCH)
+            if not records:
+                break
+            for record in records:
+                yield plan_row_from_db(record)
+    finally:
+        conn.close()
+
+
+def load_plan_roots(analyse_db=ANALYSE_DB):
+    """Répertoires source et destination du plan enregistré, ou None s'il n'y en a pas ou s'il est incomplet"""
+    with open_db(analyse_db) as conn:
+        info = dict(conn.execute("SELECT key, value FROM sync_plan_info"))
+    if "source" not in info or "destination" not in info:
+        return None
+    if info.get("complete", "1") != "1":  # Analyse annulée ou interrompue
+        return None
+    return info["source"], info["destination"]
+
+
+# Tables de syncer_analyse.db vidées par clear_analysis_db (certaines ne sont créées qu'à leur première utilisation)
+ANALYSIS_TABLES = ("sync_state", "sync_plan", "sync_plan_info", "dir_snapshot", "dir_snapshot_pending", "hash_cache",
+                   "copy_progress", "block_signature")
+
+
+def clear_analysis_db(analyse_db=ANALYSE_DB):
+    """Efface l'état de synchronisation, le plan et tous les caches de la base d'analyse"""
+    with open_db(analyse_db) as conn:
+        existing = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table in ANALYSIS_TABLES:
+            if table in existing:
+                conn.execute(f"DELETE FROM {table}")
+
+
+def count_plan(analyse_db=ANALYSE_DB, status="pending"):
+    """Nombre de lignes du plan enregistré ayant un statut donné"""
+    with open_db(analyse_db) as conn:
+        return conn.execute("SELECT COUNT(*) FROM sync_plan WHERE status = ?", (status,)).fetchone()[0]
+
+
+def change_plan_action(row, action):
+    """Ligne du plan avec une autre action, choisie par l'utilisateur.
+
+    Un déplacement remplacé par une autre action redevient une ligne à un
+    seul côté : move_from et le nom et la date repris de l'entrée à déplacer
+    sont effacés (l'entrée reste à son ancien emplacement).
+
+    Raises:
+        ValueError: Déplacement choisi pour une ligne qui n'est pas ce déplacement.
+    """
+    if action == row.action:
+        return row
+    if action in ("~~>", "<~~"):
+        raise ValueError(f"{action} ne peut être choisi que pour un déplacement détecté par l'analyse")
+    if row.action == "~~>":
+        row = row._replace(dst_name="", dst_mtime=None, move_from=None)
+    elif row.action == "<~~":
+        row = row._replace(org_name="", org_mtime=None, move_from=None)
+    return row._replace(action=action, move_from=None)
+
+
+def set_plan_action(row, analyse_db=ANALYSE_DB):
+    """Enregistre l'action d'une ligne du plan modifiée par change_plan_action"""
+    with open_db(analyse_db) as conn:
+        conn.execute("""UPDATE sync_plan SET action = ?, org_name = ?, org_mtime_ns = ?, dst_name = ?, dst_mtime_ns = ?,
+                                             move_from = ?
+                        WHERE id = ?""",
+                     (row.action, row.org_name, row.org_mtime, row.dst_name, row.dst_mtime, row.move_from, row.id))
+
+
+class PlanStore:
+    """Plan gardé en mémoire sous forme compacte, pour l'affichage de plans de plusieurs millions de lignes.
+
+    Au lieu d'un PlanRow par ligne (deux chemins absolus complets, des entiers
+    Python), chaque répertoire est interné une seule fois dans une table
+    (parent, nom), les noms sont mis bout à bout dans un bytearray, et
+    l'action, les dates, l'identifiant et la taille de regroupement sont dans
+    des tableaux typés. Les PlanRow sont reconstruits à la demande.
+
+    Les lignes qui ne suivent pas la forme habituelle (déplacements, noms
+    différents des deux côtés, action inconnue) sont gardées telles quelles.
+
+    Une ligne retirée (remove) garde son indice ; elle n'est plus parcourue
+    ni comptée dans remaining().
+    """
+
+    def __init__(self):
+        self.dir_parents = array('q')  # Parent de chaque répertoire interné, -1 pour une racine
+        self.dir_names = []  # Nom de chaque répertoire interné (chemin complet pour une racine)
+        self.dir_ids = {}  # (parent, nom) -> répertoire
+        self.last_dirs = {}  # Côté -> (chemin, répertoire) de la ligne précédente
+        self.org_dirs = array('q')
+        self.dst_dirs = array('q')
+        self.names = bytearray()
+        self.name_ends = array('Q')  # Fin du nom de chaque ligne dans self.names
+        self.flags = array('B')  # Nom de chaque côté (0 le nom de la ligne, 1 vide, 2 None), source + 3 * destination
+        self.actions = array('B')  # Indice dans PLAN_ACTIONS
+        self.org_mtimes = array('q')
+        self.dst_mtimes = array('q')
+        self.ids = array('q')
+        self.subtrees = array('q')
+        self.extra = {}  # Indice -> PlanRow des lignes gardées telles quelles
+        self.removed = bytearray()  # 1 pour une ligne retirée
+        self.removed_count = 0
+        self.first_live = 0  # Première ligne non retirée
+
+    def __len__(self):
+        return len(self.actions)
+
+    def __iter__(self):
+        for index in self.live_indices(0, len(self)):
+            yield self[index]
+
+    def remaining(self):
+        """Nombre de lignes non retirées"""
+        return len(self) - self.removed_count
+
+    def remove(self, index):
+        """Retire une ligne, sans changer l'indice des autres"""
+        if self.removed[index]:
+            return
+        self.removed[index] = 1
+        self.removed_count += 1
+        self.extra.pop(index, None)
+        while self.first_live < len(self) and self.removed[self.first_live]:
+            self.first_live += 1
+
+    def find(self, row_id):
+        """Indice de la ligne d'identifiant row_id, ou None.
+
+        Les identifiants suivent l'ordre du plan : recherche dichotomique,
+        puis parcours complet pour les lignes ajoutées sans identifiant.
+        """
+        index = bisect_left(self.ids, row_id)
+        if index < len(self) and self.ids[index] == row_id:
+            return index
+        try:
+            return self.ids.index(row_id)
+        except ValueError:
+            return None
+
+    def live_indices(self, start, count):
+        """Indices des count lignes non retirées à partir de la start-ième d'entre elles"""
+        index = self.first_live + start
+        if self.removed_count > self.first_live:  # Des lignes retirées après la première restante
+            index = self.first_live
+            while start and index < len(self):
+                end = min(index + PLAN_SCAN_CHUNK, len(self))
+                live = end - index - self.removed.count(1, index, end)
+                if live > start:
+                    break
+                start -= live
+                index = end
+            while index < len(self) and (start or self.removed[index]):
+                start -= not self.removed[index]
+                index += 1
+        while count > 0 and index < len(self):
+            if not self.removed[index]:
+                yield index
+                count -= 1
+            index += 1
+
+    def append(self, row):
+        self.removed.append(0)
+        self.org_dirs.append(-1)
+        self.dst_dirs.append(-1)
+        self.name_ends.append(len(self.names))
+        for values in (self.flags, self.actions):
+            values.append(0)
+        for values in (self.org_mtimes, self.dst_mtimes, self.ids, self.subtrees):
+            values.append(PLAN_NO_VALUE)
+        self[len(self) - 1] = row
+
+    def extend(self, rows):
+        for row in rows:
+            self.append(row)
+
+    def __setitem__(self, index, row):
+        fields = self.encode(row)
+        start = self.name_ends[index - 1] if index else 0
+        if fields is None or (index < len(self) - 1 and self.names[start:self.name_ends[index]] != fields[2]):
+            self.extra[index] = row  # Le nom d'une ligne déjà rangée ne peut pas changer de longueur
+            self.ids[index] = row.id if type(row.id) is int else PLAN_NO_VALUE  # Pour find
+            return
+        self.extra.pop(index, None)
+        self.org_dirs[index], self.dst_dirs[index], name, self.flags[index], self.actions[index] = fields[:5]
+        self.org_mtimes[index], self.dst_mtimes[index], self.ids[index], self.subtrees[index] = fields[5:]
+        if index == len(self) - 1:
+            del self.names[start:]
+            self.names += name
+            self.name_ends[index] = len(self.names)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if self.extra and index in self.extra:
+            return self.extra[index]
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        name = os.fsdecode(bytes(self.names[self.name_ends[index - 1] if index else 0:self.name_ends[index]]))
+        flags = self.flags[index]
+        return PlanRow(os.path.join(self.dir_path(self.org_dirs[index]), name),
+                       (name, "", None)[flags % 3],
+                       self.value(self.org_mtimes[index]), PLAN_ACTIONS[self.actions[index]],
+                       os.path.join(self.dir_path(self.dst_dirs[index]), name),
+                       (name, "", None)[flags // 3],
+                       self.value(self.dst_mtimes[index]), self.value(self.ids[index]), None,
+                       self.value(self.subtrees[index]))
+
+    @staticmethod
+    def value(number):
+        return None if number == PLAN_NO_VALUE else number
+
+    def encode(self, row):
+        """Champs compacts d'une ligne, ou None si elle doit être gardée telle quelle"""
+        if row.move_from is not None or row.action not in PLAN_ACTIONS or not row.org_path or not row.dst_path:
+            return None
+        org_dir, name = os.path.split(row.org_path)
+        dst_dir, dst_name = os.path.split(row.dst_path)
+        numbers = (row.org_mtime, row.dst_mtime, row.id, row.subtree)
+        if not name or dst_name != name or not all(number is None or type(number) is int for number in numbers):
+            return None
+        if os.path.join(org_dir, name) != row.org_path or os.path.join(dst_dir, name) != row.dst_path:
+            return None  # Séparateur en double avant le nom, perdu par os.path.split
+        names = (name, "", None)
+        if row.org_name not in names or row.dst_name not in names:
+            return None
+        org_id = self.intern("org", org_dir)
+        dst_id = self.intern("dst", dst_dir)
+        if org_id is None or dst_id is None:
+            return None
+        return (org_id, dst_id, os.fsencode(name), names.index(row.org_name) + 3 * names.index(row.dst_name),
+                PLAN_ACTIONS.index(row.action),
+                *(PLAN_NO_VALUE if number is None else number for number in numbers))
+
+    def intern(self, side, path):
+        """Répertoire interné pour path, ou None si le chemin ne se reconstruit pas à l'identique"""
+        last = self.last_dirs.get(side)
+        if last and last[0] == path:
+            return last[1]
+        dir_id = self.intern_dir(path)
+        if self.dir_path(dir_id) != path:  # Par exemple un séparateur en double
+            return None
+        self.last_dirs[side] = (path, dir_id)
+        return dir_id
+
+    def intern_dir(self, path):
+        parent, name = os.path.split(path)
+        key = (self.intern_dir(parent), name) if name and parent != path else (-1, path)
+        dir_id = self.dir_ids.get(key)
+        if dir_id is None:
+            dir_id = self.dir_ids[key] = len(self.dir_names)
+            self.dir_parents.append(key[0])
+            self.dir_names.append(key[1])
+        return dir_id
+
+    def dir_path(self, dir_id):
+        """Chemin complet d'un répertoire interné"""
+        names = []
+        while dir_id >= 0:
+            names.append(self.dir_names[dir_id])
+            dir_id = self.dir_parents[dir_id]
+        return os.path.join(*reversed(names))
+
+
+class PlanWriter:
+    """Enregistre le plan dans sync_plan pendant l'analyse, par lots.
+
+    Le plan précédent est remplacé ; chaque ligne reçoit son identifiant
+    (ordre d'exécution) et le statut 'pending'. Le plan reste marqué
+    incomplet dans sync_plan_info tant que close(complete=True) n'a pas été
+    appelé : une analyse annulée ne laisse pas un plan partiel exécutable.
+    """
+
+    def __init__(self, analyse_db, org_dir, dst_dir):
+        self.conn = open_db(analyse_db)
+        with self.conn:
+            self.conn.execute("DELETE FROM sync_plan")
+            self.conn.execute("DELETE FROM sync_plan_info")
+            self.conn.executemany("INSERT INTO sync_plan_info (key, value) VALUES (?, ?)",
+                                  (("source", org_dir), ("destination", dst_dir), ("complete", "0")))
+        self.next_id = 1
+        self.batch = []
+
+    def add(self, row):
+        """Numérote et met en attente une ligne ; renvoie la ligne avec son identifiant"""
+        row = row._replace(id=self.next_id)
+        self.next_id += 1
+        self.batch.append((row.id, row.org_path, row.org_name, row.org_mtime, row.action,
+                           row.dst_path, row.dst_name, row.dst_mtime, row.move_from, row.subtree))
+        if len(self.batch) >= PLAN_BATCH:
+            self.flush()
+        return row
+
+    def flush(self):
+        with METRICS.timer('db'), self.conn:
+            self.conn.executemany("""INSERT INTO sync_plan (id, org_path, org_name, org_mtime_ns, action, dst_path, dst_name,
+                                                            dst_mtime_ns, move_from, subtree)
+                                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", self.batch)
+        self.batch = []
+
+    def close(self, complete=False):
+        self.flush()
+        if complete:
+            with self.conn:
+                self.conn.execute("UPDATE sync_plan_info SET value = '1' WHERE key = 'complete'")
+        self.conn.close()
+
+
+class StateStore:
+    """Écritures de sync_state pendant l'exécution, validées par groupes.
+
+    Une seule connexion reste ouverte, en journal WAL. Les mises à jour sont
+    accumulées puis écrites par executemany dans une transaction toutes les
+    group_size actions ou group_ms millisecondes. Chaque transaction contient
+    aussi le statut des lignes de sync_plan concernées : après un arrêt
+    brutal, une ligne est marquée 'done' si et seulement si son état a été
+    enregistré, et la reprise repart des lignes encore 'pending'.
+    """
+
+    def __init__(self, db_path, org_dir, dst_dir, group_size=STATE_GROUP_SIZE, group_ms=STATE_GROUP_MS):
+        self.conn = open_db(db_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")  # Suffisant en WAL pour rester cohérent
+        with self.conn:
+            self.pair = root_pair(self.conn, org_dir, dst_dir)
+        self.group_size = group_size
+        self.group_ms = group_ms
+        self.upserts = []
+        self.deletes = []
+        self.renames = []
+        self.removed = []
+        self.statuses = []
+        self.count = 0
+        self.last_commit = time.monotonic()
+
+    def record(self, plan_id, states, status="done", renames=(), removed=()):
+        """Enregistre le résultat d'une ligne du plan.
+
+        Args:
+            plan_id (int): Identifiant de la ligne dans sync_plan, ou None.
+            states (dict): {chemin relatif: (org_mtime_ns, org_size, dst_mtime_ns, dst_size)}
+                à enregistrer, None pour supprimer le chemin.
+            status (str): Nouveau statut de la ligne ('done' ou 'skipped').
+            renames (iterable): (ancien chemin relatif, nouveau) déplacés, avec tout leur contenu.
+            removed (iterable): Chemins relatifs supprimés avec tout leur contenu.
+        """
+        for old_path, new_path in renames:
+            self.renames.append((new_path, len(old_path) + 1, self.pair, old_path, len(old_path) + 1, old_path + os.sep))
+        for path in removed:
+            self.removed.append((self.pair, path, len(path) + 1, path + os.sep))
+        for path, state in states.items():
+            if state is None:
+                self.deletes.append((self.pair, path))
+            else:
+                self.upserts.append((self.pair, path, *state))
+        if plan_id is not None:
+            self.statuses.append((status, plan_id))
+        self.count += 1
+
+        if self.count >= self.group_size or (time.monotonic() - self.last_commit) * 1000 >= self.group_ms:
+            self.flush()
+
+    def flush(self):
+        """Écrit le groupe en attente dans une seule transaction"""
+        if self.count:
+            with METRICS.timer('db'), self.conn:
+                # Un déplacement réécrit le chemin et ceux de tout le contenu en une requête
+                self.conn.executemany("""UPDATE OR REPLACE sync_state SET path = ? || substr(path, ?)
+                                         WHERE pair = ? AND (path = ? OR substr(path, 1, ?) = ?)""", self.renames)
+                self.conn.executemany("DELETE FROM sync_state WHERE pair = ? AND (path = ? OR substr(path, 1, ?) = ?)",
+                                      self.removed)
+                self.conn.executemany("DELETE FROM sync_state WHERE pair = ? AND path = ?", self.deletes)
+                self.conn.executemany("""INSERT OR REPLACE INTO sync_state (pair, path, org_mtime_ns, org_size,
+                                                                          dst_mtime_ns, dst_size)
+                                         VALUES (?, ?, ?, ?, ?, ?)""", self.upserts)
+                self.conn.executemany("UPDATE sync_plan SET status = ? WHERE id = ?", self.statuses)
+            self.upserts, self.deletes, self.renames, self.removed, self.statuses = [], [], [], [], []
+            self.count = 0
+        self.last_commit = time.monotonic()
+
+    def close(self):
+        """Valide le dernier groupe et ferme la connexion"""
+        self.flush()
+        self.conn.close()
+
+
+def fsync_dir(path):
+    """Écrit sur disque les entrées d'un répertoire (renommages) ; sans effet là où un répertoire ne s'ouvre pas"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:  # Windows
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def fsync_path(path):
+    """Écrit sur disque un fichier ouvert en lecture seule (POSIX), même sans droit d'écriture"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def same_file_content(path, other_path, chunk_size=HASH_CHUNK):
+    """Compare le contenu de deux fichiers, lus par blocs, jusqu'à la première différence"""
+    size = 0
+    try:
+        with open(path, 'rb') as f, open(other_path, 'rb') as other:
+            while True:
+                chunk = f.read(chunk_size)
+                size += len(chunk)
+                if chunk != other.read(chunk_size):
+                    return False
+                if not chunk:
+                    return True
+    finally:
+        if METRICS.enabled:
+            METRICS.add('bytes_read', 2 * size)
+
+
+def hash_file(path, chunk_size=HASH_CHUNK):
+    """Empreinte BLAKE2b du contenu d'un fichier, lu par blocs"""
+    digest = hashlib.blake2b(digest_size=20)
+    size = 0
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+            size += len(chunk)
+    if METRICS.enabled:
+        METRICS.add('bytes_read', size)
+    return digest.hexdigest()
+
+
+class HashIndex:
+    """Empreintes de contenu avec cache persistant dans la table hash_cache.
+
+    Une empreinte est réutilisée tant que le chemin, la taille, mtime_ns et
+    l'inode du fichier n'ont pas changé : un fichier inchangé n'est jamais
+    relu. Les fichiers à lire sont hachés par un pool de threads (hashlib
+    libère le GIL sur les gros blocs, les calculs occupent donc plusieurs
+    cœurs). Les nouvelles empreintes sont écrites à la fermeture.
+    """
+
+    def __init__(self, db_path, workers=HASH_WORKERS):
+        self.conn = open_db(db_path)
+        self.conn.execute('''CREATE TABLE IF NOT EXISTS hash_cache (
+                             path TEXT PRIMARY KEY,
+                             size INTEGER,
+                             mtime_ns INTEGER,
+                             inode INTEGER,
+                             hash TEXT)''')
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()
+        self.new = []
+
+    def submit(self, path, st):
+        """Renvoie un Future de l'empreinte du fichier, immédiat si elle est en cache"""
+        row = self.conn.execute("SELECT hash FROM hash_cache WHERE path = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                                (path, st.st_size, st.st_mtime_ns, st.st_ino)).fetchone()
+        if row:
+            future = Future()
+            future.set_result(row[0])
+            return future
+        return self.pool.submit(self._hash, path, st)
+
+    def _hash(self, path, st):
+        digest = hash_file(path)
+        with self.lock:
+            self.new.append((path, st.st_size, st.st_mtime_ns, st.st_ino, digest))
+        return digest
+
+    def close(self):
+        """Attend les calculs en cours et enregistre les nouvelles empreintes"""
+        self.pool.shutdown(wait=True)
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO hash_cache (path, size, mtime_ns, inode, hash) VALUES (?, ?, ?, ?, ?)",
+                                  self.new)
+        self.conn.close()
+
+
+class CopyBackend:
+    """Copie de fichiers par la méthode la plus rapide disponible, sans jamais laisser de cible tronquée.
+
+    Dans l'ordre : clone (ioctl FICLONE, btrfs et XFS : aucune donnée
+    copiée), os.copy_file_range (copie dans le noyau, ou sur le serveur en
+    NFS 4.2), os.sendfile, puis lecture et écriture par tampon de
+    buffer_size octets. Une méthode refusée entre deux systèmes de fichiers
+    n'est plus essayée pour ce couple. Les dates et permissions sont copiées
+    comme par shutil.copy2.
+
+    La copie est écrite dans un fichier temporaire du répertoire cible,
+    synchronisé sur disque puis renommé sur la cible. Les fichiers d'au moins
+    COPY_RESUME_MIN_SIZE octets sont copiés par blocs de COPY_CHUNK octets,
+    et la position atteinte est enregistrée dans la table copy_progress :
+    une copie interrompue reprend au dernier bloc vérifié identique à la
+    source, tant que la source n'a pas changé.
+    """
+
+    def __init__(self, db_path=None, buffer_size=COPY_BUFFER):
+        self.db_path = db_path  # None : pas de reprise des grosses copies
+        self.buffer_size = buffer_size
+        self.unsupported = {}  # (st_dev source, st_dev destination) -> méthodes refusées
+        self.counts = dict.fromkeys(COPY_METHODS, 0)
+        self.lock = threading.Lock()
+        if db_path:
+            with open_db(db_path) as conn:
+                conn.execute('''CREATE TABLE IF NOT EXISTS copy_progress (
+                                dst_path TEXT PRIMARY KEY,
+                                src_path TEXT,
+                                size INTEGER,
+                                mtime_ns INTEGER,
+                                offset INTEGER)''')
+
+    def copy(self, src_path, dst_path):
+        """Copie le contenu et les métadonnées de src_path vers dst_path.
+
+        Returns:
+            str: Méthode utilisée, parmi COPY_METHODS.
+        """
+        tmp_path = self.temp_path(dst_path)
+        st = stat_path(src_path)
+        resumable = self.db_path is not None and st.st_size >= COPY_RESUME_MIN_SIZE
+        offset = self.resume_offset(src_path, st, dst_path, tmp_path) if resumable else 0
+        resumed = offset
+        if offset:
+            log.info("Reprise de la copie de %s à %d octets sur %d", src_path, offset, st.st_size)
+
+        progress = bool(offset)  # Une ligne de copy_progress permet de reprendre depuis le fichier temporaire
+        try:
+            with open(src_path, 'rb', buffering=0) as src, open(tmp_path, 'r+b' if offset else 'wb', buffering=0) as dst:
+                devices = (st.st_dev, os.fstat(dst.fileno()).st_dev)
+                method = None
+                if not offset and "reflink" not in self.unsupported.get(devices, ()):
+                    try:
+                        self.copy_reflink(src, dst)
+                        method = "reflink"
+                    except OSError as e:
+                        self.refuse("reflink", devices, e)
+                if method != "reflink":
+                    while offset < st.st_size:
+                        length = min(COPY_CHUNK if resumable else st.st_size, st.st_size - offset)
+                        method = self.copy_range(src, dst, offset, length, devices)
+                        offset += length
+                        if resumable and offset < st.st_size:
+                            os.fsync(dst.fileno())
+                            self.save_progress(src_path, st, dst_path, offset)
+                            progress = True
+                    dst.truncate(st.st_size)
+                os.fsync(dst.fileno())
+
+            copy_metadata(src_path, tmp_path)
+            os.replace(tmp_path, dst_path)
+        except BaseException:
+            # Sans reprise possible, ne pas laisser un fichier temporaire caché dans la destination
+            if not progress:
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+            raise
+        if resumable:
+            self.save_progress(src_path, st, dst_path, None)
+        method = method or COPY_METHODS[-1]  # Fichier vide
+        with self.lock:
+            self.counts[method] += 1
+        if METRICS.enabled:
+            METRICS.add('bytes_read', st.st_size - resumed)
+            METRICS.add('bytes_written', st.st_size - resumed)
+            METRICS.add('files_copied')
+        log.debug("Copie (%s) de %s vers %s", method, src_path, dst_path)
+        return method
+
+    def copy_small(self, src_path, dst_path, size):
+        """Écrit le contenu d'un petit fichier dans son fichier temporaire, sans fsync ni métadonnées.
+
+        La copie est terminée par SmallFileBatch.flush.
+
+        Returns:
+            str: Chemin du fichier temporaire.
+        """
+        tmp_path = self.temp_path(dst_path)
+        try:
+            with open(src_path, 'rb') as src, open(tmp_path, 'wb') as dst:
+                # Lecture par blocs bornés, même si le fichier a grossi depuis son stat
+                shutil.copyfileobj(src, dst, SMALL_FILE_MAX)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(tmp_path)
+            raise
+        with self.lock:
+            self.counts[COPY_METHODS[-1]] += 1
+        if METRICS.enabled:
+            METRICS.add('bytes_read', size)
+            METRICS.add('bytes_written', size)
+        return tmp_path
+
+    @staticmethod
+    def temp_path(dst_path):
+        """Fichier temporaire d'une copie vers dst_path, dans le même répertoire"""
+        return os.path.join(os.path.dirname(dst_path), f".{os.path.basename(dst_path)}{COPY_TEMP_SUFFIX}")
+
+    def copy_range(self, src, dst, offset, length, devices):
+        """Copie length octets à la position offset avec la première méthode acceptée"""
+        for method in COPY_METHODS[1:]:
+            if method in self.unsupported.get(devices, ()):
+                continue
+            try:
+                getattr(self, f"copy_{method}")(src, dst, offset, length)
+                return method
+            except (OSError, AttributeError) as e:  # AttributeError : fonction absente de cette plateforme
+                if method == COPY_METHODS[-1]:
+                    raise
+                self.refuse(method, devices, e)
+
+    def refuse(self, method, devices, error):
+        """Note qu'une méthode n'est pas disponible, ou relance une vraie erreur d'entrée-sortie"""
+        if isinstance(error, OSError) and error.errno not in COPY_UNSUPPORTED:
+            raise error
+        with self.lock:
+            self.unsupported.setdefault(devices, set()).add(method)
+
+    def copy_reflink(self, src, dst):
+        if fcntl is None:
+            raise OSError(errno.ENOTSUP, "ioctl indisponible")
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+
+    def copy_copy_file_range(self, src, dst, offset, length):
+        end = offset + length
+        while offset < end:
+            copied = os.copy_file_range(src.fileno(), dst.fileno(), min(end - offset, 1 << 30), offset, offset)
+            if copied == 0:
+                if offset == end - length:  # Certains systèmes de fichiers ne copient rien sans erreur
+                    raise OSError(errno.ENOTSUP, "copy_file_range sans effet")
+                break
+            offset += copied
+
+    def copy_sendfile(self, src, dst, offset, length):
+        end = offset + length
+        dst.seek(offset)
+        while offset < end:
+            sent = os.sendfile(dst.fileno(), src.fileno(), offset, min(end - offset, 1 << 30))
+            if sent == 0:
+                if offset == end - length:
+                    raise OSError(errno.ENOTSUP, "sendfile sans effet")
+                break
+            offset += sent
+
+    def copy_buffer(self, src, dst, offset, length):
+        src.seek(offset)
+        dst.seek(offset)
+        buffer = bytearray(max(1, min(self.buffer_size, length)))
+        view = memoryview(buffer)
+        while length > 0:
+            read = src.readinto(view[:min(len(buffer), length)])
+            if not read:
+                break
+            written = 0
+            while written < read:
+                written += dst.write(view[written:read])
+            length -= read
+
+    def resume_offset(self, src_path, st, dst_path, tmp_path):
+        """Position de reprise d'une copie interrompue, 0 pour recommencer"""
+        with open_db(self.db_path, timeout=30) as conn:
+            row = conn.execute("SELECT src_path, size, mtime_ns, offset FROM copy_progress WHERE dst_path = ?",
+                               (dst_path,)).fetchone()
+        if row is None or tuple(row[:3]) != (src_path, st.st_size, st.st_mtime_ns):
+            return 0
+        try:
+            offset = min(row[3], stat_path(tmp_path).st_size)
+        except OSError:
+            return 0
+
+        # Le dernier bloc écrit doit être identique à la source, sinon on recule d'un bloc
+        offset -= offset % COPY_CHUNK
+        with open(src_path, 'rb') as src, open(tmp_path, 'rb') as tmp:
+            while offset > 0:
+                start = offset - COPY_CHUNK
+                src.seek(start)
+                tmp.seek(start)
+                position = start
+                while position < offset and src.read(HASH_CHUNK) == tmp.read(HASH_CHUNK):
+                    position += HASH_CHUNK
+                if position >= offset:
+                    break
+                offset = start
+        return offset
+
+    def save_progress(self, src_path, st, dst_path, offset):
+        """Enregistre la position atteinte, ou efface la ligne si offset est None"""
+        with open_db(self.db_path, timeout=30) as conn:
+            if offset is None:
+                conn.execute("DELETE FROM copy_progress WHERE dst_path = ?", (dst_path,))
+            else:
+                conn.execute("REPLACE INTO copy_progress (dst_path, src_path, size, mtime_ns, offset) VALUES (?, ?, ?, ?, ?)",
+                             (dst_path, src_path, st.st_size, st.st_mtime_ns, offset))
+
+    def summary(self):
+        """Nombre de fichiers copiés par méthode, pour l'affichage"""
+        return ", ".join(f"{method} {count}" for method, count in self.counts.items())
+
+
+class SmallFileBatch:
+    """Copies de petits fichiers regroupées pour réduire les appels système par fichier.
+
+    Le contenu de chaque fichier est écrit tout de suite dans son fichier
+    temporaire (CopyBackend.copy_small), sans fsync. Au vidage du lot, les
+    métadonnées sont appliquées à tous les fichiers, le lot entier est écrit
+    sur disque par un seul syncfs par système de fichiers, puis les fichiers
+    sont renommés sur leur cible et chaque répertoire est synchronisé une
+    fois. Sans syncfs (Windows, macOS), ou si un syncfs échoue, chaque
+    fichier reçoit son propre fsync. Une copie n'apparaît qu'au vidage de son
+    lot, et jamais tronquée.
+    """
+
+    def __init__(self, copier, size=SMALL_FILE_BATCH):
+        self.copier = copier
+        self.size = size  # Fichiers par lot
+        self.items = []  # (ligne du plan, source, destination, fichier temporaire)
+        self.lock = threading.Lock()
+        try:
+            self.syncfs = ctypes.CDLL(None, use_errno=True).syncfs  # Symboles du processus, libc comprise
+        except (OSError, AttributeError, TypeError):  # Pas de syncfs (Windows, macOS) : un fsync par fichier
+            self.syncfs = None
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, row, src_path, dst_path, size):
+        """Écrit le contenu de src_path (size octets) ; la copie sera terminée par flush"""
+        tmp_path = self.copier.copy_small(src_path, dst_path, size)
+        with self.lock:
+            self.items.append((row, src_path, dst_path, tmp_path))
+
+    def flush(self):
+        """Termine les copies du lot.
+
+        Returns:
+            list: (ligne du plan, True si la copie est faite) pour chaque fichier du lot.
+        """
+        with self.lock:
+            items, self.items = self.items, []
+        results = []
+        ready = []
+        for item in items:
+            try:
+                if not self.syncfs:
+                    # Un fsync par fichier, avant les métadonnées qui peuvent retirer le droit d'écriture
+                    with open(item[3], 'r+b') as f:
+                        os.fsync(f.fileno())
+                copy_metadata(item[1], item[3])
+                ready.append(item)
+            except OSError as e:
+                results.append(self.fail(item, e))
+
+        # Contenu et métadonnées du lot sur disque : un syncfs par système de fichiers
+        directories = sorted({os.path.dirname(item[2]) for item in ready})
+        synced = self.sync_filesystems(directories)
+        for item in ready:
+            row, src_path, dst_path, tmp_path = item
+            try:
+                if self.syncfs and os.path.dirname(dst_path) not in synced:
+                    fsync_path(tmp_path)  # syncfs refusé pour ce système de fichiers
+                os.replace(tmp_path, dst_path)
+            except OSError as e:
+                results.append(self.fail(item, e))
+                continue
+            results.append((row, True))
+            if METRICS.enabled:
+                METRICS.add('files_copied')
+            log.debug("Copie (lot) de %s vers %s", src_path, dst_path)
+
+        # Renommages sur disque : un fsync par répertoire
+        for directory in directories:
+            fsync_dir(directory)
+        return results
+
+    def sync_filesystems(self, directories):
+        """Écrit sur disque les systèmes de fichiers des répertoires, un syncfs par système de fichiers.
+
+        Returns:
+            set: Répertoires dont le système de fichiers a été synchronisé.
+        """
+        synced = set()
+        if not self.syncfs:
+            return synced
+        devices = {}  # st_dev -> syncfs réussi
+        for directory in directories:
+            try:
+                fd = os.open(directory, os.O_RDONLY)
+            except OSError:
+                continue
+            try:
+                device = os.fstat(fd).st_dev
+                if device not in devices:
+                    devices[device] = self.syncfs(fd) == 0
+                if devices[device]:
+                    synced.add(directory)
+            finally:
+                os.close(fd)
+        return synced
+
+    def fail(self, item, error):
+        """Abandonne une copie du lot"""
+        row, src_path, dst_path, tmp_path = item
+        log.error("Erreur de copie de %s vers %s : %s", src_path, dst_path, error)
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        return row, False
+
+    def discard(self):
+        """Abandonne les copies en attente (exécution interrompue)"""
+        with self.lock:
+            items, self.items = self.items, []
+        for item in items:
+            with contextlib.suppress(OSError):
+                os.remove(item[3])
+
+
+DEFERRED = object()  # Résultat de run_row : copie terminée au prochain vidage de SmallFileBatch
+
+
+def block_digest(block):
+    """Empreinte forte d'un bloc pour la copie différentielle"""
+    return hashlib.blake2b(block, digest_size=16).digest()
+
+
+class DeltaTransfer:
+    """Copie différentielle des gros fichiers, à la manière de rsync.
+
+    La signature de l'ancienne version du fichier cible (somme faible Adler-32
+    et empreinte forte par bloc) est comparée au fichier source lu bloc par
+    bloc ; quand un bloc aligné ne correspond pas, une somme glissante cherche
+    le même contenu décalé. Le nouveau fichier est construit dans un fichier
+    temporaire, synchronisé sur disque puis renommé sur la cible : une copie
+    interrompue laisse l'ancienne version intacte. Si tous les blocs retrouvés
+    sont à leur place, le fichier temporaire est un clone (reflink) de la
+    cible où seuls les blocs modifiés sont réécrits.
+
+    Avec in_place (option explicite, clé 'delta_in_place' de sync_config), les
+    blocs modifiés sont réécrits directement dans la cible, synchronisée avant
+    l'enregistrement de son état : moins d'écritures sans clonage, mais une
+    interruption laisse un fichier mi-ancien mi-nouveau jusqu'à la copie suivante.
+
+    La signature du fichier obtenu est gardée dans la table block_signature :
+    à la copie suivante, le fichier cible n'a pas à être relu.
+    """
+
+    def __init__(self, db_path, min_size=DELTA_MIN_SIZE, block_size=DELTA_BLOCK, in_place=False):
+        self.db_path = db_path
+        self.min_size = min_size
+        self.block_size = block_size
+        self.in_place = in_place  # Réécrire la cible sur place quand les blocs inchangés y sont à leur place
+        with open_db(db_path) as conn:
+            conn.execute('''CREATE TABLE IF NOT EXISTS block_signature (
+                            path TEXT PRIMARY KEY,
+                            size INTEGER,
+                            mtime_ns INTEGER,
+                            block_size INTEGER,
+                            signature BLOB)''')
+
+    def copy(self, src_path, dst_path):
+        """Met à jour dst_path à partir de src_path en ne réécrivant que les blocs modifiés.
+
+        Returns:
+            bool: False si la copie différentielle ne s'applique pas (fichier
+            trop petit ou cible absente) : il faut alors faire une copie complète.
+        """
+        try:
+            src_size = stat_path(src_path).st_size
+            dst_stat = stat_path(dst_path)
+        except OSError:
+            return False
+        if src_size < self.min_size or not stat.S_ISREG(dst_stat.st_mode):
+            return False
+
+        signature = self.load_signature(dst_path, dst_stat)
+        if signature is None:
+            signature = self.signature(dst_path)
+        ops, new_signature = self.delta(src_path, signature)
+
+        block_size = self.block_size
+        written = sum(op[2] for op in ops if op[0] == "data")
+        # Tous les blocs inchangés sont à leur place : seuls les blocs modifiés sont à écrire
+        aligned = all(op[0] == "data" or op[1] * block_size == op[2] for op in ops)
+        if aligned and self.in_place:
+            with open(src_path, 'rb') as src, open(dst_path, 'r+b') as dst:
+                for op in ops:
+                    if op[0] == "data":
+                        self.copy_range(src, dst, op[1], op[2])
+                dst.truncate(src_size)
+                dst.flush()
+                os.fsync(dst.fileno())
+            copy_metadata(src_path, dst_path)
+            mode = "sur place"
+        else:
+            tmp_path = os.path.join(os.path.dirname(dst_path), f".{os.path.basename(dst_path)}.syncer-delta")
+            try:
+                with open(src_path, 'rb') as src, open(dst_path, 'rb') as old, open(tmp_path, 'wb') as tmp:
+                    cloned = aligned and self.clone(old, tmp)
+                    for op in ops:
+                        if op[0] == "data":
+                            self.copy_range(src, tmp, op[1], op[2])
+                        elif not cloned:
+                            old.seek(op[1] * block_size)
+                            tmp.write(old.read(block_size))
+                    tmp.truncate(src_size)
+                    tmp.flush()
+                    os.fsync(tmp.fileno())
+                copy_metadata(src_path, tmp_path)
+                os.replace(tmp_path, dst_path)
+            except BaseException:
+                # La cible est intacte : ne pas laisser le fichier temporaire caché à côté
+                with contextlib.suppress(OSError):
+                    os.remove(tmp_path)
+                raise
+            fsync_dir(os.path.dirname(dst_path) or os.curdir)
+            mode = "clone" if cloned else "fichier temporaire"
+
+        self.save_signature(dst_path, stat_path(dst_path), new_signature)
+        if METRICS.enabled:
+            METRICS.add('bytes_read', src_size)
+            METRICS.add('bytes_written', written)
+        log.info("Copie différentielle (%s) de %s : %d octets réécrits sur %d", mode, src_path, written, src_size)
+        return True
+
+    @staticmethod
+    def clone(old, tmp):
+        """Clone (reflink) le fichier old dans tmp ; False si le système de fichiers ne le permet pas"""
+        if fcntl is None:
+            return False
+        try:
+            fcntl.ioctl(tmp.fileno(), FICLONE, old.fileno())
+            return True
+        except OSError:
+            return False
+
+    def copy_range(self, src, dst, offset, length):
+        """Copie length octets de src vers dst, à la même position"""
+        src.seek(offset)
+        dst.seek(offset)
+        while length > 0:
+            chunk = src.read(min(length, HASH_CHUNK))
+            if not chunk:
+                break
+            dst.write(chunk)
+            length -= len(chunk)
+
+    def signature(self, path):
+        """Calcule la signature d'un fichier : [(somme faible, empreinte forte)] par bloc"""
+        signature = []
+        with open(path, 'rb') as f:
+            while True:
+                block = f.read(self.block_size)
+                if not block:
+                    break
+                signature.append((zlib.adler32(block), block_digest(block)))
+        return signature
+
+    def load_signature(self, path, st):
+        """Signature en cache si le fichier n'a pas changé depuis, sinon None"""
+        with open_db(self.db_path) as conn:
+            row = conn.execute("SELECT signature FROM block_signature WHERE path = ? AND size = ? AND mtime_ns = ? AND block_size = ?",
+                               (path, st.st_size, st.st_mtime_ns, self.block_size)).fetchone()
+        if row is None:
+            return None
+        data = row[0]
+        return [(int.from_bytes(data[i:i + 4], 'big'), data[i + 4:i + 20]) for i in range(0, len(data), 20)]
+
+    def save_signature(self, path, st, signature):
+        data = b"".join(weak.to_bytes(4, 'big') + strong for weak, strong in signature)
+        with open_db(self.db_path) as conn:
+            conn.execute("REPLACE INTO block_signature (path, size, mtime_ns, block_size, signature) VALUES (?, ?, ?, ?, ?)",
+                         (path, st.st_size, st.st_mtime_ns, self.block_size, data))
+
+    def delta(self, src_path, signature):
+        """Compare le fichier source à la signature de la cible.
+
+        Returns:
+            tuple: (opérations, signature du fichier source). Une opération est
+            ("copy", numéro de bloc de la cible, position) ou ("data", position, longueur) ;
+            les positions sont celles du fichier source, donc du fichier obtenu.
+        """
+        block_size = self.block_size
+        index = {}
+        for number, (weak, strong) in enumerate(signature):
+            index.setdefault(weak, {}).setdefault(strong, number)
+
+        ops = []
+        new_signature = {}
+        rolled = 0
+        literal = None  # Début des données à copier depuis la source
+
+        def add_copy(number, position):
+            nonlocal literal
+            if literal is not None and position > literal:
+                ops.append(("data", literal, position - literal))
+            literal = None
+            ops.append(("copy", number, position))
+
+        with open(src_path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            pos = 0
+            while pos < size:
+                f.seek(pos)
+                block = f.read(block_size)
+                weak = zlib.adler32(block)
+                strong = block_digest(block)
+                if pos % block_size == 0:
+                    new_signature[pos // block_size] = (weak, strong)
+
+                number = index.get(weak, {}).get(strong)
+                if number is not None:
+                    add_copy(number, pos)
+                    pos += len(block)
+                    continue
+
+                # Pas de bloc identique à cette position : somme glissante sur le bloc suivant
+                found = None
+                if rolled < DELTA_ROLL_LIMIT and len(block) == block_size:
+                    window = block + f.read(block_size)
+                    a, b = weak & 0xffff, weak >> 16
+                    for k in range(1, len(window) - block_size + 1):
+                        out_byte, in_byte = window[k - 1], window[k + block_size - 1]
+                        a = (a - out_byte + in_byte) % 65521
+                        b = (b - block_size * out_byte + a - 1) % 65521
+                        candidates = index.get((b << 16) | a)
+                        if candidates:
+                            number = candidates.get(block_digest(window[k:k + block_size]))
+                            if number is not None:
+                                found = (k, number)
+                                break
+                    rolled += found[0] if found else block_size
+
+                if literal is None:
+                    literal = pos
+                if found:
+                    add_copy(found[1], pos + found[0])
+                    pos += found[0] + block_size
+                else:
+                    pos += len(block)
+
+            if literal is not None and size > literal:
+                ops.append(("data", literal, size - literal))
+
+            # Blocs alignés sautés par la recherche glissante
+            for number in range((size + block_size - 1) // block_size):
+                if number not in new_signature:
+                    f.seek(number * block_size)
+                    block = f.read(block_size)
+                    new_signature[number] = (zlib.adler32(block), block_digest(block))
+
+        return ops, [new_signature[number] for number in sorted(new_signature)]
+
+
+def is_network_mount(path):
+    """Vérifie si path est sur un système de fichiers réseau, d'après /proc/mounts"""
+    path = os.path.realpath(path)
+    best, fs_type = "", ""
+    try:
+        with open("/proc/mounts") as mounts:
+            for line in mounts:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                if (path == mount_point or is_under(path, mount_point)) and len(mount_point) > len(best):
+                    best, fs_type = mount_point, fields[2]
+    except OSError:
+        return False
+    return fs_type in NETWORK_FS
+
+
+class InotifyWatcher:
+    """Changements d'une arborescence signalés par inotify (Linux).
+
+    Un watch est posé sur chaque répertoire, et sur chaque répertoire créé
+    ou déplacé dans l'arborescence. Les événements sont lus sans bloquer.
+    """
+
+    # Masques de <sys/inotify.h>
+    IN_ATTRIB = 0x4
+    IN_CLOSE_WRITE = 0x8
+    IN_MOVED_FROM = 0x40
+    IN_MOVED_TO = 0x80
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    IN_DELETE_SELF = 0x400
+    IN_Q_OVERFLOW = 0x4000
+    IN_IGNORED = 0x8000
+    IN_ONLYDIR = 0x1000000
+    IN_DONT_FOLLOW = 0x2000000
+    IN_ISDIR = 0x40000000
+    MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+            | IN_ONLYDIR | IN_DONT_FOLLOW)
+    EVENT = struct.Struct("iIII")  # wd, mask, cookie, len
+
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1")
+        self.dirs = {}  # Watch -> répertoire relatif
+        try:
+            self.add_tree("")
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def add_tree(self, rel_dir):
+        """Pose un watch sur rel_dir et tous ses sous-répertoires"""
+        stack = [rel_dir]
+        while stack:
+            rel_dir = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(os.path.join(self.root, rel_dir)), self.MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:  # fs.inotify.max_user_watches atteint
+                    raise OSError(error, f"Trop de répertoires à surveiller dans {self.root}")
+                continue  # Répertoire disparu entre temps
+            self.dirs[wd] = rel_dir
+            stack.extend(os.path.join(rel_dir, name) for name, entry in list_directory(os.path.join(self.root, rel_dir)).items()
+                         if entry.is_dir and not entry.is_link)
+
+    def remove_tree(self, rel_dir):
+        """Retire les watchs de rel_dir et de ses sous-répertoires"""
+        prefix = rel_dir + os.sep
+        for wd, path in list(self.dirs.items()):
+            if path == rel_dir or path.startswith(prefix):
+                self.libc.inotify_rm_watch(self.fd, wd)
+                del self.dirs[wd]
+
+    def changes(self):
+        """Répertoires relatifs modifiés depuis l'appel précédent ; None dans l'ensemble si des événements sont perdus"""
+        changed = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+                name = os.fsdecode(data[offset + self.EVENT.size:offset + self.EVENT.size + length].rstrip(b"\0"))
+                offset += self.EVENT.size + length
+
+                if mask & self.IN_Q_OVERFLOW:
+                    changed.add(None)  # File d'événements pleine : tout relire
+                    continue
+                rel_dir = self.dirs.get(wd)
+                if rel_dir is None:
+                    continue
+                if mask & self.IN_IGNORED:
+                    del self.dirs[wd]
+                    continue
+                changed.add(rel_dir)
+                if mask & self.IN_ISDIR and name:
+                    rel_path = os.path.join(rel_dir, name)
+                    if mask & self.IN_MOVED_FROM:
+                        self.remove_tree(rel_path)
+                    if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                        try:
+                            self.add_tree(rel_path)
+                        except OSError as e:
+                            log.warning("Surveillance incomplète : %s", e)
+                        changed.add(rel_path)  # Contenu arrivé avant le watch
+        return changed
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollWatcher:
+    """Changements d'une arborescence détectés par relecture périodique.
+
+    Pour les montages réseau, dont les modifications faites par d'autres
+    machines ne produisent pas d'événement inotify. Chaque répertoire est
+    résumé par une empreinte des noms, tailles et dates de ses entrées.
+    """
+
+    def __init__(self, root, interval=WATCH_POLL):
+        self.root = os.path.normpath(root)
+        self.interval = interval
+        self.digests = self.read_tree()
+        self.last_poll = time.monotonic()
+
+    def read_tree(self):
+        """{répertoire relatif: empreinte de son contenu}"""
+        digests = {}
+        stack = [""]
+        while stack:
+            rel_dir = stack.pop()
+            entries = list_directory(os.path.join(self.root, rel_dir))
+            digest = hashlib.blake2b(digest_size=16)
+            for name in sorted(entries):
+                entry = entries[name]
+                digest.update(f"{name}\0{entry.stat.st_size}\0{entry.stat.st_mtime_ns}\0".encode(errors="surrogateescape"))
+                if entry.is_dir and not entry.is_link:
+                    stack.append(os.path.join(rel_dir, name))
+            digests[rel_dir] = digest.digest()
+        return digests
+
+    def changes(self):
+        """Répertoires relatifs modifiés depuis la relecture précédente, vide si l'intervalle n'est pas écoulé"""
+        if time.monotonic() - self.last_poll < self.interval:
+            return set()
+        digests = self.read_tree()
+        self.last_poll = time.monotonic()
+        changed = {rel_dir for rel_dir in digests.keys() | self.digests.keys()
+                   if digests.get(rel_dir) != self.digests.get(rel_dir)}
+        self.digests = digests
+        return changed
+
+    def close(self):
+        pass
+
+
+def open_watcher(root, poll_interval=WATCH_POLL):
+    """inotify si possible, relecture périodique pour les montages réseau ou sans inotify"""
+    if not is_network_mount(root):
+        try:
+            return InotifyWatcher(root)
+        except (OSError, AttributeError) as e:  # AttributeError : pas d'inotify dans la libc
+            log.warning("inotify indisponible pour %s (%s), relecture toutes les %s s", root, e, poll_interval)
+    else:
+        log.info("%s est un montage réseau, relecture toutes les %s s", root, poll_interval)
+    return PollWatcher(root, poll_interval)
+
+
+class SyncEngine:
+    """Moteur de synchronisation sans interface graphique.
+
+    Calcule le plan d'actions entre une source et une destination, puis
+    l'exécute. L'application Tkinter et la ligne de commande n'en sont que
+    des consommateurs.
+    """
+
+    def __init__(self, org_dir, dst_dir, filters=None, analyse_db=ANALYSE_DB, go=True, workers=1,
+                 config_db=None, hash_mode=False, delta_min_size=0, delta_in_place=False, detect_moves=True, incremental=False,
+                 copy_buffer=COPY_BUFFER, coalesce=True, io_slots=None, scan_workers=(None, None)):
+        self.org_dir = os.path.normpath(org_dir)
+        self.dst_dir = os.path.normpath(dst_dir)
+        self.filters = filters if filters is not None else {'extension': set(), 'filename': set()}
+        self.matcher = FilterMatcher(self.filters)
+        self.analyse_db = analyse_db
+        self.go = go  # False : simulation, aucune opération sur les fichiers
+        self.workers = workers  # Taille du pool d'exécution, 1 pour une exécution séquentielle
+        self.config_db = config_db  # Limites de débit relues pendant l'exécution, si défini
+        self.throttle = Throttle()
+        self.hash_mode = hash_mode  # Comparer le contenu quand seule la date diffère
+        self.hashes = None
+        self.detect_moves = detect_moves  # Remplacer les paires création / suppression par des déplacements
+        self.coalesce = coalesce  # Une seule ligne pour une arborescence entièrement à créer ou à supprimer
+        self.incremental = incremental  # Ne pas relire les fichiers des répertoires inchangés
+        # Copie différentielle des fichiers d'au moins delta_min_size octets (0 : désactivée)
+        self.delta = DeltaTransfer(analyse_db, delta_min_size, in_place=delta_in_place) if delta_min_size else None
+        self.copier = CopyBackend(analyse_db, copy_buffer)
+        self.small_files = None  # SmallFileBatch pendant une exécution
+        self.known_dirs = set()  # Répertoires créés ou vérifiés pendant l'exécution
+        self.dirs_lock = threading.Lock()  # known_dirs et les suppressions / déplacements qui l'invalident
+        self.tree_states = {}  # Ligne regroupée copiée (chemin source) -> états de son contenu, rendus par copy_tree
+        self.io_slots = io_slots  # Sémaphore partagé par les profils exécutés en parallèle, ou None
+        # Répertoires lus en parallèle par racine, None : SCAN_NETWORK_WORKERS sur un montage réseau, sinon 1
+        self.scan_workers = scan_workers
+        self.resolved_scan_workers = None
+        self.snapshot = None
+        self.progress = {'dirs': 0, 'entries': 0, 'skipped': 0}
+        self.cancelled = threading.Event()
+
+    def cancel(self):
+        """Demande l'arrêt de l'analyse en cours ; peut être appelé depuis un autre thread"""
+        self.cancelled.set()
+
+    def rate(self, started):
+        """Nombre d'entrées analysées par seconde depuis started (time.monotonic)"""
+        elapsed = time.monotonic() - started
+        return self.progress['entries'] / elapsed if elapsed > 0 else 0.0
+
+    def is_excluded(self, rel_path, is_dir=False):
+        """Vérifie si le chemin relatif, son nom ou son extension doit être exclu"""
+        return self.matcher.excluded(rel_path, is_dir)
+
+    def search_file_db(self, rel_path, side):
+        """
+        Vérifie si un fichier ou répertoire a déjà été synchronisé d'un côté,
+        c'est-à-dire s'il y a été supprimé depuis.
+
+        Args:
+            rel_path (str): Chemin relatif du fichier ou répertoire.
+            side (str): Côté où il est absent, 'org' ou 'dst'.
+
+        Returns:
+            bool: True si le chemin est enregistré de ce côté, False sinon.
+        """
+        # Recherche dans l'index chargé en début d'analyse
+        state = self.snapshot.get(rel_path)
+        found = state is not None and state[0 if side == "org" else 2] is not None
+        log.debug("Recherche %s (%s) : %d", rel_path, side, found)
+
+        # Retourne True si le fichier existait, sinon False
+        return found
+
+    def check_db_mtime(self, rel_path, side, st):
+        """Vérifie si la date de modification d'un fichier dans la base de données correspond à la date actuelle.
+
+        Args:
+            rel_path (str): Chemin relatif du fichier à vérifier.
+            side (str): 'org' ou 'dst'.
+            st (os.stat_result): État actuel du fichier.
+
+        Returns:
+            bool: True si la date (et la taille) correspondent, False sinon.
+        """
+        # Vérification de la date de modification dans l'index
+        state = self.snapshot.get(rel_path)
+        if state is None:
+            # Le fichier n'est pas trouvé dans la base de données
+            return False
+        mtime_ns, size = state[0:2] if side == "org" else state[2:4]
+        if mtime_ns is None:
+            return False
+
+        # Comparaison des dates : à la seconde pour un état converti depuis sync_analysis, sans taille
+        if size is None:
+            return mtime_ns // 1000000000 == st.st_mtime_ns // 1000000000
+        return mtime_ns == st.st_mtime_ns and size == st.st_size
+
+    def plan(self, save=False, dirs=None):
+        """Analyse et compare les répertoires source et destination.
+
+        Les lignes à un seul côté sont gardées jusqu'à la fin du parcours pour
+        la détection des déplacements et le regroupement des arborescences,
+        les autres sont rendues au fur et à mesure.
+
+        Args:
+            save (bool): Enregistrer le plan dans sync_plan (remplace le précédent).
+            dirs (iterable): Répertoires relatifs à comparer (voir scan_trees), None pour tout comparer.
+
+        Yields:
+            PlanRow: une ligne par chemin relatif (un déplacement remplace deux lignes,
+            une arborescence regroupée toutes les lignes de son contenu).
+        """
+        # Charger l'état de la dernière synchronisation une seule fois pour toute l'analyse
+        self.snapshot = SnapshotIndex(self.analyse_db, self.org_dir, self.dst_dir)
+        self.hashes = HashIndex(self.analyse_db) if self.hash_mode else None
+        self.dirs = DirSnapshots(self.analyse_db, self.org_dir, self.dst_dir, self.incremental)
+        writer = PlanWriter(self.analyse_db, self.org_dir, self.dst_dir) if save else None
+        complete = False
+        try:
+            # Les lignes en attente d'empreinte sont rendues dans l'ordre du parcours
+            pending = deque()
+            candidates = []  # Lignes à un seul côté, pour la détection des déplacements et le regroupement
+            blocked = set()  # Répertoires contenant une entrée exclue, à ne pas regrouper
+            for row, hashes, entry, rel_path in self._plan_trees(dirs):
+                if row.action != "===":
+                    self.dirs.mark_dirty(os.path.dirname(rel_path))
+                if row.action == "-!-":
+                    parent = os.path.dirname(rel_path)
+                    while parent and parent not in blocked:
+                        blocked.add(parent)
+                        parent = os.path.dirname(parent)
+                if (self.detect_moves or self.coalesce) and row.action in SUBTREE_ACTIONS:
+                    candidates.append((row, entry, rel_path))
+                    continue
+                pending.append((row, hashes))
+                while pending and (len(pending) > HASH_WINDOW or pending[0][1] is None
+                                   or all(future.done() for future in pending[0][1])):
+                    row = self._resolve_hashes(*pending.popleft())
+                    yield writer.add(row) if writer else row
+            while pending:
+                row = self._resolve_hashes(*pending.popleft())
+                yield writer.add(row) if writer else row
+
+            # Les lignes d'un répertoire à un seul côté ne dépendent que de lignes à un seul côté :
+            # elles peuvent être exécutées après les autres, dans l'ordre du parcours
+            if candidates and not self.cancelled.is_set():
+                if self.detect_moves:
+                    candidates = list(self._match_moves(candidates))
+                if self.coalesce:
+                    candidates = self._coalesce(candidates, blocked)
+                for row, entry, rel_path in candidates:
+                    yield writer.add(row) if writer else row
+
+            # États des répertoires seulement après un parcours complet, enregistrés à l'exécution du plan
+            if not self.cancelled.is_set():
+                if writer:
+                    self.dirs.save(replace=dirs is None)
+                complete = True
+        finally:
+            self.snapshot.close()
+            if self.hashes:
+                self.hashes.close()
+            if writer:
+                writer.close(complete)
+
+    def _resolve_hashes(self, row, hashes):
+        """Remplace l'action par "===" si les deux fichiers ont le même contenu"""
+        if hashes is None:
+            return row
+        try:
+            if hashes[0].result() == hashes[1].result():
+                return row._replace(action="===")
+        except OSError as e:
+            log.warning("Erreur de lecture pour l'empreinte de %s : %s", row.org_path, e)
+        return row
+
+    def _plan_trees(self, dirs=None):
+        """Compare les deux arborescences, une ligne de plan par chemin.
+
+        Yields:
+            tuple: (PlanRow, None ou Futures des empreintes source et destination à comparer,
+            ScanEntry source ou à défaut destination, chemin relatif)
+        """
+        org_dir = self.org_dir
+        dst_dir = self.dst_dir
+
+        # Parcours simultané des deux arborescences : chaque chemin relatif n'est vu qu'une fois
+        # On compare les dates de fichiers entre org et dst
+        # On va aussi comparer par rapport à la base de donnée pour voir si confit
+        # Ne s'applique uniquement que sur les fichiers !!!
+        # Si la date du fichier plus à jour ne coincide pas avec la base de donnée, c'est normal
+        # Si la destination à été modifiée entre temps (il y a conflit)
+        # Permet aussi de détecter les suppression de répertoires
+        # Si un répertoire ou un fichier existait en base de donnée, mais plus maintenant, c'est qu'il doit être effacé !
+        for rel_path, org_entry, dst_entry in scan_trees(org_dir, dst_dir, self.progress, self.dirs, dirs,
+                                                         prune=self.is_excluded, workers=self.scan_concurrency()):
+            if self.cancelled.is_set():
+                log.info("Analyse annulée")
+                return
+
+            org_path = os.path.join(org_dir, rel_path)
+            dst_path = os.path.join(dst_dir, rel_path)
+            org_name = org_entry.name if org_entry else ""
+            dst_name = dst_entry.name if dst_entry else ""
+            org_mtime = org_entry.stat.st_mtime_ns if org_entry else None
+            dst_mtime = dst_entry.stat.st_mtime_ns if dst_entry else None
+
+            hashes = None
+            if org_entry and dst_entry:
+                delta_seconds = abs(org_mtime - dst_mtime) / 1e9
+                same_size = org_entry.stat.st_size == dst_entry.stat.st_size
+                # Controle date en base
+                org_ctrl_mtime = self.check_db_mtime(rel_path, "org", org_entry.stat)
+                dst_ctrl_mtime = self.check_db_mtime(rel_path, "dst", dst_entry.stat)
+
+                # Vérifier si le fichier ou l'extension doit être exclu
+                if self.is_excluded(rel_path, org_entry.is_dir or dst_entry.is_dir):
+                    action = "-!-"  # Pas de modification nécessaire
+                elif dst_entry.is_dir:
+                    action = "==="  # Pas de modification nécessaire
+                elif self.hashes and same_size and org_mtime == dst_mtime:
+                    action = "==="  # Pas de modification nécessaire
+                elif not self.hashes and delta_seconds <= DELTA:
+                    action = "==="  # Pas de modification nécessaire
+                elif org_mtime > dst_mtime and dst_ctrl_mtime == True:
+                    action = "==>"  # Copier de la source vers la destination
+                elif org_mtime < dst_mtime and org_ctrl_mtime == True:
+                    action = "<=="  # Copier de la destination vers la source
+                else:
+                    action = "/!\\"  # erreur de coincidence
+                    log.info("Conflit %s : org_mtime = %s dst_mtime = %s", rel_path, format_mtime(org_mtime), format_mtime(dst_mtime))
+
+                # En mode empreinte, une date différente avec la même taille ne suffit pas
+                if self.hashes and same_size and action != "===" and action != "-!-" and not org_entry.is_dir:
+                    hashes = (self.hashes.submit(org_path, org_entry.stat), self.hashes.submit(dst_path, dst_entry.stat))
+
+            elif org_entry:
+                if self.is_excluded(rel_path, org_entry.is_dir):
+                    action = "-!-"  # Pas de modification nécessaire
+                elif self.search_file_db(rel_path, "dst"):
+                    action = "X--"  # Supprime le fichier original
+                else:
+                    action = ">>>"  # Fichier à créer dans la destination
+
+            else:
+                if self.is_excluded(rel_path, dst_entry.is_dir):
+                    action = "-!-"  # Pas de modification nécessaire
+                elif self.search_file_db(rel_path, "org"):
+                    action = "--X"  # Supprime le fichier destination
+                else:
+                    action = "<<<"  # Fichier à créer dans la source
+
+            yield (PlanRow(org_path, org_name, org_mtime, action, dst_path, dst_name, dst_mtime), hashes,
+                   org_entry or dst_entry, rel_path)
+
+    def _match_moves(self, candidates):
+        """Remplace les paires création / suppression d'un même fichier par un déplacement.
+
+        Un fichier à créer d'un côté (">>>" ou "<<<") et un fichier à supprimer
+        du même côté ("--X" ou "X--") sont appariés par taille et date (à la
+        nanoseconde), puis seulement si leur contenu est identique : deux
+        fichiers différents de même taille modifiés en même temps ne sont
+        jamais pris l'un pour l'autre. Quand tout le contenu
+        d'un répertoire à supprimer se retrouve sous un répertoire à créer, les
+        deux sont remplacés par un seul renommage du répertoire.
+
+        Args:
+            candidates (list): (PlanRow, ScanEntry du côté existant, chemin relatif)
+                des lignes à un seul côté, dans l'ordre du parcours.
+
+        Yields:
+            tuple: les mêmes (PlanRow, ScanEntry, chemin relatif), avec les déplacements "~~>" et "<~~".
+        """
+        # Fichiers à supprimer, par (action, taille, date)
+        deleted = {}
+        for index, (row, entry, rel_path) in enumerate(candidates):
+            if row.action in ("--X", "X--") and not entry.is_dir and entry.stat.st_size:
+                key = (row.action, entry.stat.st_size, entry.stat.st_mtime_ns)
+                deleted.setdefault(key, []).append(index)
+
+        pairs = {}  # Indice de la création -> indice de la suppression
+        for index, (row, entry, rel_path) in enumerate(candidates):
+            if row.action not in MOVE_ACTIONS or entry.is_dir:
+                continue
+            matches = deleted.get((MOVE_ACTIONS[row.action][0], entry.stat.st_size, entry.stat.st_mtime_ns))
+            if not matches:
+                continue
+            # Préférer un fichier du même nom
+            name = os.path.basename(rel_path)
+            matches.sort(key=lambda other: os.path.basename(candidates[other][2]) != name)
+            for other in matches:
+                if self._same_content(entry, candidates[other][1]):
+                    pairs[index] = other
+                    matches.remove(other)
+                    break
+
+        replaced, consumed = self._match_directories(candidates, pairs)
+        for index, other in pairs.items():
+            if index not in consumed and other not in consumed:
+                replaced[index] = self._move_row(candidates[index][0], candidates[other][0])
+                consumed.add(other)
+
+        for index, (row, entry, rel_path) in enumerate(candidates):
+            if index in replaced:
+                yield replaced[index], entry, rel_path
+            elif index not in consumed:
+                yield row, entry, rel_path
+
+    def _coalesce(self, candidates, blocked):
+        """Remplace les lignes d'une arborescence entièrement à créer ou à supprimer par celle du répertoire.
+
+        Un répertoire dont tout le contenu a la même action que lui, sans
+        entrée exclue, devient une seule ligne (champ subtree) : copie de
+        l'arborescence ou un seul shutil.rmtree à l'exécution.
+
+        Args:
+            candidates (list): (PlanRow, ScanEntry, chemin relatif) des lignes à un seul côté.
+            blocked (set): Répertoires relatifs contenant une entrée exclue.
+
+        Returns:
+            list: les mêmes tuples, sans les lignes regroupées.
+        """
+        ordered = sorted((rel_path, index) for index, (row, entry, rel_path) in enumerate(candidates))
+        replaced = {}
+        consumed = set()
+        # Dans l'ordre des chemins, un répertoire est vu avant son contenu : le plus haut regroupe
+        for rel_path, index in ordered:
+            row, entry, _ = candidates[index]
+            if (index in consumed or row.action not in SUBTREE_ACTIONS or not entry.is_dir or entry.is_link
+                    or rel_path in blocked):
+                continue
+            content = self._subtree(ordered, rel_path)
+            if content and all(candidates[other][0].action == row.action for other in content.values()):
+                replaced[index] = row._replace(subtree=len(content))
+                consumed.update(content.values())
+
+        return [(replaced.get(index, row), entry, rel_path) for index, (row, entry, rel_path) in enumerate(candidates)
+                if index not in consumed]
+
+    def _match_directories(self, candidates, pairs):
+        """Cherche les répertoires renommés à partir des fichiers appariés.
+
+        Returns:
+            tuple: ({indice: ligne de renommage}, indices des lignes remplacées)
+        """
+        by_path = {(row.action, rel_path): index for index, (row, entry, rel_path) in enumerate(candidates)}
+        # Le contenu d'un répertoire n'est pas contigu dans le parcours, il l'est dans l'ordre des chemins
+        ordered = sorted((rel_path, index) for index, (row, entry, rel_path) in enumerate(candidates))
+
+        # Couples (répertoire créé, répertoire supprimé) ayant un fichier en commun au même sous-chemin
+        suggested = set()
+        for index, other in pairs.items():
+            new_parts = candidates[index][2].split(os.sep)
+            old_parts = candidates[other][2].split(os.sep)
+            level = 1
+            while level < min(len(new_parts), len(old_parts)) and new_parts[-level] == old_parts[-level]:
+                new_dir = os.sep.join(new_parts[:-level])
+                suggested.add((len(new_parts) - level, new_dir, os.sep.join(old_parts[:-level]),
+                               candidates[index][0].action))
+                level += 1
+
+        replaced = {}
+        consumed = set()
+        # Les répertoires les plus hauts d'abord : leur renommage emporte les sous-répertoires
+        for _, new_dir, old_dir, action in sorted(suggested):
+            deleted_action = MOVE_ACTIONS[action][0]
+            new_index = by_path.get((action, new_dir))
+            old_index = by_path.get((deleted_action, old_dir))
+            if new_index is None or old_index is None or new_index in consumed or old_index in consumed:
+                continue
+            if not (candidates[new_index][1].is_dir and candidates[old_index][1].is_dir):
+                continue
+
+            new_content = self._subtree(ordered, new_dir)
+            old_content = self._subtree(ordered, old_dir)
+            if new_content.keys() != old_content.keys():
+                continue
+            if not all(self._same_entry(candidates[new_content[sub]], action, candidates[old_content[sub]], deleted_action)
+                       for sub in new_content):
+                continue
+
+            replaced[new_index] = self._move_row(candidates[new_index][0], candidates[old_index][0])
+            consumed.add(old_index)
+            consumed.update(new_content.values())
+            consumed.update(old_content.values())
+        return replaced, consumed
+
+    def _subtree(self, ordered, rel_dir):
+        """{sous-chemin: indice} des lignes situées sous rel_dir, ordered étant trié par chemin"""
+        prefix = rel_dir + os.sep
+        content = {}
+        for rel_path, index in ordered[bisect_left(ordered, (prefix,)):]:
+            if not rel_path.startswith(prefix):
+                break
+            content[rel_path[len(prefix):]] = index
+        return content
+
+    def _same_entry(self, created, action, deleted, deleted_action):
+        """Vérifie qu'une entrée à créer et une entrée à supprimer sont le même fichier ou répertoire"""
+        if created[0].action != action or deleted[0].action != deleted_action:
+            return False
+        if created[1].is_dir or deleted[1].is_dir:
+            return created[1].is_dir and deleted[1].is_dir
+        return (created[1].stat.st_size == deleted[1].stat.st_size
+                and created[1].stat.st_mtime_ns == deleted[1].stat.st_mtime_ns
+                and self._same_content(created[1], deleted[1]))
+
+    def _same_content(self, entry, other):
+        """Vérifie que les deux fichiers ont le même contenu : empreintes en mode empreinte, sinon lecture des deux"""
+        try:
+            if self.hashes:
+                return (self.hashes.submit(entry.path, entry.stat).result()
+                        == self.hashes.submit(other.path, other.stat).result())
+            return same_file_content(entry.path, other.path)
+        except OSError:
+            return False
+
+    def _move_row(self, created, deleted):
+        """Ligne de déplacement : la création, avec le chemin et la date de l'entrée à déplacer"""
+        if created.action == ">>>":
+            return created._replace(action="~~>", dst_name=deleted.dst_name, dst_mtime=deleted.dst_mtime,
+                                    move_from=deleted.dst_path)
+        return created._replace(action="<~~", org_name=deleted.org_name, org_mtime=deleted.org_mtime,
+                                move_from=deleted.org_path)
+
+    def sync_dirs(self, dirs=None, on_row=None):
+        """Analyse puis exécute le plan, pour toute l'arborescence ou seulement les répertoires dirs.
+
+        Returns:
+            int: Nombre de lignes traitées.
+        """
+        for row in self.plan(save=True, dirs=dirs):
+            if on_row:
+                on_row(row)
+        if self.cancelled.is_set():
+            return 0
+        return self.execute(iter_plan(self.analyse_db))
+
+    def watch(self, poll_interval=WATCH_POLL, debounce=WATCH_DEBOUNCE, on_row=None):
+        """Synchronise en continu jusqu'à cancel().
+
+        Après une première synchronisation complète, les changements signalés
+        des deux côtés (inotify, ou relecture périodique des montages réseau)
+        sont regroupés : les répertoires modifiés sont synchronisés quand
+        aucun événement n'est arrivé depuis debounce secondes, ou au plus tard
+        WATCH_MAX_DELAY secondes après le premier. Les écritures de la
+        synchronisation produisent elles-mêmes des événements, qui donnent un
+        cycle suivant sans action.
+
+        Args:
+            on_row (callable): Appelé avec chaque ligne des plans calculés.
+        """
+        watchers = [open_watcher(self.org_dir, poll_interval), open_watcher(self.dst_dir, poll_interval)]
+        try:
+            dirty = {None}  # None : toute l'arborescence
+            first = last = time.monotonic() - debounce
+            while not self.cancelled.is_set():
+                now = time.monotonic()
+                if dirty and (now - last >= debounce or now - first >= WATCH_MAX_DELAY):
+                    count = self.sync_dirs(None if None in dirty else sorted(dirty), on_row)
+                    log.info("%d actions exécutées pour %s", count,
+                             "tous les répertoires" if None in dirty else f"{len(dirty)} répertoires")
+                    dirty = set()
+
+                self.cancelled.wait(WATCH_TICK)
+                for watcher in watchers:
+                    changed = watcher.changes()
+                    if changed:
+                        if not dirty:
+                            first = time.monotonic()
+                        dirty |= changed
+                        last = time.monotonic()
+        finally:
+            for watcher in watchers:
+                watcher.close()
+
+    def execute(self, rows, on_done=None):
+        """Exécute les actions d'un plan.
+
+        Avec plus d'un worker, les actions indépendantes sont envoyées à un pool
+        de threads ; sync_state et on_done sont mis à jour par le thread
+        appelant, au fur et à mesure que les actions se terminent.
+
+        Args:
+            rows (iterable): Lignes PlanRow à exécuter, dans l'ordre du plan (par exemple iter_plan()).
+            on_done (callable): Appelé avec chaque ligne une fois traitée.
+
+        Returns:
+            int: Nombre de lignes traitées.
+        """
+        count = 0
+        reloaded = started = time.monotonic()
+        copied = sum(self.copier.counts.values())
+        if self.config_db:
+            self.throttle.load(self.config_db)
+        self.known_dirs = set()
+        self.small_files = SmallFileBatch(self.copier) if self.go else None
+
+        store = StateStore(self.analyse_db, self.org_dir, self.dst_dir)
+        try:
+            def finish(row, done):
+                nonlocal count, reloaded
+                if done is DEFERRED:  # Enregistrée au vidage du lot de petits fichiers
+                    if len(self.small_files) >= self.small_files.size:
+                        self.flush_small_files(finish)
+                    return
+                if not self.go:
+                    pass  # Simulation : ni état ni statut enregistrés
+                elif done:
+                    self.record_row(store, row)
+                else:
+                    store.record(row.id, {}, "skipped")
+                count += 1
+                if on_done:
+                    on_done(row)
+
+                # Les limites de débit peuvent être modifiées pendant l'exécution
+                if self.config_db and time.monotonic() - reloaded >= THROTTLE_RELOAD:
+                    self.throttle.load(self.config_db)
+                    reloaded = time.monotonic()
+
+            if self.workers <= 1:
+                # Comme en parallèle, les répertoires sont supprimés en dernier :
+                # leur contenu peut avoir été déplacé ailleurs entre-temps
+                removals = []
+                for row in rows:
+                    is_dir = self.row_is_dir(row)
+                    if is_dir and row.action in ("--X", "X--"):
+                        removals.append(row)
+                    else:
+                        finish(row, self.run_row(row, is_dir))
+                self.flush_small_files(finish)
+                removals.sort(key=lambda row: os.path.normpath(row.org_path).count(os.sep), reverse=True)
+                for row in removals:
+                    finish(row, self.run_row(row, True))
+            else:
+                self.execute_parallel(rows, finish)
+        finally:
+            if self.small_files:
+                self.small_files.discard()
+            self.small_files = None
+            store.close()
+        if self.go:
+            # Répertoires dont toutes les lignes sont enregistrées dans sync_state : à jour pour l'analyse incrémentale
+            DirSnapshots.promote(self.analyse_db, self.org_dir, self.dst_dir)
+        files = sum(self.copier.counts.values()) - copied
+        if files:
+            elapsed = time.monotonic() - started
+            log.info("Copies : %s - %d fichiers en %.1f s (%.0f fichiers/s)", self.copier.summary(), files, elapsed,
+                     files / elapsed if elapsed > 0 else 0.0)
+        return count
+
+    def flush_small_files(self, finish):
+        """Termine les copies de petits fichiers en attente, puis appelle finish pour chacune"""
+        if not self.small_files:
+            return
+        with self.io_slots if self.io_slots is not None else NULL_CONTEXT:
+            results = self.small_files.flush()
+        for row, done in results:
+            finish(row, done)
+
+    def execute_parallel(self, rows, finish):
+        """Exécute le plan avec un pool de threads en respectant les dépendances.
+
+        Un répertoire est créé avant son contenu : chaque action attend la
+        création de son répertoire parent si elle est en cours. Les suppressions
+        de répertoires sont faites en dernier, les plus profondes d'abord.
+        """
+        creating = {}  # Répertoire en cours de création (chemin source) -> future
+        removals = []  # Suppressions de répertoires, après tout le reste
+        pending = {}  # Future -> ligne du plan
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for row in rows:
+                is_dir = self.row_is_dir(row)
+                if is_dir and row.action in ("--X", "X--"):
+                    removals.append(row)
+                    continue
+
+                parent = creating.get(os.path.dirname(os.path.normpath(row.org_path)))
+                future = pool.submit(self.run_row, row, is_dir, parent)
+                pending[future] = row
+                if is_dir and row.action in (">>>", "<<<"):
+                    creating[os.path.normpath(row.org_path)] = future
+
+                # Limiter le nombre d'actions en attente dans le pool
+                while len(pending) >= self.workers * 4:
+                    self.collect(pending, finish, FIRST_COMPLETED)
+            self.collect(pending, finish, ALL_COMPLETED)
+            self.flush_small_files(finish)
+
+            # Suppressions de répertoires par niveau, du plus profond au moins profond
+            removals.sort(key=lambda row: os.path.normpath(row.org_path).count(os.sep), reverse=True)
+            for _, level in groupby(removals, key=lambda row: os.path.normpath(row.org_path).count(os.sep)):
+                for row in level:
+                    pending[pool.submit(self.run_row, row, True)] = row
+                self.collect(pending, finish, ALL_COMPLETED)
+
+    def collect(self, pending, finish, return_when):
+        """Attend des actions du pool et enregistre celles qui sont terminées"""
+        done, _ = wait(pending, return_when=return_when)
+        for future in done:
+            finish(pending.pop(future), future.result())
+
+    def row_is_dir(self, row):
+        """Vérifie si la ligne concerne un répertoire, du côté qui existe"""
+        if row.action in (">>>", "X--"):
+            return is_dir_path(row.org_path)
+        if row.action in ("<<<", "--X"):
+            return is_dir_path(row.dst_path)
+        return False
+
+    def run_row(self, row, is_dir, parent=None):
+        """Exécute l'opération sur les fichiers d'une ligne du plan.
+
+        Peut être appelée depuis un thread du pool : n'accède pas à la base.
+
+        Args:
+            row (PlanRow): Ligne à exécuter.
+            is_dir (bool): True si la ligne concerne un répertoire.
+            parent (Future): Création du répertoire parent à attendre, ou None.
+
+        Returns:
+            bool: True si l'action est faite et sync_state doit être mis à jour, ou DEFERRED
+            pour un petit fichier dont la copie sera terminée au vidage de self.small_files.
+        """
+        if parent is not None:
+            parent.result()
+
+        action = row.action
+        # Normaliser les chemins pour éviter les problèmes de slash
+        org_path = os.path.normpath(row.org_path)
+        dst_path = os.path.normpath(row.dst_path)
+
+        # Afficher l'action dans la console
+        log.debug("Origine: %s, Action: %s, Chemin destination: %s", org_path, action, dst_path)
+
+        if action == "-!-":
+            log.debug("Exclusion de %s ou %s", org_path, dst_path)
+            return False
+        if action == "/!\\":
+            return False  # Conflit : à résoudre manuellement
+
+        # Vérifier les dates de fichiers, si les deux existent : un stat par côté, réutilisé pour la taille à copier
+        org_st = dst_st = None
+        with contextlib.suppress(OSError):
+            org_st = stat_path(org_path)
+        with contextlib.suppress(OSError):
+            dst_st = stat_path(dst_path)
+        if org_st and dst_st and (org_st.st_mtime_ns != row.org_mtime or dst_st.st_mtime_ns != row.dst_mtime):
+            log.warning("Changement détecté dans les dates des fichiers: %s ou %s", org_path, dst_path)
+            return False
+
+        # Un déplacement suppose l'entrée toujours à son ancien emplacement, inchangée, et le nouveau libre
+        if action in ("~~>", "<~~"):
+            if not row.move_from:
+                log.error("Déplacement %s sans emplacement d'origine, ignoré", org_path if action == "<~~" else dst_path)
+                return False
+            move_from = os.path.normpath(row.move_from)
+            target = dst_path if action == "~~>" else org_path
+            expected = row.dst_mtime if action == "~~>" else row.org_mtime
+            try:
+                moved = stat_path(move_from).st_mtime_ns == expected
+            except OSError:
+                moved = False
+            if not moved or path_exists(target):
+                log.warning("Déplacement impossible de %s vers %s", move_from, target)
+                return False
+
+        # Exécuter l'action selon le type d'action
+        small = False
+        if self.go and action != "===":
+            # Attendre que le débit autorisé permette l'opération
+            copy_from, copy_to = {"==>": (org_path, dst_path), "<==": (dst_path, org_path),
+                                  ">>>": (org_path, dst_path), "<<<": (dst_path, org_path)}.get(action, (None, None))
+            copy_st = None
+            if copy_from and not is_dir:
+                copy_st = org_st if copy_from == org_path else dst_st
+                if copy_st is None:
+                    log.error("Erreur %s %s / %s : %s introuvable", action, org_path, dst_path, copy_from)
+                    return False
+            nbytes = copy_st.st_size if copy_st else 0
+            self.throttle.acquire(nbytes)
+            # Petit fichier : copié par lot, sans fsync individuel
+            small = (copy_st is not None and self.small_files is not None and nbytes <= SMALL_FILE_MAX
+                     and stat.S_ISREG(copy_st.st_mode) and not (self.delta and nbytes >= self.delta.min_size))
+
+            # Puis une place de la limite globale des profils ; une copie d'arborescence en prend une par fichier
+            with self.io_slots if self.io_slots is not None and not row.subtree else NULL_CONTEXT:
+                try:
+                    started = time.monotonic()
+
+                    if small:
+                        self.small_files.add(row, copy_from, copy_to, nbytes)
+                    elif action == "==>":
+                        if not (self.delta and self.delta.copy(org_path, dst_path)):
+                            self.copier.copy(org_path, dst_path)
+                    elif action == "<==":
+                        if not (self.delta and self.delta.copy(dst_path, org_path)):
+                            self.copier.copy(dst_path, org_path)
+                    elif action == ">>>":
+                        if is_dir and row.subtree:  # copie de l'arborescence entière
+                            self.tree_states[row.org_path] = self.copy_tree(org_path, dst_path,
+                                                                            os.path.relpath(org_path, self.org_dir))
+                        elif is_dir:  # copie de répertoire
+                            self.make_dirs(dst_path)
+                        else:  # copie de fichier
+                            self.copier.copy(org_path, dst_path)
+                    elif action == "<<<":
+                        if is_dir and row.subtree:  # copie de l'arborescence entière
+                            states = self.copy_tree(dst_path, org_path, os.path.relpath(org_path, self.org_dir))
+                            self.tree_states[row.org_path] = {path: state[2:] + state[:2]
+                                                              for path, state in states.items()}
+                        elif is_dir:  # copie de répertoire
+                            self.make_dirs(org_path)
+                        else:  # copie de fichier
+                            self.copier.copy(dst_path, org_path)
+                    elif action == "--X":
+                        if is_dir:  # supression de répertoire
+                            with self.dirs_lock:
+                                self.known_dirs.clear()
+                                shutil.rmtree(dst_path)
+                        else:  # supression de fichier
+                            os.remove(dst_path)
+                    elif action == "X--":
+                        if is_dir:  # supression de répertoire
+                            with self.dirs_lock:
+                                self.known_dirs.clear()
+                                shutil.rmtree(org_path)
+                        else:  # supression de fichier
+                            os.remove(org_path)
+                    elif action == "~~>":  # déplacement dans la destination
+                        self.make_dirs(os.path.dirname(dst_path))
+                        with self.dirs_lock:
+                            os.rename(move_from, dst_path)
+                            self.known_dirs.clear()  # move_from peut être un répertoire connu
+                    elif action == "<~~":  # déplacement dans la source
+                        self.make_dirs(os.path.dirname(org_path))
+                        with self.dirs_lock:
+                            os.rename(move_from, org_path)
+                            self.known_dirs.clear()
+                except OSError as e:
+                    log.error("Erreur %s %s / %s : %s", action, org_path, dst_path, e)
+                    return False
+                duration = time.monotonic() - started
+                if METRICS.enabled:
+                    METRICS.add_time('copy', duration)
+                self.throttle.observe(duration, nbytes)
+        return DEFERRED if small else True
+
+    def make_dirs(self, path):
+        """os.makedirs, sans appel système pour un répertoire déjà créé ou vérifié pendant l'exécution.
+
+        Appelé par les threads du pool : sous dirs_lock, une suppression ne
+        peut pas se glisser entre la création et l'ajout à known_dirs.
+        """
+        with self.dirs_lock:
+            if path in self.known_dirs:
+                return
+            os.makedirs(path, exist_ok=True)
+            while path not in self.known_dirs and os.path.dirname(path) != path:
+                self.known_dirs.add(path)
+                path = os.path.dirname(path)
+
+    def copy_tree(self, src_dir, dst_dir, rel_dir):
+        """Copie une arborescence entière (ligne regroupée), les fichiers par un pool de self.workers threads.
+
+        Les entrées exclues par les filtres ne sont pas copiées. Les petits
+        fichiers sont copiés par lots (SmallFileBatch).
+
+        Returns:
+            dict: {chemin relatif: (date, taille de la source, date, taille de la copie)} du contenu,
+            pour sync_state sans relire l'arborescence.
+        """
+        files = []
+        dirs = []
+        stack = [""]
+        while stack:
+            sub_dir = stack.pop()
+            self.make_dirs(os.path.join(dst_dir, sub_dir))
+            for name, entry in list_directory(os.path.join(src_dir, sub_dir)).items():
+                sub_path = os.path.join(sub_dir, name)
+                if self.is_excluded(os.path.join(rel_dir, sub_path), entry.is_dir):
+                    continue
+                if entry.is_dir:
+                    dirs.append((sub_path, entry.stat))
+                if entry.is_dir and not entry.is_link:
+                    stack.append(sub_path)
+                elif entry.is_dir:
+                    self.make_dirs(os.path.join(dst_dir, sub_path))
+                else:
+                    files.append((os.path.join(src_dir, sub_path), os.path.join(dst_dir, sub_path), entry.stat))
+
+        batch = SmallFileBatch(self.copier)
+        failed = []
+
+        def copy_file(src_path, dst_path, st):
+            self.throttle.acquire(st.st_size)
+            with self.io_slots if self.io_slots is not None else NULL_CONTEXT:
+                started = time.monotonic()
+                if st.st_size <= SMALL_FILE_MAX and stat.S_ISREG(st.st_mode):
+                    batch.add(None, src_path, dst_path, st.st_size)
+                    if len(batch) >= batch.size:
+                        failed.extend(done for _, done in batch.flush() if not done)
+                else:
+                    self.copier.copy(src_path, dst_path)
+                self.throttle.observe(time.monotonic() - started, st.st_size)
+
+        try:
+            with ThreadPoolExecutor(max_workers=max(1, self.workers)) as pool:
+                for future in [pool.submit(copy_file, *item) for item in files]:
+                    future.result()
+            failed.extend(done for _, done in batch.flush() if not done)
+        finally:
+            batch.discard()
+        if failed:
+            raise OSError(errno.EIO, f"{len(failed)} fichiers non copiés", dst_dir)
+
+        # Une copie a la date (copy_metadata) et la taille de sa source ; seuls les répertoires créés sont relus
+        states = {}
+        for src_path, dst_path, st in files:
+            states[os.path.join(rel_dir, os.path.relpath(src_path, src_dir))] = (st.st_mtime_ns, st.st_size) * 2
+        for sub_path, st in dirs:
+            try:
+                dst_st = stat_path(os.path.join(dst_dir, sub_path))
+                states[os.path.join(rel_dir, sub_path)] = (st.st_mtime_ns, st.st_size, dst_st.st_mtime_ns, dst_st.st_size)
+            except OSError:
+                pass
+        return states
+
+    def scan_concurrency(self):
+        """Répertoires lus en parallèle (source, destination) : réglage, sinon selon le type de montage"""
+        if self.resolved_scan_workers is None:
+            self.resolved_scan_workers = tuple(count or (SCAN_NETWORK_WORKERS if is_network_mount(root) else 1)
+                                               for count, root in zip(self.scan_workers, (self.org_dir, self.dst_dir)))
+        return self.resolved_scan_workers
+
+    def record_row(self, store, row):
+        """Met à jour sync_state (par groupes) après l'exécution d'une ligne du plan"""
+        org_path = os.path.normpath(row.org_path)
+        dst_path = os.path.normpath(row.dst_path)
+        rel_path = os.path.relpath(org_path, self.org_dir)
+
+        # Un déplacement renomme l'ancien chemin, contenu compris
+        renames = []
+        if row.move_from:
+            moved_root = self.dst_dir if row.action == "~~>" else self.org_dir
+            renames = [(os.path.relpath(os.path.normpath(row.move_from), moved_root), rel_path)]
+
+        # Date et taille après l'action pour le fichier source et destination, None s'il n'existe plus
+        state = []
+        for path in (org_path, dst_path):
+            try:
+                st = stat_path(path)
+                state += [st.st_mtime_ns, st.st_size]
+            except OSError:
+                state += [None, None]
+        states = {rel_path: tuple(state) if any(value is not None for value in state) else None}
+
+        # Arborescence regroupée : tout le contenu en une fois
+        removed = []
+        if row.subtree and row.action in ("--X", "X--"):
+            removed = [rel_path]
+        elif row.subtree:
+            states.update(self.tree_states.pop(row.org_path, {}))  # Relevés par copy_tree
+        store.record(row.id, states, renames=renames, removed=removed)
+
+
+# Couleur et style de la colonne Action, configurés une seule fois par tag
+ACTION_COLORS = {
+    "===": ("grey", "normal"),
+    ">>>": ("green", "normal"), "<<<": ("green", "normal"),
+    "==>": ("green", "normal"), "<==": ("green", "normal"),
+    "--X": ("red", "normal"), "X--": ("red", "normal"),
+    "~~>": ("blue", "normal"), "<~~": ("blue", "normal"),
+    "/!\\": ("orange", "normal"),
+    "-!-": ("white", "italic")  # Nouveau style pour fichier exclus
+}
+RENDER_INTERVAL = 0.2  # Secondes minimum entre deux rafraîchissements pendant l'ajout de lignes
+ANALYSIS_POLL_MS = 100  # Intervalle de lecture de la file du thread d'analyse
+ANALYSIS_BATCH = 500  # Lignes envoyées par message du thread d'analyse
+
+
+def plan_row_values(row):
+    """Valeurs affichées dans le TreeView pour une ligne du plan"""
+    # Arborescence regroupée : nombre d'entrées du contenu après le nom
+    suffix = f" (+{row.subtree})" if row.subtree else ""
+    return (row.org_path, row.org_name and row.org_name + suffix, format_mtime(row.org_mtime),
+            row.action, row.dst_path, row.dst_name and row.dst_name + suffix, format_mtime(row.dst_mtime))
+
+
+class PlanView:
+    """Affichage virtualisé d'un plan dans un TreeView.
+
+    Les lignes sont conservées hors du widget, dans un PlanStore ; seules celles
+    de la fenêtre visible sont insérées dans le TreeView. L'identifiant de
+    chaque élément affiché est l'indice de la ligne dans le plan. Les lignes
+    exécutées sont retirées par identifiant, dans l'ordre où elles se terminent.
+    """
+
+    def __init__(self, root, treeview, scrollbar):
+        self.root = root
+        self.treeview = treeview
+        self.scrollbar = scrollbar
+        self.rows = PlanStore()
+        self.first = 0  # Première ligne visible, parmi les lignes restantes
+        self.visible = 20
+        self.last_render = 0.0
+
+        for action, (color, font_style) in ACTION_COLORS.items():
+            self.treeview.tag_configure(action, foreground=color, font=("Helvetica", 10, font_style))
+        self.treeview.tag_configure("-!-", background="#D3D3D3")  # Fond gris clair pour "-!-"
+
+        self.scrollbar.configure(command=self.yview)
+        self.treeview.bind("<Configure>", self.on_resize)
+        self.treeview.bind("<MouseWheel>", self.on_wheel)
+        self.treeview.bind("<Button-4>", self.on_wheel)
+        self.treeview.bind("<Button-5>", self.on_wheel)
+
+    def __len__(self):
+        return self.rows.remaining()
+
+    def row(self, item_id):
+        """Ligne du plan correspondant à un élément affiché"""
+        return self.rows[int(item_id)]
+
+    def set_row(self, item_id, row):
+        """Remplace une ligne du plan et son affichage"""
+        self.rows[int(item_id)] = row
+        self.treeview.item(item_id, values=plan_row_values(row), tags=(row.action,))
+
+    def clear(self):
+        """Vide le plan et le TreeView"""
+        self.rows = PlanStore()
+        self.first = 0
+        self.render()
+
+    def append(self, rows):
+        """Ajoute des lignes ; l'affichage n'est rafraîchi qu'à intervalle régulier"""
+        self.rows.extend(rows)
+        if time.monotonic() - self.last_render >= RENDER_INTERVAL:
+            self.render()
+            self.root.update_idletasks()
+
+    def remove_row(self, row):
+        """Retire de l'affichage une ligne exécutée, retrouvée par son identifiant"""
+        index = self.rows.find(row.id) if row.id is not None else None
+        if index is None:
+            return
+        self.rows.remove(index)
+        if time.monotonic() - self.last_render >= RENDER_INTERVAL:
+            self.render()
+            self.root.update_idletasks()
+
+    def render(self):
+        """Insère dans le TreeView uniquement les lignes de la fenêtre visible"""
+        total = len(self)
+        self.first = max(0, min(self.first, total - self.visible))
+        with METRICS.timer('render'):
+            self.treeview.delete(*self.treeview.get_children())
+            for index in self.rows.live_indices(self.first, self.visible):
+                row = self.rows[index]
+                self.treeview.insert("", "end", iid=str(index), values=plan_row_values(row), tags=(row.action,))
+
+        if total:
+            self.scrollbar.set(self.first / total, min(1.0, (self.first + self.visible) / total))
+        else:
+            self.scrollbar.set(0.0, 1.0)
+        self.last_render = time.monotonic()
+
+    def scroll_to(self, first):
+        self.first = int(first)
+        self.render()
+
+    def yview(self, *args):
+        """Commande de la barre de défilement : déplace la fenêtre visible dans le plan"""
+        if args[0] == "moveto":
+            self.scroll_to(float(args[1]) * len(self))
+        elif args[0] == "scroll":
+            step = self.visible if args[2] == "pages" else 1
+            self.scroll_to(self.first + int(args[1]) * step)
+
+    def on_wheel(self, event):
+        if event.num == 4 or getattr(event, "delta", 0) > 0:
+            self.scroll_to(self.first - 3)
+        else:
+            self.scroll_to(self.first + 3)
+        return "break"
+
+    def on_resize(self, event):
+        """Recalcule le nombre de lignes visibles selon la hauteur du TreeView"""
+        row_height = ttk.Style().lookup("Treeview", "rowheight") or 20
+        visible = max(1, (event.height - 25) // int(row_height))
+        if visible != self.visible:
+            self.visible = visible
+            self.render()
+
 
 class SyncerApp:
     def __init__(self, root):
@@ -22,6 +3323,13 @@ class SyncerApp:
         # Variable d'action
         self.GO = True
 
+        # Analyse en tâche de fond : moteur courant et file de messages vers l'interface
+        self.engine = None
+        self.messages = queue.Queue()
+        self.status = StringVar()
+        self.metrics_status = StringVar()
+        self.metrics_enabled = BooleanVar(value=METRICS.enabled)
+
         # Création des cadres pour l'alignement
         path_frame = Frame(root)
         path_frame.pack(pady=5)
@@ -37,9 +3345,22 @@ class SyncerApp:
         # Création des boutons d'analyse et d'exécution dans un autre cadre pour l'alignement
         action_frame = Frame(root)
         action_frame.pack(pady=5)
-        Button(action_frame, text="Analyse", command=self.run_analysis).grid(row=0, column=0, padx=5)
-        Button(action_frame, text="Exécuter", command=self.execute_actions).grid(row=0, column=1, padx=5)
-        Button(action_frame, text="Vider Analyse", command=self.clear_analysis).grid(row=0, column=2, padx=5)
+        self.analyse_button = Button(action_frame, text="Analyse", command=self.run_analysis)
+        self.analyse_button.grid(row=0, column=0, padx=5)
+        self.execute_button = Button(action_frame, text="Exécuter", command=self.execute_actions)
+        self.execute_button.grid(row=0, column=1, padx=5)
+        self.clear_button = Button(action_frame, text="Vider Analyse", command=self.clear_analysis)
+        self.clear_button.grid(row=0, column=2, padx=5)
+        self.cancel_button = Button(action_frame, text="Annuler", command=self.cancel_analysis, state="disabled")
+        self.cancel_button.grid(row=0, column=3, padx=5)
+        Checkbutton(action_frame, text="Mesures", variable=self.metrics_enabled,
+                    command=self.toggle_metrics).grid(row=0, column=4, padx=5)
+
+        # Progression de l'analyse
+        Label(root, textvariable=self.status).pack()
+
+        # Barre d'état des mesures, en bas de la fenêtre
+        Label(root, textvariable=self.metrics_status, anchor="w").pack(side="bottom", fill="x")
 
         # Création de TreeView pour afficher les fichiers
         self.create_table_view()
@@ -56,6 +3377,36 @@ class SyncerApp:
         # Créer les menus contextuels
         self.create_context_menus()
 
+        # Recharger un plan dont l'exécution a été interrompue
+        self.load_saved_plan()
+        self.update_metrics()
+
+    def toggle_metrics(self):
+        """Active ou désactive les mesures depuis la case à cocher"""
+        METRICS.enabled = self.metrics_enabled.get()
+        if METRICS.enabled:
+            METRICS.reset()
+        self.update_metrics(schedule=False)
+
+    def update_metrics(self, schedule=True):
+        """Rafraîchit la barre d'état des mesures"""
+        self.metrics_status.set(METRICS.summary() if METRICS.enabled else "")
+        if schedule:
+            self.root.after(METRICS_STATUS_MS, self.update_metrics)
+
+    def write_metrics_report(self, command, org_dir, dst_dir):
+        """Écrit le rapport JSON de l'analyse ou de l'exécution terminée, si les mesures sont actives"""
+        if METRICS.enabled:
+            METRICS.write_report(command=command, source=org_dir, destination=dst_dir)
+            self.update_metrics(schedule=False)
+
+    def load_saved_plan(self):
+        """Affiche les lignes restant à exécuter du plan enregistré"""
+        if load_plan_roots() and count_plan():
+            self.view.append(iter_plan())
+            self.view.render()
+            self.status.set(f"Plan enregistré : {len(self.view)} actions restant à exécuter")
+
 
     def create_table_view(self):
         """Créer un TreeView pour afficher les données sous forme de tableau"""
@@ -87,9 +3438,12 @@ class SyncerApp:
         self.treeview.grid(row=0, column=0, sticky="nsew")
 
         # Création des Scrollbars
-        v_scrollbar = ttk.Scrollbar(frame, orient="vertical", command=self.treeview.yview)
+        v_scrollbar = ttk.Scrollbar(frame, orient="vertical")
         h_scrollbar = ttk.Scrollbar(frame, orient="horizontal", command=self.treeview.xview)
-        self.treeview.configure(yscrollcommand=v_scrollbar.set, xscrollcommand=h_scrollbar.set)
+        self.treeview.configure(xscrollcommand=h_scrollbar.set)
+
+        # Le plan est stocké hors du TreeView, qui n'affiche que la partie visible
+        self.view = PlanView(self.root, self.treeview, v_scrollbar)
 
         # Placement des Scrollbars
         v_scrollbar.grid(row=0, column=1, sticky="ns")
@@ -104,91 +3458,62 @@ class SyncerApp:
 
         # Créer le menu contextuel
         self.context_menu_action = Menu(self.root, tearoff=0)
-        actions = ["===", ">>>", "<<<", "==>", "<==", "--X", "X--", "/!\\", "-!-"]
+        actions = ["===", ">>>", "<<<", "==>", "<==", "--X", "X--", "~~>", "<~~", "/!\\", "-!-"]
         for action in actions:
             self.context_menu_action.add_command(label=action, command=lambda a=action: self.change_action(a))
 
         # Ajouter l'infobulle pour le chemin complet
         self.treeview.bind("<Motion>", self.show_tooltip)
         self.treeview.bind("<Leave>", self.hide_tooltip)
-        
-        # Définir les tags pour le style "-!-" (fichier exclus)
-        self.treeview.tag_configure("-!-", foreground="white", background="#D3D3D3", font=("Helvetica", 10, "italic"))
 
     def clear_analysis(self):
         """Purge complètement la base de données syncer_analyse.db"""
         try:
-            with sqlite3.connect(ANALYSE_DB) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM sync_analysis")  # Suppression de toutes les données
-                conn.commit()
+            clear_analysis_db()
             messagebox.showinfo("Succès", "La base de données d'analyse a été vidée.")
         except Exception as e:
             messagebox.showerror("Erreur", f"Erreur lors de la vidange de la base de données: {e}")
 
     def init_databases(self):
         """Initialise les bases de données si elles n'existent pas"""
-        with sqlite3.connect(ANALYSE_DB) as conn:
-            conn.execute('''CREATE TABLE IF NOT EXISTS sync_analysis (
-                            path TEXT PRIMARY KEY,
-                            time TIMESTAMP)''')
-        
-        with sqlite3.connect(CONFIG_DB) as conn:
-            conn.execute('''CREATE TABLE IF NOT EXISTS sync_config (
-                            key TEXT PRIMARY KEY,
-                            value TEXT)''')
+        init_databases()
 
 
     def init_filter_database(self):
         """Initialise la base de données de filtres avec la table nécessaire."""
-        with sqlite3.connect("syncer_filter.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS filters (
-                    type TEXT,
-                    value TEXT,
-                    UNIQUE(type, value)
-                )
-            """)
-            conn.commit()
+        init_filter_database()
 
 
     def load_filters(self):
         """Charge les filtres depuis la base de données dans un dictionnaire."""
-        self.filters = {'extension': set(), 'filename': set()}
-        with sqlite3.connect("syncer_filter.db") as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT type, value FROM filters")
-            for filter_type, value in cursor.fetchall():
-                if filter_type in self.filters:
-                    self.filters[filter_type].add(value)
-        print("Filtres chargés :", self.filters)
+        self.filters = load_filters()
+        log.info("Filtres chargés : %s", self.filters)
 
 
 
     def add_filter(self, filter_type, value):
         """Ajoute un filtre dans la base de données, sauf s'il existe déjà."""
-        with sqlite3.connect("syncer_filter.db") as conn:
+        with open_db(FILTER_DB) as conn:
             cursor = conn.cursor()
             try:
                 cursor.execute("INSERT INTO filters (type, value) VALUES (?, ?)", (filter_type, value))
                 conn.commit()
-                print(f"Filtre ajouté : {filter_type} - {value}")
+                log.info("Filtre ajouté : %s - %s", filter_type, value)
             except sqlite3.IntegrityError:
-                print(f"Le filtre {value} de type {filter_type} existe déjà.")
+                log.info("Le filtre %s de type %s existe déjà.", value, filter_type)
 
     def remove_filter(self, filter_type, value):
         """Supprime un filtre de la base de données."""
-        with sqlite3.connect("syncer_filter.db") as conn:
+        with open_db(FILTER_DB) as conn:
             cursor = conn.cursor()
             cursor.execute("DELETE FROM filters WHERE type = ? AND value = ?", (filter_type, value))
             conn.commit()
-            print(f"Filtre supprimé : {filter_type} - {value}")
+            log.info("Filtre supprimé : %s - %s", filter_type, value)
 
 
     def filter_exists(self, filter_type, value):
         """Vérifie si un filtre existe dans la base de données."""
-        with sqlite3.connect("syncer_filter.db") as conn:
+        with open_db(FILTER_DB) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT 1 FROM filters WHERE type = ? AND value = ?", (filter_type, value))
             return cursor.fetchone() is not None
@@ -198,7 +3523,7 @@ class SyncerApp:
 
     def load_directories(self):
         """Charge les répertoires source et destination à partir de la base de données"""
-        with sqlite3.connect(CONFIG_DB) as conn:
+        with open_db(CONFIG_DB) as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT value FROM sync_config WHERE key = ?", ("source",))
             org_path = cursor.fetchone()
@@ -215,7 +3540,7 @@ class SyncerApp:
         directory = filedialog.askdirectory(title="Sélectionner le répertoire source")
         if directory:
             self.org_dir.set(directory)
-            with sqlite3.connect(CONFIG_DB) as conn:
+            with open_db(CONFIG_DB) as conn:
                 conn.execute("REPLACE INTO sync_config (key, value) VALUES (?, ?)", ("source", directory))
 
     def select_destination(self):
@@ -223,7 +3548,7 @@ class SyncerApp:
         directory = filedialog.askdirectory(title="Sélectionner le répertoire destination")
         if directory:
             self.dst_dir.set(directory)
-            with sqlite3.connect(CONFIG_DB) as conn:
+            with open_db(CONFIG_DB) as conn:
                 conn.execute("REPLACE INTO sync_config (key, value) VALUES (?, ?)", ("destination", directory))
 
     def run_analysis(self):
@@ -232,261 +3557,96 @@ class SyncerApp:
             messagebox.showerror("Erreur", "Sélectionnez les répertoires source et destination.")
             return
 
-        # Vider le TreeView avant l'analyse
-        self.treeview.delete(*self.treeview.get_children())
+        # Vider le plan avant l'analyse
+        self.view.clear()
 
         # Analyser et remplir les colonnes
         self.analyze_directory(self.org_dir.get(), self.dst_dir.get())
 
 
 
-    def search_file_db(self, org_path, org_dir, dst_dir):
-        """
-        Vérifie si un fichier ou répertoire source existe dans le répertoire de destination
-        en utilisant un chemin relatif basé sur le répertoire source.
-        
-        Args:
-            org_path (str): Chemin complet du fichier ou répertoire dans le répertoire source.
-            org_dir (str): Chemin du répertoire source.
-            dst_dir (str): Chemin du répertoire de destination.
-
-        Returns:
-            bool: True si le fichier ou répertoire existe dans la destination, False sinon.
-        """
-
-        org_path = os.path.normpath(org_path)
-        print(f"Origine :  {org_path}")
-        org_dir = os.path.normpath(org_dir)
-        print(f"Dir O :  {org_dir}")
-        dst_dir = os.path.normpath(dst_dir)
-        print(f"Dir D :  {dst_dir}")
-
-        # Calculer le chemin relatif du fichier/répertoire à partir du répertoire source
-        relative_path = os.path.relpath(org_path, org_dir)
-        
-        # Construire le chemin complet dans le répertoire de destination
-        dst_full_path = os.path.join(dst_dir, relative_path)
-        
-        # Connexion à la base de données (ex: syncer.db)
-        conn = sqlite3.connect('syncer_analyse.db')
-        cursor = conn.cursor()
-        
-        # Requête SQL pour vérifier l'existence du chemin dans la destination
-        query = """
-        SELECT COUNT(*) FROM sync_analysis WHERE path = ?
-        """
-        cursor.execute(query, (dst_full_path,))
-        result = cursor.fetchone()
-        print(f"Recherche {dst_full_path}")
-        print(f"Résultat {result[0]}")
-        # Fermer la connexion
-        conn.close()
-        
-        # Retourne True si le fichier existe, sinon False
-        return result[0] > 0
-
-
-
-    def check_db_mtime(self, path, mtime):
-        """Vérifie si la date de modification d'un fichier dans la base de données correspond à la date actuelle.
-
-        Args:
-            path (str): Le chemin du fichier à vérifier.
-            current_mtime (float): La date de modification actuelle du fichier.
-
-        Returns:
-            bool: True si la date de modification correspond, False sinon.
-        """
-        try:
-            # Connexion à la base de données
-            conn = sqlite3.connect('syncer_analyse.db')
-            cursor = conn.cursor()
-
-            # Vérification de la date de modification dans la base
-            cursor.execute("SELECT time FROM sync_analysis WHERE path = ?", (path,))
-            row = cursor.fetchone()
-
-            if row:
-                stored_mtime = row[0]
-                # Comparaison des dates
-                if stored_mtime == mtime :
-                    print(f"OK - Ctrl mtime = {path} Store_mtime = {stored_mtime}")
-                    return True
-                else:
-                    #print(f"Erreur - Ctrl mtime = {path} Store_mtime = {stored_mtime}")
-                    return False
-            else:
-                # Le fichier n'est pas trouvé dans la base de données
-                #print(f"Aucune date trouvée pour le fichier {path}")
-                return False
-
-        except sqlite3.Error as e:
-            #print(f"Erreur lors de la vérification de la date dans la base de données : {e}")
-            return False
-
-        finally:
-            conn.close()
-
     def analyze_directory(self, org_dir, dst_dir):
+        """Analyse et compare les répertoires source et destination dans un thread de fond"""
         self.load_filters()  # Charger les filtres avant de commencer l'analyse
 
-        """Analyse et compare les répertoires source et destination"""
-        org_dir = self.org_dir.get()
-        dst_dir = self.dst_dir.get()
+        self.engine = SyncEngine(org_dir, dst_dir, self.filters, go=self.GO, hash_mode=load_hash_mode(),
+                                 incremental=load_incremental(), scan_workers=load_scan_workers())
+        METRICS.reset()
+        self.messages = queue.Queue()
+        self.analyse_button.config(state="disabled")
+        self.execute_button.config(state="disabled")
+        self.cancel_button.config(state="normal")
+
+        worker = threading.Thread(target=self.analysis_worker, args=(self.engine, self.messages), daemon=True)
+        worker.start()
+        self.root.after(ANALYSIS_POLL_MS, self.poll_analysis)
+
+    def analysis_worker(self, engine, messages):
+        """Thread de fond : envoie les lignes du plan par lots et la progression"""
+        started = time.monotonic()
+        batch = []
+        last_sent = started
+        try:
+            for row in engine.plan(save=True):
+                batch.append(row)
+                now = time.monotonic()
+                if len(batch) >= ANALYSIS_BATCH or now - last_sent >= ANALYSIS_POLL_MS / 1000:
+                    messages.put(("rows", batch))
+                    messages.put(("progress", (dict(engine.progress), engine.rate(started))))
+                    batch = []
+                    last_sent = now
+            messages.put(("rows", batch))
+            messages.put(("progress", (dict(engine.progress), engine.rate(started))))
+            messages.put(("done", engine.cancelled.is_set()))
+        except Exception as e:
+            messages.put(("rows", batch))
+            messages.put(("error", e))
 
-        # Set pour stocker les chemins relatifs ajoutés dans le TreeView
-        seen_paths = set()
+    def poll_analysis(self):
+        """Lit la file du thread d'analyse depuis la boucle Tk (root.after)"""
+        finished = False
+        complete = False
+        try:
+            while True:
+                kind, payload = self.messages.get_nowait()
+                if kind == "rows":
+                    self.view.append(payload)
+                elif kind == "progress":
+                    progress, rate = payload
+                    self.status.set(f"{progress['dirs']} répertoires, {progress['entries']} entrées, "
+                                    f"{progress['skipped']} inchangées, {rate:.0f} fichiers/s")
+                elif kind == "done":
+                    finished = True
+                    complete = not payload
+                    if payload:
+                        self.status.set(self.status.get() + " - analyse annulée, plan incomplet non exécutable")
+                elif kind == "error":
+                    finished = True
+                    messagebox.showerror("Erreur", f"Erreur pendant l'analyse : {payload}")
+        except queue.Empty:
+            pass
+
+        if finished:
+            self.view.render()
+            self.write_metrics_report("analyze", self.engine.org_dir, self.engine.dst_dir)
+            self.engine = None
+            self.analyse_button.config(state="normal")
+            # Un plan partiel (analyse annulée ou en erreur) n'est pas exécutable
+            self.execute_button.config(state="normal" if complete else "disabled")
+            self.cancel_button.config(state="disabled")
+        else:
+            self.root.after(ANALYSIS_POLL_MS, self.poll_analysis)
 
-        # Analyser le répertoire source
-        # On compare les dates de fichiers entre org et dst
-        # On va aussi comparer par rapport à la base de donnée pour voir si confit
-        # Ne s'applique uniquement que sur les fichiers !!!
-        # Si la date du fichier plus à jour ne coincide pas avec la base de donnée, c'est normal
-        # Si la destination à été modifiée entre temps (il y a conflit)
-        # Permet aussi de détecter les suppression de répertoires
-        # Si un répertoire ou un fichier existait en base de donnée, mais plus maintenant, c'est qu'il doit être effacé !
-        for root, dirs, files in os.walk(org_dir):
-            for org_name in dirs + files:
-                dst_name = ""
-                dst_mtime = None
-                org_path = os.path.join(root, org_name)
-                org_path = os.path.normpath(org_path)  # Normaliser ici
-                org_path_isdir = os.path.isdir(org_path)
-                org_mtime = datetime.fromtimestamp(os.path.getmtime(org_path))
-                org_rel_path = os.path.relpath(org_path, org_dir)
-                org_ext = os.path.splitext(org_name)[1]
-                # Controle date en base
-                org_ctrl_mtime = self.check_db_mtime(org_path, org_mtime.strftime('%y/%m/%d %H:%M:%S'))
-
-                # Déterminer le chemin dans le dossier de destination
-                dst_path = os.path.join(dst_dir, org_rel_path)
-                dst_path = os.path.normpath(dst_path)  # Normaliser ici
-                dst_path_isdir = os.path.isdir(dst_path)
-                if os.path.exists(dst_path):
-                    dst_name = os.path.basename(dst_path)
-                    dst_mtime = datetime.fromtimestamp(os.path.getmtime(dst_path))
-                    delta_seconds = abs((org_mtime - dst_mtime).total_seconds())
-                    dst_ext = os.path.splitext(dst_name)[1]
-                    # Controle date
-                    dst_ctrl_mtime = self.check_db_mtime(dst_path, dst_mtime.strftime('%y/%m/%d %H:%M:%S'))
-
-                    # Vérifier si le fichier ou l'extension doit être exclu
-                    if dst_name in self.filters['filename'] or org_name in self.filters['filename'] or org_ext in self.filters['extension'] or dst_ext in self.filters['extension']:
-                        action = "-!-"  # Pas de modification nécessaire
-                    elif os.path.isdir(dst_path):
-                        action = "==="  # Pas de modification nécessaire
-                    elif delta_seconds <= DELTA:
-                        action = "==="  # Pas de modification nécessaire
-                    elif org_mtime > dst_mtime and dst_ctrl_mtime == True:
-                        action = "==>"  # Copier de la source vers la destination
-                    elif org_mtime < dst_mtime and org_ctrl_mtime == True:
-                        action = "<=="  # Copier de la destination vers la source
-                    elif dst_ctrl_mtime == False or org_ctrl_mtime == False:
-                        action = "/!\\"  # erreur de coincidence
-                        print(f"org_mtime = {org_mtime} dst_mtime = {dst_mtime}")
-                elif org_name in self.filters['filename'] or org_ext in self.filters['extension']:
-                    action = "-!-"  # Pas de modification nécessaire
-                elif self.search_file_db(org_path, org_dir, dst_dir):
-                    action = "X--"  # Supprime le fichier original
-                else:
-                    action = ">>>"  # Fichier à créer dans la destination
-                    
-
-                # Ajout dans le TreeView au fur et à mesure
-                if org_rel_path not in seen_paths:
-                   self.add_to_treeview(org_path, org_name, org_mtime, action, dst_path, dst_name, dst_mtime)
-                   seen_paths.add(org_rel_path)  # Marquer le chemin comme traité
-
-        # Analyser le répertoire source
-        for root, dirs, files in os.walk(dst_dir):
-            for dst_name in dirs + files:
-                org_name = ""
-                org_mtime = None
-                dst_path = os.path.join(root, dst_name)
-                dst_path = os.path.normpath(dst_path)  # Normaliser ici
-                dst_path_isdir = os.path.isdir(dst_path)
-                dst_mtime = datetime.fromtimestamp(os.path.getmtime(dst_path))
-                dst_rel_path = os.path.relpath(dst_path, dst_dir)
-                dst_ext = os.path.splitext(dst_name)[1]
-                # Controle date en base
-                dst_ctrl_mtime = self.check_db_mtime(dst_path, dst_mtime.strftime('%y/%m/%d %H:%M:%S'))
-
-
-                # Déterminer le chemin dans le dossier de destination
-                org_path = os.path.join(org_dir, dst_rel_path)
-                org_path = os.path.normpath(org_path)  # Normaliser ici
-                org_path_isdir = os.path.isdir(org_path)
-                if os.path.exists(org_path):
-                    org_name = os.path.basename(org_path)
-                    org_mtime = datetime.fromtimestamp(os.path.getmtime(org_path))
-                    delta_seconds = abs((dst_mtime - org_mtime).total_seconds())
-                    org_ext = os.path.splitext(org_name)[1]
-                    # Controle date en base
-                    org_ctrl_mtime = self.check_db_mtime(org_path, org_mtime.strftime('%y/%m/%d %H:%M:%S'))
-
-                    # Vérifier si le fichier ou l'extension doit être exclu
-                    if dst_name in self.filters['filename'] or org_name in self.filters['filename'] or org_ext in self.filters['extension'] or dst_ext in self.filters['extension']:
-                        action = "-!-"  # Pas de modification nécessaire
-                    elif os.path.isdir(org_path):
-                        action = "==="  # Pas de modification nécessaire
-                    elif delta_seconds <= DELTA:
-                        action = "==="  # Pas de modification nécessaire
-                    elif dst_mtime > org_mtime and org_ctrl_mtime == True:
-                        action = "<=="  # Copier de la source vers la destination
-                    elif dst_mtime < org_mtime and dst_ctrl_mtime == True:
-                        action = "==>"  # Copier de la destination vers la source
-                    elif dst_ctrl_mtime == False or org_ctrl_mtime == False:
-                        action = "/!\\"  # erreur de coincidence
-                        #print(f"org_mtime = {org_mtime} dst_mtime = {dst_mtime}")
-
-                elif dst_name in self.filters['filename'] or dst_ext in self.filters['extension']:
-                    action = "-!-"  # Pas de modification nécessaire
-                elif self.search_file_db(dst_path, dst_dir, org_dir):
-                    action = "--X"  # Supprime le fichier destination
-                else:                    
-                    action = "<<<"  # Fichier à créer dans la destination
-
-                    
-
-                # Ajout dans le TreeView au fur et à mesure
-                if dst_rel_path not in seen_paths:
-                   self.add_to_treeview(org_path, org_name, org_mtime, action, dst_path, dst_name, dst_mtime)
-                   seen_paths.add(dst_rel_path)  # Marquer le chemin comme traité
-
-
-    def add_to_treeview(self, org_path, org_name, org_date, action, dst_path, dst_name, dst_date):
-        """Ajoute une entrée au TreeView et met à jour la couleur de la colonne action uniquement"""
-        item_id = self.treeview.insert("", "end", values=(org_path, org_name, org_date.strftime('%y/%m/%d %H:%M:%S') if org_date else "",
-                                                          action, dst_path, dst_name, 
-                                                          dst_date.strftime('%y/%m/%d %H:%M:%S') if dst_date else ""))
-
-        # Configurer seulement la couleur du texte de la colonne Action
-        self.set_action_color(item_id, action)
-        self.root.update_idletasks()  # Permet la mise à jour au fur et à mesure
-
-    def set_action_color(self, item_id, action):
-        """Applique la couleur spécifique à la colonne Action en fonction de l'action sélectionnée"""
-        colors = {
-            "===": ("grey", "normal"),
-            ">>>": ("green", "normal"), "<<<": ("green", "normal"), 
-            "==>": ("green", "normal"), "<==": ("green", "normal"),
-            "--X": ("red", "normal"), "--X": ("red", "normal"),
-            "X--": ("red", "normal"), "X--": ("red", "normal"),  
-            "/!\\": ("orange", "normal"),
-            "-!-": ("white", "italic")  # Nouveau style pour fichier exclus
-        }
-        color, font_style = colors.get(action, ("black", "normal"))
-        self.treeview.item(item_id, tags=(action,))
-        self.treeview.tag_configure(action, foreground=color, font=("Helvetica", 10, font_style))
-
-        if action == "-!-":  # Appliquer également le fond gris clair pour "-!-"
-            self.treeview.tag_configure(action, background="#D3D3D3")
+    def cancel_analysis(self):
+        """Arrête proprement l'analyse en cours"""
+        if self.engine is not None:
+            self.engine.cancel()
 
     def create_context_menus(self):
         """Crée les menus contextuels pour les colonnes Action et Nom"""
         # Menu contextuel pour la colonne Action
         self.context_menu_action = Menu(self.root, tearoff=0)
-        actions = ["===", ">>>", "<<<", "==>", "<==", "--X", "X--", "/!\\", "-!-"]
+        actions = ["===", ">>>", "<<<", "==>", "<==", "--X", "X--", "~~>", "<~~", "/!\\", "-!-"]
         for action in actions:
             self.context_menu_action.add_command(label=action, command=lambda a=action: self.change_action(a))
 
@@ -553,13 +3713,13 @@ class SyncerApp:
 
             # Ajouter les options d'inclusion/exclusion par nom pour tous les éléments
             if filename in self.filters['filename']:
-                print(f"Le nom de fichier {filename} est déjà dans les filtres.")
+                log.debug("Le nom de fichier %s est déjà dans les filtres.", filename)
                 self.context_menu_name.add_command(
                     label=f"Inclure le nom de fichier : {filename}", 
                     command=lambda: self.include_filename(filename, context_column)
                 )
             else:
-                print(f"Le nom de fichier {filename} n'est pas dans les filtres.")
+                log.debug("Le nom de fichier %s n'est pas dans les filtres.", filename)
                 self.context_menu_name.add_command(
                     label=f"Exclure le nom de fichier : {filename}", 
                     command=lambda: self.exclude_filename(filename, context_column)
@@ -582,7 +3742,7 @@ class SyncerApp:
         # Code pour ajouter l'extension à exclure dans la base de données
         if not self.filter_exists("extension", extension):
             self.add_filter("extension", extension)
-            print(f"Extension exclue pour {column} : {extension}")
+            log.info("Extension exclue pour %s : %s", column, extension)
 
 
     def include_extension(self, extension, column):
@@ -591,7 +3751,7 @@ class SyncerApp:
         filename = self.treeview.set(selected_item, column)
         extension = os.path.splitext(filename)[1]
         # Code pour inclure l'extension dans la base de données
-        print(f"Extension incluse pour {column} : {extension}")
+        log.info("Extension incluse pour %s : %s", column, extension)
         if self.filter_exists("extension", extension):
             self.remove_filter("extension", extension)
 
@@ -603,7 +3763,7 @@ class SyncerApp:
         # Code pour ajouter le nom de fichier à exclure dans la base de données
         if not self.filter_exists("filename", filename):
             self.add_filter("filename", filename)
-            print(f"Nom de fichier exclu pour {column} : {filename}")
+            log.info("Nom de fichier exclu pour %s : %s", column, filename)
 
 
     def include_filename(self, filename, column):
@@ -613,7 +3773,7 @@ class SyncerApp:
         # Code pour inclure le nom de fichier dans la base de données
         if self.filter_exists("filename", filename):
             self.remove_filter("filename", filename)
-            print(f"Nom de fichier inclus pour {column} : {filename}")
+            log.info("Nom de fichier inclus pour %s : %s", column, filename)
 
 
 
@@ -621,19 +3781,20 @@ class SyncerApp:
         """Change l'action de l'élément sélectionné dans le TreeView"""
         selected_items = self.treeview.selection()
         if not selected_items:
-            print("Aucun élément sélectionné.")
+            log.info("Aucun élément sélectionné.")
             return  # Sort de la fonction si aucun élément n'est sélectionné
 
         selected_item = selected_items[0]
-        current_values = self.treeview.item(selected_item, "values")
-
-        # Met à jour la valeur de l'action
-        new_values = list(current_values)
-        new_values[3] = new_action  # Suppose que l'action est à l'index 3
-        self.treeview.item(selected_item, values=new_values)
 
-        # Met à jour la couleur de la colonne action
-        self.set_action_color(selected_item, new_action)
+        # Met à jour l'action dans le plan enregistré et son affichage
+        try:
+            row = change_plan_action(self.view.row(selected_item), new_action)
+        except ValueError as e:
+            messagebox.showerror("Erreur", str(e))
+            return
+        self.view.set_row(selected_item, row)
+        if row.id is not None:
+            set_plan_action(row)
 
 
 
@@ -663,161 +3824,457 @@ class SyncerApp:
             self.tooltip = None
 
     def execute_actions(self):
-        """Exécute les actions définies dans le TreeView."""
-        with sqlite3.connect(ANALYSE_DB) as conn:
-            cursor = conn.cursor()
-
-        while self.treeview.get_children():  # Tant qu'il y a des éléments
-            item = self.treeview.item(self.treeview.get_children()[0])  # Toujours prendre le premier enfant
-            org_path = item['values'][0]  # Chemin source
-            org_mtime = item['values'][2]  # Date source
-            action = item['values'][3]  # Action
-            dst_path = item['values'][4]  # Chemin destination
-            dst_mtime = item['values'][6]  # Date destination
-            
-            # Normaliser les chemins pour éviter les problèmes de slash
-            org_path = os.path.normpath(org_path)
-            dst_path = os.path.normpath(dst_path)
-
-            # Afficher l'action dans la console
-            print(f"Origine: {org_path}, Action: {action}, Chemin destination: {dst_path}")
-
-            # Vérifier les dates de fichiers
-            if os.path.exists(org_path) and os.path.exists(dst_path):
-                current_org_mtime = datetime.fromtimestamp(os.path.getmtime(org_path)).strftime('%y/%m/%d %H:%M:%S')
-                current_dst_mtime = datetime.fromtimestamp(os.path.getmtime(dst_path)).strftime('%y/%m/%d %H:%M:%S')
-                
-                if current_org_mtime != org_mtime or current_dst_mtime != dst_mtime:
-                    print(f"Changement détecté dans les dates des fichiers: {org_path} ou {dst_path}")
-                    self.treeview.delete(self.treeview.get_children()[0])  # Supprimer l'élément malgré tout
-                    self.treeview.update_idletasks()  # Rafraîchir l'affichage
-                    continue  # Passer à l'itération suivante si les dates ont changé
-            
-            # Exécuter l'action selon le type d'action
-            if action == "===":
-                #print(f"Copie de {org_path} vers {dst_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                # Ajouter les nouveaux enregistrements pour le fichier source et destination
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == "==>":
-                #print(f"Copie de {org_path} vers {dst_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                if self.GO:
-                    shutil.copy2(org_path, dst_path)
-                    time.sleep(WAIT)
-                # Ajouter les nouveaux enregistrements pour le fichier source et destination
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == "<==":
-                #print(f"Copie de {dst_path} vers {org_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                if self.GO:
-                    shutil.copy2(dst_path, org_path)
-                    time.sleep(WAIT)
-                # Ajouter les nouveaux enregistrements pour le fichier source et destination
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == ">>>" and os.path.isdir(org_path): # copie de répertoire
-                #print(f"Création de {dst_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                if self.GO:
-                    os.makedirs(dst_path, exist_ok=True)
-                    time.sleep(WAIT)
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == ">>>" and not os.path.isdir(org_path): # copie de fichier
-                #print(f"Création de {dst_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                if self.GO:
-                    shutil.copy2(org_path, dst_path)
-                    time.sleep(WAIT)
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == "<<<" and os.path.isdir(dst_path): # copie de répertoire
-                #print(f"Création de {org_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                if self.GO:
-                    os.makedirs(org_path, exist_ok=True)
-                    time.sleep(WAIT)
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == "<<<" and not os.path.isdir(dst_path): # copie de fichier
-                #print(f"Création de {org_path}")
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                if self.GO:
-                    shutil.copy2(dst_path, org_path)
-                    time.sleep(WAIT)
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (org_path, current_org_mtime))
-                cursor.execute("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", (dst_path, current_dst_mtime))
-                conn.commit()
-
-            elif action == "--X" and os.path.isdir(dst_path): # supression de répertoire
-                #print(f"Suppression de {dst_path}")
-                if self.GO:
-                    shutil.rmtree(dst_path)
-                    time.sleep(WAIT)
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                conn.commit()
-
-            elif action == "--X" and not os.path.isdir(dst_path): # supression de fichier
-                #print(f"Suppression de {dst_path}")
-                if self.GO:
-                    os.remove(dst_path)
-                    time.sleep(WAIT)
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                conn.commit()
-
-            elif action == "X--" and os.path.isdir(org_path): # supression de répertoire
-                #print(f"Suppression de {org_path}")
-                if self.GO:
-                    shutil.rmtree(org_path)
-                    time.sleep(WAIT)
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                conn.commit()
-
-            elif action == "X--" and not os.path.isdir(dst_path): # supression de fichier
-                #print(f"Suppression de {org_path}")
-                if self.GO:
-                    os.remove(org_path)
-                    time.sleep(WAIT)
-                # Supprimer les anciens enregistrements pour le fichier source et destination
-                cursor.execute("DELETE FROM sync_analysis WHERE path = ? OR path = ?", (org_path, dst_path))
-                conn.commit()
-
-            elif action == "-!-":
-                print(f"Exclusion de {org_path} ou {dst_path}")
+        """Exécute dans un thread de fond les actions restantes du plan enregistré, affiché dans le TreeView."""
+        roots = load_plan_roots()
+        if roots is None:
+            messagebox.showerror("Erreur", "Aucun plan complet à exécuter, lancez d'abord l'analyse.")
+            return
+        self.load_filters()  # Plan rechargé au démarrage : les filtres ne sont pas encore chargés
+        engine = SyncEngine(*roots, self.filters, go=self.GO, workers=load_workers(), config_db=CONFIG_DB,
+                            delta_min_size=load_delta_min_size(), delta_in_place=load_delta_in_place(),
+                            copy_buffer=load_copy_buffer())
+
+        METRICS.reset()
+        self.engine = engine
+        self.messages = queue.Queue()
+        for button in (self.analyse_button, self.execute_button, self.clear_button):
+            button.config(state="disabled")
+
+        worker = threading.Thread(target=self.execution_worker, args=(engine, self.messages), daemon=True)
+        worker.start()
+        self.root.after(ANALYSIS_POLL_MS, self.poll_execution)
+
+    def execution_worker(self, engine, messages):
+        """Thread de fond : exécute le plan et envoie par lots les lignes terminées"""
+        batch = []
+        last_sent = time.monotonic()
+
+        def done(row):
+            nonlocal batch, last_sent
+            batch.append(row)
+            now = time.monotonic()
+            if len(batch) >= ANALYSIS_BATCH or now - last_sent >= ANALYSIS_POLL_MS / 1000:
+                messages.put(("rows", batch))
+                batch = []
+                last_sent = now
 
-            # Supprimer la ligne au fur et à mesure
-            self.treeview.delete(self.treeview.get_children()[0])  # Supprime toujours le premier enfant
-            self.treeview.update_idletasks()  # Rafraîchir l'affichage
+        try:
+            count = engine.execute(iter_plan(), on_done=done)
+            messages.put(("rows", batch))
+            messages.put(("done", count))
+        except Exception as e:
+            messages.put(("rows", batch))
+            messages.put(("error", e))
 
+    def poll_execution(self):
+        """Lit la file du thread d'exécution depuis la boucle Tk (root.after)"""
+        finished = False
+        try:
+            while True:
+                kind, payload = self.messages.get_nowait()
+                if kind == "rows":
+                    # Retirer les lignes de l'affichage au fur et à mesure, dans l'ordre où elles se terminent
+                    for row in payload:
+                        self.view.remove_row(row)
+                    self.status.set(f"Exécution : {len(self.view)} actions restantes")
+                elif kind == "done":
+                    finished = True
+                    self.view.clear()
+                    self.status.set(f"{payload} actions exécutées")
+                elif kind == "error":
+                    finished = True
+                    self.view.render()
+                    messagebox.showerror("Erreur", f"Erreur pendant l'exécution : {payload}")
+        except queue.Empty:
+            pass
+
+        if finished:
+            self.write_metrics_report("execute", self.engine.org_dir, self.engine.dst_dir)
+            self.engine = None
+            for button in (self.analyse_button, self.execute_button, self.clear_button):
+                button.config(state="normal")
+        else:
+            self.root.after(ANALYSIS_POLL_MS, self.poll_execution)
 
 
 
-# Lancer l'application
-root = Tk()
-app = SyncerApp(root)
-root.mainloop()
+
+# Profil : bases de configuration, d'analyse et de filtres d'un couple de répertoires
+Profile = namedtuple('Profile', ['name', 'config_db', 'analyse_db', 'filter_db'])
+
+# Processus du pool de run_profiles : limite globale d'entrées-sorties et file de progression
+PROFILE_WORKER = {}
+
+
+def open_profile(name=None):
+    """Bases d'un profil, initialisées.
+
+    Args:
+        name (str): Nom du profil, dont les bases sont dans PROFILES_DIR/name ;
+            None pour les bases du répertoire courant (un seul couple).
+
+    Returns:
+        Profile: Chemins des bases du profil.
+    """
+    if name is None:
+        profile = Profile(None, CONFIG_DB, ANALYSE_DB, FILTER_DB)
+    else:
+        if not re.fullmatch(r"[\w.-]+", name) or name.startswith("."):
+            raise ValueError(f"Nom de profil invalide : {name}")
+        directory = os.path.join(PROFILES_DIR, name)
+        os.makedirs(directory, exist_ok=True)
+        profile = Profile(name, *(os.path.join(directory, db) for db in (CONFIG_DB, ANALYSE_DB, FILTER_DB)))
+    init_databases(profile.analyse_db, profile.config_db)
+    init_filter_database(profile.filter_db)
+    return profile
+
+
+def list_profiles():
+    """Noms des profils existants, triés"""
+    try:
+        names = os.listdir(PROFILES_DIR)
+    except OSError:
+        return []
+    return sorted(name for name in names if os.path.isfile(os.path.join(PROFILES_DIR, name, CONFIG_DB)))
+
+
+def profile_engine(profile, org_dir=None, dst_dir=None, **options):
+    """SyncEngine d'un profil, réglé par sa configuration.
+
+    Args:
+        org_dir, dst_dir (str): Répertoires à synchroniser, par défaut ceux de sync_config.
+        options: Paramètres de SyncEngine remplaçant ceux de sync_config (ignorés s'ils valent None).
+    """
+    config_db = profile.config_db
+    org_dir = org_dir or load_config("source", config_db)
+    dst_dir = dst_dir or load_config("destination", config_db)
+    if not org_dir or not dst_dir:
+        raise ValueError(f"Source et destination non définies pour le profil {profile.name or 'par défaut'}")
+    settings = {'workers': load_workers(config_db), 'hash_mode': load_hash_mode(config_db),
+                'incremental': load_incremental(config_db), 'delta_min_size': load_delta_min_size(config_db),
+                'delta_in_place': load_delta_in_place(config_db),
+                'copy_buffer': load_copy_buffer(config_db), 'scan_workers': load_scan_workers(config_db)}
+    settings.update((key, value) for key, value in options.items() if value is not None)
+    return SyncEngine(org_dir, dst_dir, load_filters(profile.filter_db), analyse_db=profile.analyse_db, config_db=config_db,
+                      **settings)
+
+
+class ProfileLogFilter(logging.Filter):
+    """Préfixe les messages d'un processus de run_profiles par le nom du profil en cours"""
+
+    def filter(self, record):
+        record.profile = PROFILE_WORKER.get('name') or "-"
+        return True
+
+
+def init_profile_worker(io_slots, progress, logs, log_level):
+    """Initialisation d'un processus du pool de run_profiles.
+
+    Les messages du journal sont envoyés un par un au processus principal
+    (file logs), qui les écrit avec les siens : rien n'est perdu à la fin du
+    processus.
+    """
+    PROFILE_WORKER.update(io_slots=io_slots, progress=progress)
+    handler = logging.handlers.QueueHandler(logs)
+    handler.addFilter(ProfileLogFilter())
+    handler.setFormatter(logging.Formatter("[%(profile)s] %(message)s"))
+    log.handlers[:] = [handler]
+    log.setLevel(log_level.upper())
+    log.propagate = False
+
+
+def run_profile(name, go=True):
+    """Analyse puis exécute un profil, dans un processus du pool de run_profiles.
+
+    La progression est envoyée à la file du processus principal au plus une
+    fois toutes les PROFILE_STATUS_INTERVAL secondes.
+
+    Returns:
+        dict: Résumé de la synchronisation du profil.
+    """
+    progress = PROFILE_WORKER.get('progress')
+    PROFILE_WORKER['name'] = name
+    last_report = 0.0
+
+    def report(phase, text, force=False):
+        nonlocal last_report
+        if progress is not None and (force or time.monotonic() - last_report >= PROFILE_STATUS_INTERVAL):
+            progress.put((name, phase, text))
+            last_report = time.monotonic()
+
+    started = time.monotonic()
+    profile = open_profile(name)
+    engine = profile_engine(profile, go=go, io_slots=PROFILE_WORKER.get('io_slots'))
+    rows = 0
+    for row in engine.plan(save=True):
+        rows += 1
+        report("analyse", f"{engine.progress['entries']} entrées, {rows} lignes")
+    total = count_plan(profile.analyse_db)
+    report("analyse", f"{engine.progress['entries']} entrées, {total} lignes à exécuter", force=True)
+
+    done = 0
+
+    def on_done(row):
+        nonlocal done
+        done += 1
+        report("exécution", f"{done}/{total} lignes")
+
+    executed = engine.execute(iter_plan(profile.analyse_db), on_done=on_done)
+    elapsed = time.monotonic() - started
+    report("terminé", f"{executed} lignes exécutées en {elapsed:.1f} s", force=True)
+    return {'profile': name, 'entries': engine.progress['entries'], 'rows': rows, 'executed': executed,
+            'elapsed_s': round(elapsed, 3)}
+
+
+def run_profiles(names, processes=None, io_limit=PROFILE_IO_LIMIT, go=True, log_level="info", on_progress=None):
+    """Synchronise plusieurs profils en parallèle, un processus par profil.
+
+    Toutes les opérations sur les fichiers des profils se partagent io_limit
+    places (sémaphore entre processus), en plus des limites de débit propres
+    à chaque profil.
+
+    Args:
+        names (list): Profils à synchroniser.
+        processes (int): Profils synchronisés en même temps (défaut : nombre de processeurs).
+        io_limit (int): Opérations sur les fichiers en cours au plus, tous profils confondus (0 : illimité).
+        on_progress (callable): Appelé avec (profil, phase, texte) à chaque progression reçue.
+
+    Returns:
+        dict: {profil: résumé de run_profile, ou l'exception levée}
+    """
+    context = multiprocessing.get_context()
+    io_slots = context.BoundedSemaphore(io_limit) if io_limit else None
+    progress = context.Queue()
+    logs = context.Queue()
+    # Messages des processus écrits par les gestionnaires du journal de ce processus
+    listener = logging.handlers.QueueListener(logs, *(log.handlers or [logging.lastResort]), respect_handler_level=True)
+    listener.start()
+    results = {}
+    try:
+        with ProcessPoolExecutor(max_workers=min(len(names), processes or os.cpu_count() or 1), mp_context=context,
+                                 initializer=init_profile_worker, initargs=(io_slots, progress, logs, log_level)) as pool:
+            pending = {pool.submit(run_profile, name, go): name for name in names}
+            while pending:
+                done, _ = wait(pending, timeout=PROFILE_STATUS_INTERVAL, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = pending.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except Exception as e:
+                        log.error("Profil %s : %s", name, e)
+                        results[name] = e
+                while True:
+                    try:
+                        message = progress.get_nowait()
+                    except queue.Empty:
+                        break
+                    if on_progress:
+                        on_progress(*message)
+    finally:
+        listener.stop()  # Après la fin des processus : tous leurs messages sont reçus
+    return results
+
+
+def print_plan_row(row):
+    """Affiche une ligne du plan sur la sortie standard"""
+    print(f"{row.action}\t{format_mtime(row.org_mtime) or '-'}\t{row.org_path}\t"
+          f"{format_mtime(row.dst_mtime) or '-'}\t{row.dst_path}" + (f"\t(depuis {row.move_from})" if row.move_from else "")
+          + (f"\t(+{row.subtree} entrées)" if row.subtree else ""))
+
+
+def main(argv=None):
+    """Point d'entrée : interface graphique sans argument, sinon ligne de commande.
+
+    python -m syncer analyze [source] [destination] [--hash] [--incremental]
+    python -m syncer execute [source] [destination] [--incremental] [--dry-run] [--workers N] [--resume] [--delta-min-size N]
+    python -m syncer watch [source] [destination] [--dry-run] [--workers N] [--poll S]
+    python -m syncer throttle [--bytes N] [--ops N] [--latency MS]
+    python -m syncer filter [--add TYPE VALEUR] [--remove TYPE VALEUR]
+    python -m syncer profile [NOM] [--source S] [--destination D]
+    python -m syncer run [NOM ...] [--processes N] [--io-limit N] [--dry-run]
+
+    Avant la commande : --log-level debug|info|warning|error, --metrics [FICHIER] (rapport JSON des mesures),
+    --profile NOM (bases du profil au lieu de celles du répertoire courant).
+    """
+    parser = argparse.ArgumentParser(prog="syncer", description="Synchronisation bidirectionnelle")
+    parser.add_argument("--log-level", choices=("debug", "info", "warning", "error"), default="info",
+                        help="Niveau du journal, sur la sortie d'erreur (défaut : info)")
+    parser.add_argument("--metrics", nargs="?", const=METRICS_REPORT, metavar="FICHIER",
+                        help=f"Mesure les entrées-sorties et les phases, rapport JSON dans FICHIER (défaut : {METRICS_REPORT})")
+    parser.add_argument("--profile", metavar="NOM",
+                        help=f"Profil dont les bases sont dans {PROFILES_DIR}/NOM (défaut : bases du répertoire courant)")
+    commands = parser.add_subparsers(dest="command")
+    for name, help_text in (("analyze", "Affiche le plan de synchronisation"),
+                            ("execute", "Analyse puis exécute le plan"),
+                            ("watch", "Surveille les deux répertoires et synchronise les changements")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument("source", nargs="?", help="Répertoire source (défaut : sync_config)")
+        command.add_argument("destination", nargs="?", help="Répertoire destination (défaut : sync_config)")
+        command.add_argument("--hash", action="store_true",
+                             help="Compare le contenu quand seule la date diffère (défaut : sync_config hash_mode)")
+        command.add_argument("--incremental", action="store_true",
+                             help="Ne relit pas les fichiers des répertoires inchangés depuis la dernière analyse "
+                                  "(défaut : sync_config incremental)")
+        command.add_argument("--scan-workers", nargs=2, type=int, metavar=("SOURCE", "DESTINATION"),
+                             help=f"Répertoires lus en parallèle de chaque côté (défaut : sync_config scan_workers_org "
+                                  f"et scan_workers_dst, sinon {SCAN_NETWORK_WORKERS} sur un montage réseau et 1 ailleurs)")
+        if name == "execute":
+            command.add_argument("--resume", action="store_true",
+                                 help="Reprend le plan enregistré sans nouvelle analyse")
+        if name in ("execute", "watch"):
+            command.add_argument("--dry-run", action="store_true", help="Simule sans modifier les fichiers")
+            command.add_argument("--workers", type=int, help="Actions exécutées en parallèle (défaut : sync_config)")
+            command.add_argument("--delta-min-size", type=int,
+                                 help=f"Copie différentielle des fichiers d'au moins N octets, par exemple {DELTA_MIN_SIZE} "
+                                      "(défaut : sync_config delta_min_size, 0 : désactivée)")
+            command.add_argument("--delta-in-place", action="store_true",
+                                 help="Réécrit sur place les blocs modifiés, sans fichier temporaire : une interruption "
+                                      "laisse un fichier incomplet (défaut : sync_config delta_in_place)")
+        if name == "watch":
+            command.add_argument("--poll", type=float, default=WATCH_POLL,
+                                 help=f"Secondes entre deux relectures des montages sans inotify (défaut : {WATCH_POLL})")
+    throttle = commands.add_parser("throttle", help="Affiche ou modifie les limites de débit, même pendant une exécution")
+    throttle.add_argument("--bytes", type=float, dest="max_bytes_per_sec", help="Octets par seconde (0 : illimité)")
+    throttle.add_argument("--ops", type=float, dest="max_ops_per_sec", help="Opérations par seconde (0 : illimité)")
+    throttle.add_argument("--latency", type=float, dest="target_latency_ms", help="Latence cible en ms (0 : désactivée)")
+    filters = commands.add_parser("filter", help="Affiche, ajoute ou retire des filtres d'exclusion")
+    filters.add_argument("--add", nargs=2, action="append", default=[], metavar=("TYPE", "VALEUR"),
+                         help=f"Ajoute un filtre, TYPE parmi {', '.join(FILTER_TYPES)} (par exemple glob node_modules/)")
+    filters.add_argument("--remove", nargs=2, action="append", default=[], metavar=("TYPE", "VALEUR"),
+                         help="Retire un filtre")
+    profiles = commands.add_parser("profile", help="Liste les profils, ou crée et modifie un profil")
+    profiles.add_argument("name", nargs="?", metavar="NOM", help="Profil à créer ou modifier")
+    profiles.add_argument("--source", help="Répertoire source du profil")
+    profiles.add_argument("--destination", help="Répertoire destination du profil")
+    run = commands.add_parser("run", help="Analyse et exécute plusieurs profils en parallèle")
+    run.add_argument("names", nargs="*", metavar="NOM", help="Profils à synchroniser (défaut : tous)")
+    run.add_argument("--processes", type=int, help="Profils synchronisés en même temps (défaut : nombre de processeurs)")
+    run.add_argument("--io-limit", type=int, default=PROFILE_IO_LIMIT,
+                     help=f"Opérations sur les fichiers en cours au plus, tous profils confondus (défaut : {PROFILE_IO_LIMIT}, "
+                          "0 : illimité)")
+    run.add_argument("--dry-run", action="store_true", help="Simule sans modifier les fichiers")
+    args = parser.parse_args(argv)
+    setup_logging(args.log_level)
+    METRICS.enabled = args.metrics is not None
+
+    if args.command is None:
+        # Lancer l'application
+        if Tk is None:
+            parser.error("Tkinter n'est pas disponible, utilisez les commandes analyze ou execute.")
+        root = Tk()
+        SyncerApp(root)
+        root.mainloop()
+        return 0
+
+    if args.command == "run":
+        names = args.names or list_profiles()
+        unknown = set(names) - set(list_profiles())
+        if unknown:
+            parser.error(f"Profils inconnus : {', '.join(sorted(unknown))}")
+        if not names:
+            parser.error("Aucun profil, créez-en avec la commande profile.")
+
+        def print_progress(name, phase, text):
+            print(f"[{name}] {phase} : {text}")
+
+        results = run_profiles(names, args.processes, args.io_limit, not args.dry_run, args.log_level, print_progress)
+        for name in names:
+            result = results.get(name)
+            if isinstance(result, dict):
+                print(f"{name}\t{result['entries']} entrées\t{result['executed']} lignes exécutées\t{result['elapsed_s']} s")
+            else:
+                print(f"{name}\terreur : {result}")
+        return 0 if all(isinstance(result, dict) for result in results.values()) else 1
+
+    try:
+        profile = open_profile(args.profile)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.command == "profile":
+        if args.name:
+            try:
+                profile = open_profile(args.name)
+            except ValueError as e:
+                parser.error(str(e))
+            with open_db(profile.config_db) as conn:
+                for key in ("source", "destination"):
+                    if getattr(args, key):
+                        conn.execute("REPLACE INTO sync_config (key, value) VALUES (?, ?)", (key, getattr(args, key)))
+        for name in [args.name] if args.name else list_profiles():
+            config_db = os.path.join(PROFILES_DIR, name, CONFIG_DB)
+            print(f"{name}\t{load_config('source', config_db) or '-'}\t{load_config('destination', config_db) or '-'}")
+        return 0
+
+    if args.command == "throttle":
+        with open_db(profile.config_db) as conn:
+            for key in THROTTLE_KEYS:
+                if getattr(args, key) is not None:
+                    conn.execute("REPLACE INTO sync_config (key, value) VALUES (?, ?)", (key, str(getattr(args, key))))
+        for key in THROTTLE_KEYS:
+            print(f"{key} = {load_config(key, profile.config_db) or 0}")
+        return 0
+
+    if args.command == "filter":
+        for filter_type, value in args.add + args.remove:
+            if filter_type not in FILTER_TYPES:
+                parser.error(f"Type de filtre inconnu : {filter_type}")
+            if filter_type.endswith("regex"):
+                try:
+                    re.compile(value)
+                except re.error as e:
+                    parser.error(f"Expression invalide {value} : {e}")
+        with open_db(profile.filter_db) as conn:
+            conn.executemany("INSERT OR IGNORE INTO filters (type, value) VALUES (?, ?)", args.add)
+            conn.executemany("DELETE FROM filters WHERE type = ? AND value = ?", args.remove)
+        for filter_type, values in load_filters(profile.filter_db).items():
+            for value in sorted(values):
+                print(f"{filter_type}\t{value}")
+        return 0
+
+    resume = getattr(args, "resume", False)
+    if resume:
+        roots = load_plan_roots(profile.analyse_db)
+        if roots is None:
+            parser.error("Aucun plan enregistré à reprendre.")
+        org_dir, dst_dir = roots
+    else:
+        org_dir, dst_dir = args.source, args.destination
+
+    try:
+        engine = profile_engine(profile, org_dir, dst_dir, go=not getattr(args, "dry_run", False),
+                                workers=getattr(args, "workers", None), hash_mode=args.hash or None,
+                                incremental=getattr(args, "incremental", False) or None,
+                                delta_min_size=getattr(args, "delta_min_size", None),
+                                delta_in_place=getattr(args, "delta_in_place", False) or None,
+                                scan_workers=tuple(args.scan_workers) if getattr(args, "scan_workers", None) else None)
+    except ValueError:
+        parser.error("Sélectionnez les répertoires source et destination.")
+    if args.command == "watch":
+        def print_action(row):
+            if row.action != "===":
+                print_plan_row(row)
+
+        try:
+            engine.watch(args.poll, on_row=print_action)
+        except KeyboardInterrupt:
+            print("Surveillance arrêtée")
+        if args.metrics:
+            METRICS.write_report(args.metrics, command=args.command, source=engine.org_dir, destination=engine.dst_dir)
+        return 0
+
+    if not resume:
+        # Le plan est enregistré dans sync_plan au fur et à mesure de l'analyse
+        for row in engine.plan(save=True):
+            print_plan_row(row)
+
+    if args.command == "execute":
+        count = engine.execute(iter_plan(profile.analyse_db))
+        print(f"{count} actions exécutées")
+    if args.metrics:
+        METRICS.write_report(args.metrics, command=args.command, source=engine.org_dir, destination=engine.dst_dir,
+                             progress=engine.progress)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
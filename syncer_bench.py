@@ -0,0 +1,350 @@
+"""Banc d'essai reproductible de Syncer.
+
+Génère une arborescence source synthétique, la synchronise vers une
+destination vide, y applique des modifications (fichiers modifiés, nouveaux,
+supprimés, renommés), puis mesure l'analyse et l'exécution de chaque phase
+sans interface graphique. Les résultats sont écrits en JSON, et peuvent être
+comparés à ceux d'une version précédente :
+
+    python syncer_bench.py --files 20000 --depth 4 --output avant.json
+    python syncer_bench.py --files 20000 --depth 4 --compare avant.json --threshold 0.1
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+import syncer
+
+BENCH_SEED = 42  # Graine par défaut : deux exécutions génèrent la même arborescence
+BENCH_MTIME = 1600000000  # Date de base des fichiers générés (secondes)
+BENCH_MIN_TIME = 0.05  # Durée en secondes en dessous de laquelle une mesure n'est pas comparée
+BENCH_COMPARED = ('analyze_s', 'execute_s', 'stat_calls', 'db_queries', 'bytes_copied')  # Mesures comparées
+BENCH_PHASES = ('initial', 'incremental', 'rescan')  # Copie complète, après modifications, sans modification
+
+
+class Counters:
+    """Compteurs d'appels système et de requêtes, incrémentés depuis plusieurs threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = dict.fromkeys(('stat_calls', 'db_queries', 'bytes_copied'), 0)
+
+    def add(self, key, value=1):
+        with self.lock:
+            self.values[key] += value
+
+    def reset(self):
+        with self.lock:
+            self.values = dict.fromkeys(self.values, 0)
+
+
+class CountingEntry:
+    """DirEntry dont les stat sont comptés"""
+
+    def __init__(self, entry, counters):
+        self._entry = entry
+        self._counters = counters
+
+    def stat(self, **kwargs):
+        self._counters.add('stat_calls')
+        return self._entry.stat(**kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self._entry, name)
+
+
+class CountingScandir:
+    """Itérateur os.scandir renvoyant des CountingEntry"""
+
+    def __init__(self, it, counters):
+        self._it = it
+        self._counters = counters
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._it.close()
+
+    def __iter__(self):
+        return (CountingEntry(entry, self._counters) for entry in self._it)
+
+
+@contextlib.contextmanager
+def instrument(counters):
+    """Compte les stat, les requêtes SQLite et les octets copiés pendant le bloc"""
+    original = (os.stat, os.scandir, sqlite3.connect, syncer.CopyBackend.copy, syncer.CopyBackend.copy_small)
+
+    def counting_stat(*args, **kwargs):
+        counters.add('stat_calls')
+        return original[0](*args, **kwargs)
+
+    def counting_scandir(*args, **kwargs):
+        return CountingScandir(original[1](*args, **kwargs), counters)
+
+    def counting_connect(*args, **kwargs):
+        conn = original[2](*args, **kwargs)
+        conn.set_trace_callback(lambda statement: counters.add('db_queries'))
+        return conn
+
+    def counting_copy(self, src_path, dst_path):
+        method = original[3](self, src_path, dst_path)
+        counters.add('bytes_copied', original[0](dst_path).st_size)
+        return method
+
+    def counting_copy_small(self, src_path, dst_path, size):
+        counters.add('bytes_copied', size)
+        return original[4](self, src_path, dst_path, size)
+
+    (os.stat, os.scandir, sqlite3.connect, syncer.CopyBackend.copy,
+     syncer.CopyBackend.copy_small) = (counting_stat, counting_scandir, counting_connect, counting_copy, counting_copy_small)
+    try:
+        yield counters
+    finally:
+        os.stat, os.scandir, sqlite3.connect, syncer.CopyBackend.copy, syncer.CopyBackend.copy_small = original
+
+
+def file_size(rng, size_min, size_max):
+    """Taille tirée selon une loi log-uniforme : beaucoup de petits fichiers, quelques gros"""
+    low = max(size_min, 1)  # 0 compte comme 1 octet
+    if size_max <= low:
+        return size_min
+    return int(low * (size_max / low) ** rng.random())
+
+
+def write_file(path, size, rng, mtime):
+    """Écrit un fichier de contenu pseudo-aléatoire reproductible"""
+    with open(path, 'wb') as f:
+        remaining = size
+        while remaining > 0:
+            chunk = min(remaining, syncer.HASH_CHUNK)
+            f.write(rng.randbytes(chunk))
+            remaining -= chunk
+    os.utime(path, ns=(mtime * 1000000000, mtime * 1000000000))
+
+
+def generate_tree(root, files, depth, fanout, size_min, size_max, rng):
+    """Génère l'arborescence source.
+
+    Args:
+        root (str): Répertoire à créer.
+        files (int): Nombre de fichiers.
+        depth (int): Profondeur des répertoires (0 : tous les fichiers à la racine).
+        fanout (int): Sous-répertoires par répertoire.
+        size_min, size_max (int): Bornes de la taille des fichiers, en octets.
+        rng (random.Random): Générateur, pour la reproductibilité.
+
+    Returns:
+        list: Chemins relatifs des fichiers créés.
+    """
+    dirs = [""]
+    level = [""]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"d{index:03d}") for parent in level for index in range(fanout)]
+        dirs.extend(level)
+    for rel_dir in dirs:
+        os.makedirs(os.path.join(root, rel_dir), exist_ok=True)
+
+    paths = []
+    for number in range(files):
+        rel_path = os.path.join(rng.choice(dirs), f"f{number:07d}.bin")
+        write_file(os.path.join(root, rel_path), file_size(rng, size_min, size_max), rng,
+                   BENCH_MTIME - rng.randrange(86400 * 365))
+        paths.append(rel_path)
+    return paths
+
+
+def mutate_tree(root, paths, args, rng):
+    """Applique les modifications de la phase incrémentale à l'arborescence source.
+
+    Returns:
+        dict: Nombre de fichiers modifiés, nouveaux, supprimés et renommés.
+    """
+    chosen = rng.sample(paths, len(paths))
+    counts = {}
+    for kind in ('modified', 'deleted', 'renamed'):
+        counts[kind] = int(len(paths) * getattr(args, kind))
+    modified = chosen[:counts['modified']]
+    deleted = chosen[counts['modified']:counts['modified'] + counts['deleted']]
+    renamed = chosen[counts['modified'] + counts['deleted']:counts['modified'] + counts['deleted'] + counts['renamed']]
+
+    for rel_path in modified:
+        path = os.path.join(root, rel_path)
+        write_file(path, os.path.getsize(path), rng, BENCH_MTIME + 3600)
+    for rel_path in deleted:
+        os.remove(os.path.join(root, rel_path))
+    for rel_path in renamed:
+        path = os.path.join(root, rel_path)
+        os.rename(path, os.path.join(os.path.dirname(path), "r" + os.path.basename(path)))
+
+    counts['new'] = int(len(paths) * args.new)
+    dirs = sorted({os.path.dirname(rel_path) for rel_path in paths})
+    for number in range(counts['new']):
+        write_file(os.path.join(root, rng.choice(dirs), f"n{number:07d}.bin"), file_size(rng, args.size_min, args.size_max),
+                   rng, BENCH_MTIME + 3600)
+    return counts
+
+
+def run_phase(engine, counters, verbose=False):
+    """Mesure l'analyse puis l'exécution du plan, comme execute en ligne de commande"""
+    with open(os.devnull, 'w') as devnull, contextlib.ExitStack() as stack:
+        if not verbose:
+            stack.enter_context(contextlib.redirect_stdout(devnull))
+        counters.reset()
+        started = time.perf_counter()
+        rows = list(engine.plan(save=True))
+        analyze_s = time.perf_counter() - started
+        analyze_counts = dict(counters.values)
+
+        copied = sum(engine.copier.counts.values())
+        started = time.perf_counter()
+        engine.execute(syncer.iter_plan(engine.analyse_db))
+        execute_s = time.perf_counter() - started
+        copied = sum(engine.copier.counts.values()) - copied
+
+    actions = {}
+    for row in rows:
+        actions[row.action] = actions.get(row.action, 0) + 1
+    return {
+        'analyze_s': round(analyze_s, 4),
+        'execute_s': round(execute_s, 4),
+        'rows': len(rows),
+        'actions': actions,
+        'entries_per_s': round(engine.progress['entries'] / analyze_s, 1) if analyze_s else 0.0,
+        'stat_calls': counters.values['stat_calls'],
+        'analyze_stat_calls': analyze_counts['stat_calls'],
+        'db_queries': counters.values['db_queries'],
+        'analyze_db_queries': analyze_counts['db_queries'],
+        'bytes_copied': counters.values['bytes_copied'],
+        'files_copied': copied,
+        'files_per_s': round(copied / execute_s, 1) if execute_s else 0.0,
+    }
+
+
+def run_once(args, work_dir):
+    """Un scénario complet dans work_dir : génération, puis les trois phases"""
+    rng = random.Random(args.seed)
+    org_dir = os.path.join(work_dir, 'org')
+    dst_dir = os.path.join(work_dir, 'dst')
+    analyse_db = os.path.join(work_dir, 'analyse.db')
+    config_db = os.path.join(work_dir, 'config.db')
+    os.makedirs(dst_dir)
+    paths = generate_tree(org_dir, args.files, args.depth, args.fanout, args.size_min, args.size_max, rng)
+    syncer.init_databases(analyse_db, config_db)
+
+    def engine():
+        return syncer.SyncEngine(org_dir, dst_dir, {'extension': set(), 'filename': set()}, analyse_db=analyse_db,
+                                 workers=args.workers, hash_mode=args.hash, incremental=args.incremental)
+
+    phases = {}
+    counters = Counters()
+    with instrument(counters):
+        phases['initial'] = run_phase(engine(), counters, args.verbose)
+        mutations = mutate_tree(org_dir, paths, args, rng)
+        phases['incremental'] = run_phase(engine(), counters, args.verbose)
+        phases['incremental']['mutations'] = mutations
+        phases['rescan'] = run_phase(engine(), counters, args.verbose)
+    return phases
+
+
+def run_benchmark(args):
+    """Exécute args.repeat scénarios ; garde la meilleure durée de chaque mesure"""
+    best = None
+    for _ in range(args.repeat):
+        work_dir = tempfile.mkdtemp(prefix='syncer_bench_', dir=args.dir)
+        try:
+            phases = run_once(args, work_dir)
+        finally:
+            if not args.keep:
+                shutil.rmtree(work_dir, ignore_errors=True)
+        if best is None:
+            best = phases
+        else:
+            for name, metrics in phases.items():
+                for key in ('analyze_s', 'execute_s'):
+                    best[name][key] = min(best[name][key], metrics[key])
+
+    return {
+        'params': {key: getattr(args, key) for key in ('files', 'depth', 'fanout', 'size_min', 'size_max', 'modified', 'new',
+                                                         'deleted', 'renamed', 'workers', 'hash', 'incremental', 'seed',
+                                                         'repeat')},
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'phases': best,
+    }
+
+
+def compare(result, baseline, threshold):
+    """Liste les mesures en hausse de plus de threshold (fraction) par rapport à baseline"""
+    if baseline.get('params') != result['params']:
+        print("Attention : paramètres différents de ceux de la référence", file=sys.stderr)
+    regressions = []
+    for phase in BENCH_PHASES:
+        for key in BENCH_COMPARED:
+            old = baseline.get('phases', {}).get(phase, {}).get(key)
+            new = result['phases'][phase][key]
+            if old is None or (key.endswith('_s') and max(old, new) < BENCH_MIN_TIME):
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(f"{phase}.{key} : {old} -> {new} (+{(new / old - 1) * 100 if old else float('inf'):.1f} %)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="syncer_bench", description="Banc d'essai de l'analyse et de l'exécution")
+    parser.add_argument("--files", type=int, default=10000, help="Nombre de fichiers générés (défaut : 10000)")
+    parser.add_argument("--depth", type=int, default=3, help="Profondeur des répertoires (défaut : 3)")
+    parser.add_argument("--fanout", type=int, default=8, help="Sous-répertoires par répertoire (défaut : 8)")
+    parser.add_argument("--size-min", type=int, default=0, help="Taille minimale des fichiers en octets (défaut : 0)")
+    parser.add_argument("--size-max", type=int, default=64 * 1024, help="Taille maximale des fichiers (défaut : 65536)")
+    parser.add_argument("--modified", type=float, default=0.05, help="Part des fichiers modifiés (défaut : 0.05)")
+    parser.add_argument("--new", type=float, default=0.02, help="Part de fichiers nouveaux (défaut : 0.02)")
+    parser.add_argument("--deleted", type=float, default=0.02, help="Part des fichiers supprimés (défaut : 0.02)")
+    parser.add_argument("--renamed", type=float, default=0.01, help="Part des fichiers renommés (défaut : 0.01)")
+    parser.add_argument("--workers", type=int, default=syncer.WORKERS, help=f"Workers d'exécution (défaut : {syncer.WORKERS})")
+    parser.add_argument("--hash", action="store_true", help="Mode empreinte")
+    parser.add_argument("--incremental", action="store_true", help="Analyse incrémentale")
+    parser.add_argument("--seed", type=int, default=BENCH_SEED, help=f"Graine du générateur (défaut : {BENCH_SEED})")
+    parser.add_argument("--repeat", type=int, default=1, help="Nombre de scénarios, la meilleure durée est gardée")
+    parser.add_argument("--dir", help="Répertoire des arborescences générées (défaut : répertoire temporaire)")
+    parser.add_argument("--keep", action="store_true", help="Garde les arborescences générées")
+    parser.add_argument("--verbose", action="store_true", help="Affiche la sortie du moteur")
+    parser.add_argument("--output", help="Fichier JSON des résultats (défaut : sortie standard)")
+    parser.add_argument("--compare", help="Fichier JSON de référence")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Hausse tolérée par rapport à la référence, en fraction (défaut : 0.1)")
+    args = parser.parse_args(argv)
+    if args.modified + args.deleted + args.renamed > 1:
+        parser.error("La somme des parts modifiées, supprimées et renommées dépasse 1.")
+
+    result = run_benchmark(args)
+    text = json.dumps(result, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(result, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"Régression {regression}", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"Aucune régression au-delà de {args.threshold * 100:.0f} %", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
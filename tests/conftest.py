@@ -0,0 +1,30 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import syncer  # noqa: E402
+
+
+@pytest.fixture
+def make_engine(tmp_path):
+    """SyncEngine entre tmp_path/org et tmp_path/dst, avec des bases dans tmp_path"""
+    analyse_db = str(tmp_path / "analyse.db")
+    config_db = str(tmp_path / "config.db")
+    syncer.init_databases(analyse_db, config_db)
+
+    def make(filters=None, **options):
+        return syncer.SyncEngine(str(tmp_path / "org"), str(tmp_path / "dst"), filters or {}, analyse_db=analyse_db,
+                                 config_db=config_db, **options)
+    return make
+
+
+def write(path, content, mtime_ns=None):
+    """Crée un fichier (et ses répertoires), avec une date de modification donnée"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(content)
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
@@ -0,0 +1,133 @@
+import errno
+import os
+import random
+
+import pytest
+
+import syncer
+
+CHUNK = 4096
+
+
+@pytest.fixture
+def resumable(monkeypatch):
+    """Copies reprenables dès quelques blocs de CHUNK octets"""
+    monkeypatch.setattr(syncer, "COPY_CHUNK", CHUNK)
+    monkeypatch.setattr(syncer, "COPY_RESUME_MIN_SIZE", CHUNK)
+    monkeypatch.setattr(syncer, "HASH_CHUNK", 1024)
+
+
+def source(tmp_path, size):
+    path = tmp_path / "src.bin"
+    path.write_bytes(random.Random(size).randbytes(size))
+    return path
+
+
+def failing_after(backend, calls):
+    """copy_range du backend échoue (EIO) après calls appels réussis ; pas de reflink"""
+    copy_range = backend.copy_range
+    done = []
+
+    def failing(*args):
+        if len(done) >= calls:
+            raise OSError(errno.EIO, "erreur d'entrée-sortie")
+        done.append(args)
+        return copy_range(*args)
+
+    def no_reflink(src, dst):
+        raise OSError(errno.ENOTSUP, "pas de reflink")
+    backend.copy_range = failing
+    backend.copy_reflink = no_reflink
+    return backend
+
+
+def test_failed_copy_removes_its_temp_file(tmp_path):
+    src = source(tmp_path, 1000)
+    backend = failing_after(syncer.CopyBackend(), 0)
+
+    with pytest.raises(OSError):
+        backend.copy(str(src), str(tmp_path / "dst.bin"))
+
+    assert os.listdir(tmp_path) == ["src.bin"]
+
+
+def test_failed_resumable_copy_keeps_its_temp_file_and_resumes(tmp_path, resumable):
+    src = source(tmp_path, 5 * CHUNK)
+    os.mkdir(tmp_path / "dst")
+    dst = str(tmp_path / "dst/dst.bin")
+    db = str(tmp_path / "analyse.db")
+
+    with pytest.raises(OSError):
+        failing_after(syncer.CopyBackend(db), 3).copy(str(src), dst)
+
+    tmp = syncer.CopyBackend.temp_path(dst)
+    assert os.listdir(tmp_path / "dst") == [os.path.basename(tmp)]
+    backend = syncer.CopyBackend(db)
+    assert backend.resume_offset(str(src), os.stat(src), dst, tmp) == 3 * CHUNK
+
+    backend.copy(str(src), dst)
+
+    assert open(dst, 'rb').read() == src.read_bytes()
+    assert os.listdir(tmp_path / "dst") == ["dst.bin"]
+
+
+def test_failed_delta_copy_removes_its_temp_file(tmp_path, monkeypatch):
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    src.write_bytes(random.Random(1).randbytes(1000))
+    dst.write_bytes(random.Random(2).randbytes(1000))
+    transfer = syncer.DeltaTransfer(str(tmp_path / "analyse.db"), min_size=0, block_size=64)
+
+    def failing(*args):
+        raise OSError(errno.EIO, "erreur d'entrée-sortie")
+    monkeypatch.setattr(transfer, "copy_range", failing)
+
+    with pytest.raises(OSError):
+        transfer.copy(str(src), str(dst))
+
+    assert sorted(os.listdir(tmp_path)) == ["analyse.db", "dst.bin", "src.bin"]
+    assert dst.read_bytes() == random.Random(2).randbytes(1000)
+
+
+def interrupted(tmp_path, copied, size=5 * CHUNK):
+    """Copie interrompue après copied octets : fichier temporaire et ligne copy_progress"""
+    src = source(tmp_path, size)
+    dst = str(tmp_path / "dst.bin")
+    tmp = syncer.CopyBackend.temp_path(dst)
+    with open(tmp, 'wb') as f:
+        f.write(src.read_bytes()[:copied])
+    backend = syncer.CopyBackend(str(tmp_path / "analyse.db"))
+    backend.save_progress(str(src), os.stat(src), dst, copied)
+    return backend, src, dst, tmp
+
+
+def test_resume_offset_stops_at_a_whole_chunk(tmp_path, resumable):
+    backend, src, dst, tmp = interrupted(tmp_path, 3 * CHUNK + 100)
+
+    assert backend.resume_offset(str(src), os.stat(src), dst, tmp) == 3 * CHUNK
+
+
+def test_resume_offset_is_limited_by_the_temp_file(tmp_path, resumable):
+    backend, src, dst, tmp = interrupted(tmp_path, 2 * CHUNK)
+    backend.save_progress(str(src), os.stat(src), dst, 4 * CHUNK)  # Progression enregistrée, écriture perdue
+
+    assert backend.resume_offset(str(src), os.stat(src), dst, tmp) == 2 * CHUNK
+    os.remove(tmp)
+    assert backend.resume_offset(str(src), os.stat(src), dst, tmp) == 0
+
+
+def test_resume_offset_backs_off_corrupted_chunks(tmp_path, resumable):
+    backend, src, dst, tmp = interrupted(tmp_path, 4 * CHUNK)
+    with open(tmp, 'r+b') as f:
+        f.seek(2 * CHUNK + 10)
+        f.write(b"\0" * 5000)  # Fin du troisième bloc et début du quatrième
+
+    assert backend.resume_offset(str(src), os.stat(src), dst, tmp) == 2 * CHUNK
+
+
+def test_changed_source_restarts_the_copy(tmp_path, resumable):
+    backend, src, dst, tmp = interrupted(tmp_path, 3 * CHUNK)
+    st = os.stat(src)
+    os.utime(src, ns=(st.st_atime_ns, st.st_mtime_ns + 1))
+
+    assert backend.resume_offset(str(src), os.stat(src), dst, tmp) == 0
+    assert backend.resume_offset(str(src), st, str(tmp_path / "other.bin"), tmp) == 0
@@ -0,0 +1,115 @@
+import os
+import random
+
+import pytest
+
+import syncer
+
+BLOCK = 64
+
+
+@pytest.fixture
+def transfer(tmp_path):
+    return syncer.DeltaTransfer(str(tmp_path / "analyse.db"), min_size=0, block_size=BLOCK)
+
+
+def data(size, seed):
+    return random.Random(seed).randbytes(size)
+
+
+def sync(tmp_path, transfer, old, new):
+    """Copie différentielle de new sur old ; rend les opérations calculées pour la copie"""
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    src.write_bytes(new)
+    dst.write_bytes(old)
+    ops, _ = transfer.delta(str(src), transfer.signature(str(dst)))
+    assert transfer.copy(str(src), str(dst))
+    assert dst.read_bytes() == new
+    assert os.stat(dst).st_mtime_ns == os.stat(src).st_mtime_ns
+    assert sorted(os.listdir(tmp_path)) == ["analyse.db", "dst.bin", "src.bin"]  # Pas de fichier temporaire restant
+    return ops
+
+
+def copied(ops):
+    return sum(1 for op in ops if op[0] == "copy")
+
+
+def literal(ops):
+    return sum(op[2] for op in ops if op[0] == "data")
+
+
+def test_unchanged_file_copies_every_block(tmp_path, transfer):
+    old = data(10 * BLOCK, 1)
+    ops = sync(tmp_path, transfer, old, old)
+    assert copied(ops) == 10 and literal(ops) == 0
+
+
+def test_insert_at_block_boundary(tmp_path, transfer):
+    old = data(10 * BLOCK, 1)
+    new = old[:3 * BLOCK] + data(BLOCK, 2) + old[3 * BLOCK:]
+    ops = sync(tmp_path, transfer, old, new)
+    assert copied(ops) == 10 and literal(ops) == BLOCK
+
+
+def test_insert_inside_a_block(tmp_path, transfer):
+    old = data(10 * BLOCK, 1)
+    new = old[:3 * BLOCK + 5] + b"inserted" + old[3 * BLOCK + 5:]
+    ops = sync(tmp_path, transfer, old, new)
+    assert copied(ops) == 9 and literal(ops) == BLOCK + len(b"inserted")
+
+
+def test_delete_at_block_boundary(tmp_path, transfer):
+    old = data(10 * BLOCK, 1)
+    new = old[:4 * BLOCK] + old[5 * BLOCK:]
+    ops = sync(tmp_path, transfer, old, new)
+    assert copied(ops) == 9 and literal(ops) == 0
+
+
+def test_delete_inside_a_block(tmp_path, transfer):
+    old = data(10 * BLOCK, 1)
+    new = old[:4 * BLOCK + 10] + old[4 * BLOCK + 20:]
+    ops = sync(tmp_path, transfer, old, new)
+    assert copied(ops) == 9 and literal(ops) == BLOCK - 10
+
+
+def test_modified_tail_block(tmp_path, transfer):
+    old = data(10 * BLOCK + 17, 1)
+    new = old[:-5] + b"12345"
+    ops = sync(tmp_path, transfer, old, new)
+    assert copied(ops) == 10 and literal(ops) == 17
+
+
+def test_truncated_and_extended_files(tmp_path, transfer):
+    old = data(10 * BLOCK + 17, 1)
+    sync(tmp_path, transfer, old, old[:6 * BLOCK + 3])
+    sync(tmp_path, transfer, old, old + data(3 * BLOCK + 1, 2))
+
+
+@pytest.mark.parametrize("old, new", [(b"", b""), (b"", data(3 * BLOCK, 1)), (data(3 * BLOCK, 1), b"")])
+def test_empty_files(tmp_path, transfer, old, new):
+    sync(tmp_path, transfer, old, new)
+
+
+def test_full_mismatch(tmp_path, transfer):
+    ops = sync(tmp_path, transfer, data(10 * BLOCK, 1), data(10 * BLOCK + 3, 2))
+    assert copied(ops) == 0 and literal(ops) == 10 * BLOCK + 3
+
+
+def test_in_place_rewrites_only_modified_blocks(tmp_path):
+    transfer = syncer.DeltaTransfer(str(tmp_path / "analyse.db"), min_size=0, block_size=BLOCK, in_place=True)
+    old = data(10 * BLOCK, 1)
+    new = old[:2 * BLOCK] + data(BLOCK, 2) + old[3 * BLOCK:]
+    src, dst = tmp_path / "src.bin", tmp_path / "dst.bin"
+    src.write_bytes(new)
+    dst.write_bytes(old)
+    inode = os.stat(dst).st_ino
+    assert transfer.copy(str(src), str(dst))
+    assert dst.read_bytes() == new and os.stat(dst).st_ino == inode
+
+
+def test_small_or_missing_target_needs_a_full_copy(tmp_path):
+    transfer = syncer.DeltaTransfer(str(tmp_path / "analyse.db"), min_size=1024, block_size=BLOCK)
+    (tmp_path / "src.bin").write_bytes(data(100, 1))
+    (tmp_path / "dst.bin").write_bytes(data(100, 2))
+    assert not transfer.copy(str(tmp_path / "src.bin"), str(tmp_path / "dst.bin"))
+    assert not transfer.copy(str(tmp_path / "src.bin"), str(tmp_path / "absent.bin"))
@@ -0,0 +1,102 @@
+import re
+
+import pytest
+
+import syncer
+from conftest import write
+
+
+def glob_matches(pattern, path):
+    regex, dir_only = syncer.glob_to_regex(pattern)
+    return re.search(regex, path) is not None
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ("*.tmp", "a.tmp", True),
+    ("*.tmp", "sub/dir/a.tmp", True),
+    ("*.tmp", "a.tmp.bak", False),
+    ("?.txt", "a.txt", True),
+    ("?.txt", "ab.txt", False),
+    ("*.txt", "sub/a.txt", True),
+    ("sub*", "sub/a.txt", False),
+    ("file[0-9].log", "file7.log", True),
+    ("file[0-9].log", "filex.log", False),
+    ("file[!0-9].log", "filex.log", True),
+    ("file[!0-9].log", "file7.log", False),
+    ("[]x].txt", "].txt", True),
+    ("[abc", "[abc", True),
+    ("a.b", "axb", False),
+    ("**/cache", "cache", True),
+    ("**/cache", "a/b/cache", True),
+    ("logs/**", "logs/2024/app.log", True),
+    ("logs/**", "old/logs/app.log", False),
+    ("a/**/z", "a/z", True),
+    ("a/**/z", "a/b/c/z", True),
+    ("a/*/z", "a/b/c/z", False),
+])
+def test_glob_to_regex(pattern, path, expected):
+    assert glob_matches(pattern, path) is expected
+
+
+@pytest.mark.parametrize("pattern, path, expected", [
+    ("/build", "build", True),
+    ("/build", "src/build", False),
+    ("build", "src/build", True),
+    ("doc/api", "doc/api", True),
+    ("doc/api", "src/doc/api", False),
+])
+def test_glob_anchoring(pattern, path, expected):
+    assert glob_matches(pattern, path) is expected
+
+
+def test_glob_dir_only():
+    assert syncer.glob_to_regex("build/")[1] is True
+    assert syncer.glob_to_regex("build")[1] is False
+
+
+def test_matcher_names_and_extensions():
+    matcher = syncer.FilterMatcher({'filename': ["Thumbs.db"], 'extension': [".bak"]})
+
+    assert matcher.excluded("a/Thumbs.db")
+    assert matcher.excluded("a/b/c.bak")
+    assert not matcher.excluded("a/c.bak.txt")
+    assert not matcher.excluded("a/thumbs.db")
+
+
+def test_matcher_dir_only_rule():
+    matcher = syncer.FilterMatcher({'glob': ["build/"]})
+
+    assert matcher.excluded("src/build", is_dir=True)
+    assert not matcher.excluded("src/build", is_dir=False)
+
+
+def test_matcher_include_overrides_exclude():
+    matcher = syncer.FilterMatcher({'glob': ["*.log"], 'include_glob': ["/keep/*.log"],
+                                    'regex': [r"\.cache$"], 'include_regex': [r"^important\.cache$"]})
+
+    assert matcher.excluded("app.log")
+    assert matcher.excluded("other/keep/app.log")
+    assert not matcher.excluded("keep/app.log")
+    assert matcher.excluded("x.cache")
+    assert not matcher.excluded("important.cache")
+
+
+def test_matcher_invalid_regex_is_ignored():
+    matcher = syncer.FilterMatcher({'regex': ["(", r"\.o$"]})
+
+    assert matcher.excluded("main.o")
+    assert not matcher.excluded("main.c")
+
+
+def test_excluded_directory_prunes_its_subtree(tmp_path, make_engine):
+    write(tmp_path / "org/build/out/a.o", b"x")
+    write(tmp_path / "org/build/keep.txt", b"x")
+    write(tmp_path / "org/src/main.c", b"x")
+    (tmp_path / "dst").mkdir()
+    engine = make_engine({'glob': ["build/"], 'include_glob': ["keep.txt"]})
+
+    rows = {row.org_path: row.action for row in engine.plan()}
+
+    assert rows[str(tmp_path / "org/build")] == "-!-"
+    assert not [path for path in rows if path.startswith(str(tmp_path / "org/build") + "/")]
+    assert ">>>" in (rows.get(str(tmp_path / "org/src")), rows.get(str(tmp_path / "org/src/main.c")))
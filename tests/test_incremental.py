@@ -0,0 +1,92 @@
+import os
+
+import syncer
+from conftest import write
+
+MTIME = 1_600_000_000_000_000_000
+
+
+def same_files(tmp_path, files):
+    for rel_path in files:
+        for side in ("org", "dst"):
+            write(tmp_path / side / rel_path, b"x", MTIME)
+
+
+def run(engine):
+    list(engine.plan(save=True))
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+    return engine
+
+
+def analyse(make_engine):
+    engine = make_engine(incremental=True)
+    rows = list(engine.plan(save=True))
+    return engine, rows
+
+
+def test_unchanged_directories_are_skipped_after_a_sync(tmp_path, make_engine):
+    same_files(tmp_path, ["a/1.txt", "a/2.txt", "b/3.txt"])
+    run(make_engine(incremental=True))
+
+    engine, rows = analyse(make_engine)
+
+    assert engine.progress['skipped'] == 3
+    assert not [row for row in rows if row.org_path.endswith(".txt")]
+
+
+def test_new_file_makes_its_directory_read_again(tmp_path, make_engine):
+    same_files(tmp_path, ["a/1.txt", "b/2.txt"])
+    run(make_engine(incremental=True))
+    write(tmp_path / "org/a/new.txt", b"new", MTIME)
+
+    engine, rows = analyse(make_engine)
+
+    assert {os.path.basename(row.org_path): row.action for row in rows if row.org_path.endswith(".txt")} == {
+        "1.txt": "===", "new.txt": ">>>"}
+    assert engine.progress['skipped'] == 1  # b/2.txt
+
+
+def test_analysis_without_execution_skips_nothing(tmp_path, make_engine):
+    same_files(tmp_path, ["a/1.txt", "b/2.txt"])
+    list(make_engine(incremental=True).plan(save=True))
+
+    engine, rows = analyse(make_engine)
+
+    assert engine.progress['skipped'] == 0
+    assert syncer.count_plan(engine.analyse_db) == len(rows)
+
+
+def test_directory_with_a_failed_row_is_not_skipped(tmp_path, make_engine, monkeypatch):
+    same_files(tmp_path, ["a/1.txt", "b/2.txt"])
+    engine = make_engine(incremental=True)
+    list(engine.plan(save=True))
+    run_row = syncer.SyncEngine.run_row
+    monkeypatch.setattr(syncer.SyncEngine, "run_row",
+                        lambda self, row, is_dir: False if row.org_path.endswith("1.txt") else run_row(self, row, is_dir))
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+    monkeypatch.undo()
+
+    engine, rows = analyse(make_engine)
+
+    assert engine.progress['skipped'] == 1  # b/2.txt seulement
+    assert [os.path.basename(row.org_path) for row in rows if row.org_path.endswith(".txt")] == ["1.txt"]
+
+
+def test_dry_run_skips_nothing(tmp_path, make_engine):
+    same_files(tmp_path, ["a/1.txt"])
+    run(make_engine(incremental=True, go=False))
+
+    engine, rows = analyse(make_engine)
+
+    assert engine.progress['skipped'] == 0
+
+
+def test_cleared_analysis_skips_nothing(tmp_path, make_engine):
+    same_files(tmp_path, ["a/1.txt", "b/2.txt"])
+    run(make_engine(incremental=True))
+
+    syncer.clear_analysis_db(make_engine().analyse_db)
+    engine, rows = analyse(make_engine)
+
+    assert engine.progress['skipped'] == 0
+    assert {os.path.basename(row.org_path) for row in rows} >= {"1.txt", "2.txt"}
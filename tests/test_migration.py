@@ -0,0 +1,57 @@
+import os
+import sqlite3
+from datetime import datetime
+
+import syncer
+
+TIME = "21/03/04 05:06:07"
+MTIME_NS = int(datetime(2021, 3, 4, 5, 6, 7).timestamp()) * 1000000000
+
+
+def legacy_databases(tmp_path, source, destination, paths):
+    """Bases d'une version précédente : table sync_analysis (chemins absolus) et source / destination enregistrées"""
+    analyse_db, config_db = str(tmp_path / "analyse.db"), str(tmp_path / "config.db")
+    with sqlite3.connect(analyse_db) as conn:
+        conn.execute("CREATE TABLE sync_analysis (path TEXT PRIMARY KEY, time TIMESTAMP)")
+        conn.executemany("INSERT INTO sync_analysis (path, time) VALUES (?, ?)", ((path, TIME) for path in paths))
+    with sqlite3.connect(config_db) as conn:
+        conn.execute("CREATE TABLE sync_config (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT INTO sync_config (key, value) VALUES (?, ?)",
+                         (("source", source), ("destination", destination)))
+    return analyse_db, config_db
+
+
+def migrated_states(analyse_db):
+    with sqlite3.connect(analyse_db) as conn:
+        assert not conn.execute("SELECT name FROM sqlite_master WHERE name = 'sync_analysis'").fetchall()
+        roots = conn.execute("SELECT id, org_dir, dst_dir FROM sync_roots").fetchall()
+        states = {path: values for pair, path, *values in conn.execute(
+            "SELECT pair, path, org_mtime_ns, org_size, dst_mtime_ns, dst_size FROM sync_state")}
+    return roots, states
+
+
+def test_legacy_sync_analysis_is_converted(tmp_path):
+    org, dst = str(tmp_path / "org"), str(tmp_path / "dst")
+    analyse_db, config_db = legacy_databases(tmp_path, org + os.sep, dst, [
+        os.path.join(org, "a.txt"), os.path.join(dst, "a.txt"), os.path.join(org, "sub", "b.txt"),
+        org + "-other" + os.sep + "c.txt", os.path.join(str(tmp_path), "elsewhere.txt")])
+
+    syncer.init_databases(analyse_db, config_db)
+
+    roots, states = migrated_states(analyse_db)
+    assert [root[1:] for root in roots] == [(org, dst)]
+    assert states == {"a.txt": [MTIME_NS, None, MTIME_NS, None],
+                      os.path.join("sub", "b.txt"): [MTIME_NS, None, None, None]}
+
+
+def test_legacy_sync_analysis_with_filesystem_root(tmp_path):
+    dst = str(tmp_path / "dst")
+    outside = os.path.join(os.sep, "srv", "a.txt")
+    analyse_db, config_db = legacy_databases(tmp_path, os.sep, dst, [outside, os.path.join(dst, "b.txt")])
+
+    syncer.init_databases(analyse_db, config_db)
+
+    roots, states = migrated_states(analyse_db)
+    assert [root[1:] for root in roots] == [(os.sep, dst)]
+    assert states[os.path.join("srv", "a.txt")] == [MTIME_NS, None, None, None]
+    assert states["b.txt"] == [None, None, MTIME_NS, None]
@@ -0,0 +1,108 @@
+import os
+
+import pytest
+
+import syncer
+from conftest import write
+
+MTIME = 1_600_000_000_123_456_789
+
+
+def run(engine):
+    rows = list(engine.plan(save=True))
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+    return rows
+
+
+def synced(tmp_path, make_engine, files):
+    """Synchronise une première fois les fichiers {chemin relatif: contenu} créés dans la source"""
+    for rel_path, content in files.items():
+        write(tmp_path / "org" / rel_path, content, MTIME)
+    os.makedirs(tmp_path / "dst", exist_ok=True)
+    run(make_engine())
+
+
+def test_same_size_and_mtime_different_content_is_not_a_move(tmp_path, make_engine):
+    synced(tmp_path, make_engine, {"old/a.bin": b"AAAA"})
+    os.remove(tmp_path / "org/old/a.bin")
+    write(tmp_path / "org/new/b.bin", b"BBBB", MTIME)
+
+    rows = run(make_engine())
+
+    assert not [row for row in rows if row.move_from]
+    assert (tmp_path / "dst/new/b.bin").read_bytes() == b"BBBB"
+    assert not (tmp_path / "dst/old/a.bin").exists()
+    assert {row.action for row in make_engine().plan()} == {"==="}
+
+
+def test_same_second_different_nanoseconds_is_not_a_move(tmp_path, make_engine):
+    synced(tmp_path, make_engine, {"old/a.bin": b"AAAA"})
+    os.remove(tmp_path / "org/old/a.bin")
+    write(tmp_path / "org/new/a.bin", b"AAAA", MTIME + 1000)
+
+    assert not [row for row in make_engine().plan() if row.move_from]
+
+
+def test_identical_file_is_moved(tmp_path, make_engine):
+    synced(tmp_path, make_engine, {"old/a.bin": b"AAAA"})
+    os.renames(tmp_path / "org/old/a.bin", tmp_path / "org/new/b.bin")
+
+    rows = run(make_engine())
+
+    assert [row.action for row in rows if row.move_from] == ["~~>"]
+    assert (tmp_path / "dst/new/b.bin").read_bytes() == b"AAAA"
+    assert not (tmp_path / "dst/old/a.bin").exists()
+
+
+def test_identical_file_is_moved_in_hash_mode(tmp_path, make_engine):
+    synced(tmp_path, make_engine, {"old/a.bin": b"AAAA"})
+    os.renames(tmp_path / "org/old/a.bin", tmp_path / "org/new/b.bin")
+
+    assert [row.action for row in make_engine(hash_mode=True).plan() if row.move_from] == ["~~>"]
+
+
+def test_directory_with_a_different_file_is_not_moved(tmp_path, make_engine):
+    synced(tmp_path, make_engine, {"original/same.txt": b"same", "original/other.txt": b"AAAA"})
+    os.rename(tmp_path / "org/original", tmp_path / "org/renamed")
+    write(tmp_path / "org/renamed/other.txt", b"BBBB", MTIME)
+
+    rows = run(make_engine())
+
+    assert not [row for row in rows if row.move_from and row.action == "~~>" and row.org_name == "renamed"]
+    assert (tmp_path / "dst/renamed/other.txt").read_bytes() == b"BBBB"
+    assert (tmp_path / "dst/renamed/same.txt").read_bytes() == b"same"
+    assert not (tmp_path / "dst/original").exists()
+
+
+def test_changed_move_is_copied_and_keeps_the_old_file(tmp_path, make_engine):
+    synced(tmp_path, make_engine, {"d/a.bin": b"AAAA"})
+    os.rename(tmp_path / "org/d/a.bin", tmp_path / "org/d/b.bin")
+    engine = make_engine()
+    move = next(row for row in engine.plan(save=True) if row.move_from)
+
+    row = syncer.change_plan_action(move, ">>>")
+    syncer.set_plan_action(row, engine.analyse_db)
+
+    assert (row.move_from, row.dst_name, row.dst_mtime) == (None, "", None)
+    assert [saved for saved in syncer.iter_plan(engine.analyse_db) if saved.id == row.id] == [row]
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+    assert (tmp_path / "dst/d/b.bin").read_bytes() == b"AAAA"
+    assert (tmp_path / "dst/d/a.bin").read_bytes() == b"AAAA"
+
+
+def test_move_action_only_for_detected_moves():
+    row = syncer.PlanRow("/org/a", "a", MTIME, ">>>", "/dst/a", "", None, 1)
+
+    with pytest.raises(ValueError):
+        syncer.change_plan_action(row, "~~>")
+    move = row._replace(action="~~>", dst_name="old", dst_mtime=MTIME, move_from="/dst/old")
+    assert syncer.change_plan_action(move, "~~>") is move
+
+
+def test_move_row_without_origin_is_skipped(tmp_path, make_engine):
+    write(tmp_path / "org/a.bin", b"AAAA", MTIME)
+    os.makedirs(tmp_path / "dst")
+    row = syncer.PlanRow(str(tmp_path / "org/a.bin"), "a.bin", MTIME, "~~>", str(tmp_path / "dst/a.bin"), "", None)
+
+    assert make_engine().run_row(row, False) is False
+    assert not (tmp_path / "dst/a.bin").exists()
@@ -0,0 +1,38 @@
+import syncer
+from conftest import write
+
+
+def files(tmp_path, count):
+    for i in range(count):
+        write(tmp_path / f"org/d{i}/f.txt", b"x")
+        write(tmp_path / f"dst/d{i}/f.txt", b"yy")
+
+
+def test_complete_plan_is_executable(tmp_path, make_engine):
+    files(tmp_path, 3)
+    engine = make_engine()
+
+    list(engine.plan(save=True))
+
+    assert syncer.load_plan_roots(engine.analyse_db) == (engine.org_dir, engine.dst_dir)
+
+
+def test_cancelled_plan_is_not_executable(tmp_path, make_engine):
+    files(tmp_path, 3)
+    engine = make_engine()
+
+    for row in engine.plan(save=True):
+        engine.cancel()
+
+    assert syncer.load_plan_roots(engine.analyse_db) is None
+
+
+def test_interrupted_plan_is_not_executable(tmp_path, make_engine):
+    files(tmp_path, 3)
+    engine = make_engine()
+
+    rows = engine.plan(save=True)
+    next(rows)
+    rows.close()
+
+    assert syncer.load_plan_roots(engine.analyse_db) is None
@@ -0,0 +1,165 @@
+import random
+
+import pytest
+
+import syncer
+
+
+def plan_rows(count, start_id=1):
+    return [syncer.PlanRow(f"/org/d{i % 7}/f{i}.txt", f"f{i}.txt", i, ">>>", f"/dst/d{i % 7}/f{i}.txt", None, None,
+                           start_id + i)
+            for i in range(count)]
+
+
+def test_find_by_id():
+    store = syncer.PlanStore()
+    rows = plan_rows(50)
+    rows[10] = rows[10]._replace(move_from="/org/old.txt", action="~~>")  # Ligne gardée telle quelle
+    store.extend(rows)
+
+    assert [store.find(row.id) for row in rows] == list(range(50))
+    assert store.find(999) is None
+
+
+def test_find_row_without_id():
+    store = syncer.PlanStore()
+    store.extend(plan_rows(5))
+    store.append(syncer.PlanRow("/org/x", "x", None, ">>>", "/dst/x", None, None))
+    store.extend(plan_rows(5, start_id=100))
+
+    assert store.find(102) == 8
+
+
+def test_remove_out_of_order_keeps_remaining_order():
+    store = syncer.PlanStore()
+    rows = plan_rows(300)
+    store.extend(rows)
+    remaining = list(rows)
+
+    for row in random.Random(1).sample(rows, 200):
+        store.remove(store.find(row.id))
+        remaining.remove(row)
+        assert store.remaining() == len(remaining)
+
+    assert list(store) == remaining
+    for start in (0, 1, 37, 99, 100):
+        assert [store[index] for index in store.live_indices(start, 20)] == remaining[start:start + 20]
+
+
+def test_remove_keeps_indices():
+    store = syncer.PlanStore()
+    rows = plan_rows(10)
+    store.extend(rows)
+
+    store.remove(0)
+    store.remove(1)
+    store.remove(1)  # Déjà retirée
+
+    assert store.remaining() == 8
+    assert store[5] == rows[5]
+    assert list(store.live_indices(0, 3)) == [2, 3, 4]
+
+
+@pytest.mark.parametrize("chunk", [1, 4, 65536])
+def test_live_indices_across_chunks(monkeypatch, chunk):
+    monkeypatch.setattr(syncer, "PLAN_SCAN_CHUNK", chunk)
+    store = syncer.PlanStore()
+    store.extend(plan_rows(40))
+    for index in range(0, 40, 3):
+        store.remove(index)
+    live = [index for index in range(40) if index % 3]
+
+    for start in range(len(live) + 1):
+        assert list(store.live_indices(start, 5)) == live[start:start + 5]
+
+
+def varied_rows():
+    return [
+        syncer.PlanRow("/org/a.txt", "a.txt", 1, "==>", "/dst/a.txt", "a.txt", 2, 1, None, None),
+        syncer.PlanRow("/org/sub/b.txt", "", None, "<<<", "/dst/sub/b.txt", "b.txt", 3, 2),
+        syncer.PlanRow("/org/sub/deep/c", "c", 4, ">>>", "/dst/sub/deep/c", None, None, 3, None, 12),
+        syncer.PlanRow("/org/new.bin", "new.bin", 5, "~~>", "/dst/new.bin", "old.bin", 5, 4, "/dst/old.bin"),
+        syncer.PlanRow("/org/x", "x", 6, "==>", "/dst/renamed", "renamed", 7, 5),
+        syncer.PlanRow("/org//double", "double", 8, "===", "/dst//double", "double", 8, 6),
+        syncer.PlanRow("/org/f", "f", 1.5, "==>", "/dst/f", "f", 2, 7),
+        syncer.PlanRow("/org/é ü.txt", "é ü.txt", -1, "X--", "/dst/é ü.txt", "", None, 8),
+        syncer.PlanRow("/org/odd", "odd", 9, "???", "/dst/odd", "odd", 9, 9),
+        syncer.PlanRow("/org/mid", "mid", 1, "--X", "/dst/mid", "mid", 1, None),
+    ]
+
+
+def test_round_trip():
+    store = syncer.PlanStore()
+    rows = varied_rows()
+    store.extend(rows)
+
+    assert len(store) == len(rows)
+    assert list(store) == rows
+    assert [store[index] for index in range(len(rows))] == rows
+    assert store[-1] == rows[-1]
+    with pytest.raises(IndexError):
+        store[len(rows)]
+
+
+def test_compact_and_kept_rows():
+    store = syncer.PlanStore()
+    store.extend(varied_rows())
+
+    # Déplacement, noms différents, séparateur double, date non entière et action inconnue sont gardés tels quels
+    assert sorted(store.extra) == [3, 4, 5, 6, 8]
+
+
+def test_set_action():
+    store = syncer.PlanStore()
+    rows = varied_rows()
+    store.extend(rows)
+
+    for index, action in ((0, "<=="), (2, "-!-"), (9, "===")):
+        rows[index] = rows[index]._replace(action=action)
+        store[index] = rows[index]
+
+    assert list(store) == rows
+    assert 0 not in store.extra and 2 not in store.extra
+
+
+def test_set_row_with_other_name():
+    store = syncer.PlanStore()
+    rows = plan_rows(5)
+    store.extend(rows)
+
+    rows[1] = rows[1]._replace(org_path="/org/d1/longer-name.txt", dst_path="/dst/d1/longer-name.txt")
+    rows[2] = rows[2]._replace(org_path="/org/d2/g2.txt", dst_path="/dst/d2/g2.txt")  # Même longueur
+    rows[4] = rows[4]._replace(org_path="/org/d4/last-row.txt", dst_path="/dst/d4/last-row.txt")
+    for index in (1, 2, 4):
+        store[index] = rows[index]
+
+    assert list(store) == rows
+    assert store.find(rows[1].id) == 1
+
+
+def test_set_kept_row_back_to_compact():
+    store = syncer.PlanStore()
+    rows = varied_rows()
+    store.extend(rows)
+
+    rows[3] = syncer.change_plan_action(rows[3], ">>>")
+    store[3] = rows[3]
+
+    assert list(store) == rows
+
+
+def test_order_after_removals_and_appends():
+    store = syncer.PlanStore()
+    rows = varied_rows()
+    store.extend(rows)
+
+    for index in (3, 0, 8):
+        store.remove(index)
+    more = plan_rows(3, start_id=20)
+    store.extend(more)
+    expected = [row for index, row in enumerate(rows) if index not in (3, 0, 8)] + more
+
+    assert list(store) == expected
+    assert store.remaining() == len(expected)
+    assert store.find(21) == len(rows) + 1
+    assert [store[index] for index in store.live_indices(6, 10)] == expected[6:]
@@ -0,0 +1,46 @@
+import os
+import sqlite3
+
+import syncer
+from conftest import write
+
+
+def make_profile(tmp_path, name, files):
+    """Profil name synchronisant tmp_path/name/org vers tmp_path/name/dst"""
+    profile = syncer.open_profile(name)
+    with sqlite3.connect(profile.config_db) as conn:
+        conn.executemany("REPLACE INTO sync_config (key, value) VALUES (?, ?)",
+                         (("source", str(tmp_path / name / "org")), ("destination", str(tmp_path / name / "dst"))))
+    for rel_path in files:
+        write(tmp_path / name / "org" / rel_path, rel_path.encode())
+    os.makedirs(tmp_path / name / "dst")
+    return profile
+
+
+def test_profiles_are_synchronized_in_parallel(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_profile(tmp_path, "photos", ["2020/a.jpg", "2021/b.jpg", "c.jpg"])
+    make_profile(tmp_path, "docs", ["notes.txt"])
+    syncer.open_profile("empty")  # Sans source ni destination
+    messages = []
+
+    results = syncer.run_profiles(["photos", "docs", "empty"], processes=2,
+                                  on_progress=lambda *message: messages.append(message))
+
+    # 2020 et 2021 copiés en une ligne chacun
+    assert {name: results[name]['executed'] for name in ("photos", "docs")} == {"photos": 3, "docs": 1}
+    assert isinstance(results["empty"], ValueError)
+    assert (tmp_path / "photos/dst/2021/b.jpg").read_bytes() == b"2021/b.jpg"
+    assert (tmp_path / "docs/dst/notes.txt").read_bytes() == b"notes.txt"
+    assert syncer.list_profiles() == ["docs", "empty", "photos"]
+    assert {name for name, phase, text in messages} <= {"photos", "docs"}
+
+
+def test_profile_dry_run_changes_nothing(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    make_profile(tmp_path, "docs", ["notes.txt"])
+
+    results = syncer.run_profiles(["docs"], go=False, io_limit=0)
+
+    assert results["docs"]['rows'] == 1
+    assert os.listdir(tmp_path / "docs/dst") == []
@@ -0,0 +1,102 @@
+import os
+import random
+import time
+
+import pytest
+
+import syncer
+from conftest import write
+
+
+def deep_tree(root, depth=8):
+    path = root
+    for level in range(depth):
+        path = path / f"l{level}"
+        write(path / "f.txt", b"x")
+    return os.path.join(*(f"l{level}" for level in range(depth)))
+
+
+def recording_listers(monkeypatch):
+    listers = []
+
+    class Lister(syncer.ShardedLister):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            listers.append(self)
+    monkeypatch.setattr(syncer, "ShardedLister", Lister)
+    return listers
+
+
+def test_lister_reads_ahead_of_the_walk(tmp_path):
+    deepest = deep_tree(tmp_path)
+    lister = syncer.ShardedLister(str(tmp_path), 2, discover=True)
+    try:
+        lister.request("")
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            with lister.cond:
+                if lister.results.get((deepest, True)) not in (None, lister.PENDING):
+                    break
+            time.sleep(0.01)
+
+        # Lu sans que le parcours ait demandé un seul répertoire
+        assert "f.txt" in lister.get(deepest)
+    finally:
+        lister.close()
+
+
+def test_full_scan_discovers_even_with_snapshots(tmp_path, monkeypatch):
+    deep_tree(tmp_path / "org")
+    deep_tree(tmp_path / "dst")
+    db = str(tmp_path / "analyse.db")
+    syncer.init_databases(db, str(tmp_path / "config.db"))
+    listers = recording_listers(monkeypatch)
+    snapshots = syncer.DirSnapshots(db, str(tmp_path / "org"), str(tmp_path / "dst"), incremental=False)
+
+    list(syncer.scan_trees(str(tmp_path / "org"), str(tmp_path / "dst"), snapshots=snapshots, workers=(2, 2)))
+
+    assert [lister.discover for lister in listers] == [True, True]
+
+
+def test_incremental_scan_with_stored_states_does_not_discover(tmp_path, make_engine, monkeypatch):
+    deep_tree(tmp_path / "org")
+    deep_tree(tmp_path / "dst")
+    engine = make_engine(incremental=True)
+    list(engine.plan(save=True))
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+    listers = recording_listers(monkeypatch)
+
+    list(make_engine(incremental=True, scan_workers=(2, 2)).plan())
+
+    assert [lister.discover for lister in listers] == [False, False]
+
+
+def varied_trees(root):
+    """Source et destination en partie communes, avec des répertoires d'un seul côté et des liens"""
+    rng = random.Random(3)
+    for side in ("org", "dst"):
+        for index in range(120):
+            rel_dir = os.path.join(*(f"d{rng.randrange(4)}" for _ in range(rng.randrange(1, 4))))
+            if rng.random() < 0.7 or side == "org":
+                write(root / side / rel_dir / f"f{index}.txt", b"x" * index)
+        os.makedirs(root / side / "empty" / side)
+        os.symlink(root / side / "d0", root / side / "link")
+    write(root / "dst/skip/f.txt", b"x")
+
+
+def scan(root, workers, **options):
+    return [(rel_path, *((entry.is_dir, entry.is_link, entry.stat and entry.stat.st_size) if entry else None
+                         for entry in (org, dst)))
+            for rel_path, org, dst in syncer.scan_trees(str(root / "org"), str(root / "dst"), workers=workers, **options)]
+
+
+@pytest.mark.parametrize("options", [{}, {'prune': lambda rel_path, is_dir: rel_path == "skip"},
+                                     {'starts': ["", "d1", os.path.join("d2", "d3")]}])
+def test_parallel_scan_keeps_the_order(tmp_path, options):
+    varied_trees(tmp_path)
+
+    expected = scan(tmp_path, (1, 1), **options)
+
+    assert len(expected) > 30
+    assert scan(tmp_path, (3, 3), **options) == expected
+    assert scan(tmp_path, (1, 4), **options) == expected
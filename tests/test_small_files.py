@@ -0,0 +1,91 @@
+import os
+import stat
+
+import pytest
+
+import syncer
+from conftest import write
+
+MTIME = 1_600_000_000_123_456_789
+
+
+def run(engine):
+    list(engine.plan(save=True))
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+
+
+def test_small_files_are_copied_with_metadata(tmp_path, make_engine):
+    write(tmp_path / "org/a.txt", b"petit", MTIME)
+    write(tmp_path / "org/sub/b.txt", b"x" * syncer.SMALL_FILE_MAX, MTIME)
+    os.chmod(tmp_path / "org/sub/b.txt", 0o444)
+    os.makedirs(tmp_path / "dst")
+
+    run(make_engine())
+
+    assert (tmp_path / "dst/a.txt").read_bytes() == b"petit"
+    assert (tmp_path / "dst/sub/b.txt").read_bytes() == b"x" * syncer.SMALL_FILE_MAX
+    assert os.stat(tmp_path / "dst/a.txt").st_mtime_ns == MTIME
+    assert stat.S_IMODE(os.stat(tmp_path / "dst/sub/b.txt").st_mode) == 0o444
+    assert not [name for name in os.listdir(tmp_path / "dst") if name.startswith(".syncer")]
+
+
+def test_batch_over_many_directories(tmp_path, make_engine):
+    count = 64
+    for i in range(count):
+        write(tmp_path / f"org/d{i:03}/f.txt", b"%d" % i, MTIME)
+    os.makedirs(tmp_path / "dst")
+
+    run(make_engine())
+
+    for i in range(count):
+        assert (tmp_path / f"dst/d{i:03}/f.txt").read_bytes() == b"%d" % i
+    assert {row.action for row in make_engine().plan()} == {"==="}
+
+
+def count_fsyncs(monkeypatch):
+    calls = []
+    fsync = os.fsync
+    monkeypatch.setattr(os, "fsync", lambda fd: calls.append(fd) or fsync(fd))
+    return calls
+
+
+def test_batch_has_no_fsync_per_file(tmp_path, make_engine, monkeypatch):
+    for i in range(40):
+        write(tmp_path / f"org/d{i % 2}/f{i}.txt", b"%d" % i, MTIME)
+    for i in range(2):
+        os.makedirs(tmp_path / f"dst/d{i}")
+    engine = make_engine()
+    list(engine.plan(save=True))
+    if syncer.SmallFileBatch(engine.copier).syncfs is None:
+        pytest.skip("syncfs indisponible")
+    syncs = []
+    sync_filesystems = syncer.SmallFileBatch.sync_filesystems
+    monkeypatch.setattr(syncer.SmallFileBatch, "sync_filesystems",
+                        lambda self, directories: syncs.append(directories) or sync_filesystems(self, directories))
+    fsyncs = count_fsyncs(monkeypatch)
+
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+
+    assert len(os.listdir(tmp_path / "dst/d0")) == 20
+    assert [len(directories) for directories in syncs if directories] == [2]
+    assert len(fsyncs) <= 2  # Un fsync par répertoire
+
+
+def test_batch_without_syncfs_fsyncs_each_file(tmp_path, make_engine, monkeypatch):
+    for i in range(10):
+        write(tmp_path / f"org/f{i}.txt", b"%d" % i, MTIME)
+    os.makedirs(tmp_path / "dst")
+    engine = make_engine()
+    list(engine.plan(save=True))
+    init = syncer.SmallFileBatch.__init__
+
+    def without_syncfs(self, *args, **kwargs):
+        init(self, *args, **kwargs)
+        self.syncfs = None
+    monkeypatch.setattr(syncer.SmallFileBatch, "__init__", without_syncfs)
+    fsyncs = count_fsyncs(monkeypatch)
+
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+
+    assert sorted(os.listdir(tmp_path / "dst")) == [f"f{i}.txt" for i in range(10)]
+    assert len(fsyncs) >= 10
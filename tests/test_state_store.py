@@ -0,0 +1,85 @@
+import os
+import sqlite3
+
+import pytest
+
+import syncer
+
+STATE = (1, 2, 3, 4)
+TREE = ["a", os.path.join("a", "x"), os.path.join("a", "y"), os.path.join("a", "y", "z"), "ab", os.path.join("ab", "x")]
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = str(tmp_path / "analyse.db")
+    syncer.init_databases(db, str(tmp_path / "config.db"))
+    return db
+
+
+def seed(db, org_dir, paths):
+    store = syncer.StateStore(db, org_dir, "/dst")
+    for path in paths:
+        store.record(None, {path: STATE})
+    store.close()
+
+
+def paths(db, org_dir="/org"):
+    with sqlite3.connect(db) as conn:
+        pair = syncer.root_pair(conn, org_dir, "/dst", create=False)
+        return sorted(path for (path,) in conn.execute("SELECT path FROM sync_state WHERE pair = ?", (pair,)))
+
+
+def test_rename_moves_the_directory_and_its_content(db):
+    seed(db, "/org", TREE)
+    seed(db, "/other", TREE)
+
+    store = syncer.StateStore(db, "/org", "/dst")
+    store.record(None, {}, renames=[("a", os.path.join("new", "b"))])
+    store.close()
+
+    b = os.path.join("new", "b")
+    assert paths(db) == sorted([b, os.path.join(b, "x"), os.path.join(b, "y"), os.path.join(b, "y", "z"),
+                                "ab", os.path.join("ab", "x")])
+    assert paths(db, "/other") == sorted(TREE)  # Autre couple de répertoires inchangé
+
+
+def test_rename_replaces_existing_states(db):
+    seed(db, "/org", ["a", os.path.join("a", "x"), "b", os.path.join("b", "x")])
+
+    store = syncer.StateStore(db, "/org", "/dst")
+    store.record(None, {}, renames=[("a", "b")])
+    store.close()
+
+    assert paths(db) == ["b", os.path.join("b", "x")]
+
+
+def test_removed_directory_deletes_its_content_only(db):
+    seed(db, "/org", TREE)
+
+    store = syncer.StateStore(db, "/org", "/dst")
+    store.record(None, {}, removed=["a"])
+    store.record(None, {os.path.join("ab", "x"): None})
+    store.close()
+
+    assert paths(db) == ["ab"]
+
+
+def test_statuses_are_written_by_groups(db):
+    with sqlite3.connect(db) as conn:
+        conn.executemany("INSERT INTO sync_plan (id, org_path, action) VALUES (?, ?, '>>>')",
+                         ((plan_id, f"/org/f{plan_id}") for plan_id in range(1, 6)))
+
+    def statuses():
+        with sqlite3.connect(db) as conn:
+            return [status for (status,) in conn.execute("SELECT status FROM sync_plan ORDER BY id")]
+
+    store = syncer.StateStore(db, "/org", "/dst", group_size=2, group_ms=3600000)
+    store.record(1, {"f1": STATE})
+    assert statuses() == ["pending"] * 5
+    store.record(2, {"f2": STATE}, status="skipped")
+    assert statuses() == ["done", "skipped"] + ["pending"] * 3
+    store.record(3, {"f3": STATE})
+    store.close()
+
+    assert statuses() == ["done", "skipped", "done", "pending", "pending"]
+    assert paths(db) == ["f1", "f2", "f3"]
@@ -0,0 +1,41 @@
+import os
+import sqlite3
+
+import syncer
+from conftest import write
+
+MTIME = 1_600_000_000_123_456_789
+
+
+def sync_state(analyse_db):
+    with sqlite3.connect(analyse_db) as conn:
+        return {path: values for path, *values in conn.execute(
+            "SELECT path, org_mtime_ns, org_size, dst_mtime_ns, dst_size FROM sync_state")}
+
+
+def test_copied_subtree_is_recorded_without_rescanning(tmp_path, make_engine, monkeypatch):
+    write(tmp_path / "org/new/a.txt", b"a", MTIME)
+    write(tmp_path / "org/new/sub/b.txt", b"bb" * 20000, MTIME)
+    write(tmp_path / "org/new/sub/deeper/c.txt", b"ccc", MTIME)
+    os.makedirs(tmp_path / "dst")
+    engine = make_engine({'extension': [".tmp"]})
+    rows = list(engine.plan(save=True))
+    assert [row.subtree for row in rows if row.action == ">>>"] == [5]
+    write(tmp_path / "org/new/sub/skip.tmp", b"x", MTIME)  # Apparu après l'analyse, exclu à la copie
+    listed = []
+    list_directory = syncer.list_directory
+    monkeypatch.setattr(syncer, "list_directory",
+                        lambda path, *args, **kwargs: listed.append(path) or list_directory(path, *args, **kwargs))
+
+    engine.execute(syncer.iter_plan(engine.analyse_db))
+
+    assert not [path for path in listed if path.startswith(str(tmp_path / "dst"))]
+    assert not (tmp_path / "dst/new/sub/skip.tmp").exists()
+    states = sync_state(engine.analyse_db)
+    expected = {}
+    for rel_path in ("new", "new/a.txt", "new/sub", "new/sub/b.txt", "new/sub/deeper", "new/sub/deeper/c.txt"):
+        org, dst = os.stat(tmp_path / "org" / rel_path), os.stat(tmp_path / "dst" / rel_path)
+        expected[rel_path] = [org.st_mtime_ns, org.st_size, dst.st_mtime_ns, dst.st_size]
+    assert states == expected
+    assert {row.action for row in make_engine({'extension': [".tmp"]}).plan()} == {"===", "-!-"}
+
@@ -0,0 +1,102 @@
+import sqlite3
+import types
+
+import pytest
+
+import syncer
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Horloge simulée : time.sleep avance time.monotonic, les attentes sont relevées dans clock.sleeps"""
+    clock = types.SimpleNamespace(now=1000.0, sleeps=[])
+
+    def sleep(seconds):
+        clock.sleeps.append(seconds)
+        clock.now += seconds
+    monkeypatch.setattr(syncer, "time", types.SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+    return clock
+
+
+def test_bytes_limit_spreads_copies(clock):
+    throttle = syncer.Throttle(bytes_per_sec=1000)
+
+    for _ in range(10):
+        throttle.acquire(500)
+
+    assert clock.sleeps == pytest.approx([0.5] * 10)
+
+
+def test_bucket_holds_one_second_of_rate(clock):
+    throttle = syncer.Throttle(bytes_per_sec=1000)
+    clock.now += 60  # Longue inactivité : le seau ne dépasse pas une seconde de débit
+
+    throttle.acquire(1000)
+    throttle.acquire(1000)
+
+    assert clock.sleeps == pytest.approx([1.0])
+
+
+def test_copy_larger_than_bucket_puts_it_in_debt(clock):
+    throttle = syncer.Throttle(bytes_per_sec=1000)
+    clock.now += 1
+
+    throttle.acquire(3000)
+    throttle.acquire(0)
+
+    assert clock.sleeps == pytest.approx([2.0])
+
+
+def test_ops_limit_is_the_longest_wait(clock):
+    throttle = syncer.Throttle(bytes_per_sec=1000000, ops_per_sec=4)
+
+    for _ in range(4):
+        throttle.acquire(10)
+
+    assert clock.sleeps == pytest.approx([0.25] * 4)
+
+
+def test_no_limit_never_waits(clock):
+    throttle = syncer.Throttle()
+
+    for _ in range(100):
+        throttle.acquire(1 << 30)
+
+    assert clock.sleeps == []
+
+
+def test_slow_operations_halve_the_rate_then_it_recovers(clock):
+    throttle = syncer.Throttle(bytes_per_sec=1000, target_latency_ms=100)
+
+    throttle.observe(0.5)
+    throttle.observe(0.5)
+    assert throttle.factor == pytest.approx(0.25)
+    throttle.acquire(250)
+    assert clock.sleeps == pytest.approx([1.0])  # 250 octets à 250 o/s
+
+    throttle.observe(0.01)
+    assert throttle.factor == pytest.approx(0.30)
+    for _ in range(20):
+        throttle.observe(0.5)
+    assert throttle.factor == syncer.THROTTLE_MIN_FACTOR
+
+
+def test_latency_is_per_megabyte(clock):
+    throttle = syncer.Throttle(bytes_per_sec=1000, target_latency_ms=100)
+
+    throttle.observe(0.5, 10 * 1024 * 1024)  # 50 ms par Mo
+
+    assert throttle.factor == 1.0
+
+
+def test_limits_are_read_from_sync_config(tmp_path):
+    config_db = str(tmp_path / "config.db")
+    syncer.init_databases(str(tmp_path / "analyse.db"), config_db)
+    with sqlite3.connect(config_db) as conn:
+        conn.executemany("INSERT INTO sync_config (key, value) VALUES (?, ?)",
+                         (("max_bytes_per_sec", "2048"), ("max_ops_per_sec", "pas un nombre"),
+                          ("target_latency_ms", "250")))
+
+    throttle = syncer.Throttle.from_config(config_db)
+
+    assert (throttle.bytes_per_sec, throttle.ops_per_sec, throttle.target_latency) == (2048, 0, 0.25)
@@ -0,0 +1,47 @@
+import os
+import shutil
+
+import syncer
+from conftest import write
+
+MTIME = 1_600_000_000_000_000_000
+
+
+def watcher(tmp_path):
+    for rel_path in ("a/1.txt", "a/deep/2.txt", "b/3.txt", "4.txt"):
+        write(tmp_path / "root" / rel_path, b"x", MTIME)
+    return syncer.PollWatcher(str(tmp_path / "root"), interval=0)
+
+
+def test_unchanged_tree_has_no_dirty_directory(tmp_path):
+    poll = watcher(tmp_path)
+
+    assert poll.changes() == set()
+
+
+def test_changed_file_marks_its_directory(tmp_path):
+    poll = watcher(tmp_path)
+    write(tmp_path / "root/a/deep/2.txt", b"xx", MTIME)  # Même date, autre taille
+    os.utime(tmp_path / "root/b/3.txt", ns=(MTIME + 1, MTIME + 1))
+
+    assert poll.changes() == {os.path.join("a", "deep"), "b"}
+    assert poll.changes() == set()  # Changements déjà rapportés
+
+
+def test_created_and_removed_directories(tmp_path):
+    poll = watcher(tmp_path)
+    write(tmp_path / "root/b/new/5.txt", b"x", MTIME)
+    shutil.rmtree(tmp_path / "root/a/deep")
+
+    # La date de a et b change aussi : la racine est relue
+    assert poll.changes() == {"", "a", "b", os.path.join("a", "deep"), os.path.join("b", "new")}
+
+
+def test_changes_wait_for_the_interval(tmp_path):
+    write(tmp_path / "root/1.txt", b"x", MTIME)
+    poll = syncer.PollWatcher(str(tmp_path / "root"), interval=3600)
+    write(tmp_path / "root/2.txt", b"x", MTIME)
+
+    assert poll.changes() == set()
+    poll.last_poll -= 3600
+    assert poll.changes() == {""}